@@ -13,8 +13,7 @@ import { WorkflowLibraryModal } from './components/WorkflowLibraryModal'
 import { useBatch } from './hooks/useBatch'
 import { useWorkflow } from './hooks/useWorkflow'
 import { getInputs, browseFile } from './services/api'
-import { generateCartesian } from './utils/generators'
-import type { WorkflowFile, FileMapping, MetaData, WorkflowConfig, InputConfig } from './services/api'
+import type { WorkflowFile, FileMapping, MetaData, WorkflowConfig, InputConfig, SweepNode } from './services/api'
 import { WorkflowStatus } from './services/api'
 
 function App() {
@@ -245,30 +244,21 @@ function App() {
     // For now, only use configured ones.
     if (Object.keys(aliasConfigs).length === 0) return;
 
-    const combinations = generateCartesian(aliasConfigs);
-    const inputs = combinations.map(combo => {
-      // Add units to each input value
-      const inputWithUnits: Record<string, any> = { path: filePath };
-      for (const [key, value] of Object.entries(combo)) {
-        if (aliasTypes[key] === 'string') {
-          // String values: pass directly, no units wrapper
-          inputWithUnits[key] = value;  // Already a string
-        } else {
-          // Numeric values: apply units if present
-          const units = aliasUnits[key];
-          if (units) {
-            inputWithUnits[key] = { value, units };
-          } else {
-            inputWithUnits[key] = value;
-          }
-        }
-      }
-      return inputWithUnits;
-    });
+    // Send one list axis per alias; the server expands the cartesian product lazily
+    const axes: SweepNode[] = Object.entries(aliasConfigs).map(([alias, values]) => ({
+      type: 'list',
+      alias,
+      values,
+      // String values: pass directly, no units wrapper
+      units: aliasTypes[alias] === 'string' ? undefined : aliasUnits[alias] || undefined,
+    }));
 
     startBatch({
       batch_id: `batch-${Date.now()}`,
-      inputs,
+      sweep: {
+        constants: { path: filePath },
+        grid: { type: 'product', axes },
+      },
       output_dir: "D:\\Mathcad_exp\\results",
       export_pdf: exportPdf,
       export_mcdx: exportMcdx,
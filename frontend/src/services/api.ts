@@ -4,12 +4,59 @@ const api = axios.create({
   baseURL: '/api/v1',
 });
 
+export interface SweepNode {
+  type: 'range' | 'list' | 'product' | 'zip';
+  alias?: string;
+  units?: string;
+  start?: number;
+  end?: number;
+  step?: number;
+  values?: any[];
+  axes?: SweepNode[];
+}
+
+export interface SweepSpec {
+  constants?: Record<string, any>;  // Same for every row, e.g. { path }
+  grid: SweepNode;                  // Expanded row by row on the server
+}
+
+export interface StopCondition {
+  output: string;
+  op: '>' | '>=' | '<' | '<=' | '==' | '!=';
+  value: number;
+}
+
+export interface AdaptiveSpec {
+  output: string;        // Output alias driving refinement
+  threshold?: number;    // Refine where the output crosses this value
+  max_change?: number;   // ...or changes by more than this across a cell
+  coarse_points?: number;
+  max_depth?: number;
+  max_rows?: number;
+}
+
+export interface SurrogateSpec {
+  outputs?: string[];        // Outputs to model, default every numeric output
+  warmup_rows?: number;      // Real rows before the surrogate answers
+  spot_check_every?: number; // Calculate every Nth predictable row anyway
+  max_error?: number;        // Relative error tolerance
+}
+
 export interface BatchRequest {
   batch_id: string;
-  inputs: Record<string, any>[];
+  inputs?: Record<string, any>[];
+  sweep?: SweepSpec;
+  table?: TableSpec;  // Rows of an uploaded table, read server-side
   output_dir: string;
   export_pdf: boolean;
   export_mcdx: boolean;
+  reorder?: boolean;  // Run rows in an order that minimizes input changes
+  stop_when?: StopCondition;
+  adaptive?: AdaptiveSpec;  // Requires sweep
+  surrogate?: SurrogateSpec;
+  dedupe?: boolean;  // Calculate identical rows once (default true)
+  window?: number;  // Rows queued on the engine at once (server default: PIPELINE_WINDOW)
+  chunk_size?: number;  // Rows per engine job (default 1)
 }
 
 export interface InputConfig {
@@ -26,6 +73,34 @@ export interface BatchRow {
   pdf?: string;
   mcdx?: string;
   error?: string;
+  surrogate?: boolean;  // Outputs are estimated, not calculated
+  error_estimate?: Record<string, number>;
+  surrogate_check?: Record<string, any>;
+  duplicate_of?: number;  // Row whose results this identical row reuses
+}
+
+// Rows of a table stored by uploadTable: one batch row per record
+export interface TableColumn {
+  column: string;  // Header in the table
+  alias: string;
+  units?: string;  // Applied to numeric values
+}
+
+export interface TableSpec {
+  upload_id: string;
+  path?: string;  // Worksheet for every row, or...
+  path_column?: string;  // ...the column naming each row's worksheet
+  columns: TableColumn[];
+}
+
+export interface UploadSummary {
+  upload_id: string;
+  filename: string;
+  rows: number;
+  columns: { name: string; numeric: number; text: number; empty: number }[];
+  preview: Record<string, any>[];
+  errors: string[];  // First malformed records
+  error_count: number;
 }
 
 export interface BatchStatus {
@@ -36,6 +111,9 @@ export interface BatchStatus {
   results: BatchRow[];
   generated_files?: string[];
   error?: string;
+  stop_reason?: string;
+  surrogate?: Record<string, number>;
+  duplicates?: number;
 }
 
 export interface ControlResponse {
@@ -48,6 +126,25 @@ export interface JobResponse {
   status: string;
 }
 
+export interface OptimizeVariable {
+  alias: string;
+  lower?: number;
+  upper?: number;
+  initial?: number;
+  units?: string;
+}
+
+export interface OptimizeRequest {
+  path: string;
+  inputs?: InputConfig[];
+  method?: 'bisection' | 'brent' | 'nelder-mead';
+  variables: OptimizeVariable[];
+  objective: { output: string; goal?: 'target' | 'minimize' | 'maximize'; target?: number };
+  xtol?: number;
+  ftol?: number;
+  max_iterations?: number;
+}
+
 export interface MetaData {
   inputs: Array<{ alias: string, name: string }>;
   outputs: Array<{ alias: string, name: string }>;
@@ -121,11 +218,50 @@ export const stopBatch = async (id: string): Promise<ControlResponse> => {
   return data;
 };
 
+export const startOptimization = async (config: OptimizeRequest): Promise<JobResponse> => {
+  const { data } = await api.post<JobResponse>('/optimize', config);
+  return data;
+};
+
+// Sends a CSV/XLSX file as the raw body; the server streams, validates and stores it
+export const uploadTable = async (file: File): Promise<UploadSummary> => {
+  const { data } = await api.post<UploadSummary>('/inputs/upload', file, {
+    params: { filename: file.name },
+    headers: { 'Content-Type': 'application/octet-stream' },
+  });
+  return data;
+};
+
+// Download link for all of a batch's files plus results.csv; tar downloads can be resumed
+export const getBatchArchiveUrl = (id: string, format: 'tar' | 'zip' = 'tar'): string =>
+  `/api/v1/batch/${encodeURIComponent(id)}/archive?format=${format}`;
+
 export const getInputs = async (path: string): Promise<MetaData> => {
   const { data } = await api.post<MetaData>('/engine/analyze', { path });
   return data;
 };
 
+// Preloads worksheets (default: recently used) so their first run skips the open
+export const warmUpEngine = async (paths?: string[]): Promise<{ job_id: string | null; status: 'submitted' | 'skipped' }> => {
+  const { data } = await api.post<{ job_id: string | null; status: 'submitted' | 'skipped' }>('/engine/warmup', { paths });
+  return data;
+};
+
+export interface OpenWorksheets {
+  capacity: number;
+  open: string[];  // Least recently used first
+  active: string | null;
+  hits: number;  // Job's worksheet was already active
+  switches: number;  // Activated from the open set instead of reopened
+  misses: number;  // Opened from disk
+  evictions: number;
+}
+
+export const getOpenWorksheets = async (): Promise<OpenWorksheets> => {
+  const { data } = await api.get<OpenWorksheets>('/engine/worksheets');
+  return data;
+};
+
 export const createWorkflow = async (config: WorkflowConfig): Promise<WorkflowCreateResponse> => {
   const { data } = await api.post<WorkflowCreateResponse>('/workflows', config);
   return data;
@@ -151,6 +287,66 @@ export const browseFile = async (): Promise<{ file_path: string | null; cancelle
   return data;
 };
 
+// Startup Types
+
+export interface StartupPhase {
+  name: string;
+  start: number;  // Seconds after launch
+  end: number | null;  // null while the phase is still running
+  duration: number | null;
+  error?: string;
+  source?: 'launcher';  // Timed by the launcher process rather than the server
+}
+
+export interface StartupStatus {
+  state: 'starting' | 'ready' | 'failed';
+  engine: 'pending' | 'starting' | 'running' | 'failed';
+  mathcad: 'pending' | 'connecting' | 'connected' | 'failed';
+  error: string | null;
+  elapsed: number;
+  phases: StartupPhase[];
+}
+
+export const getStartupStatus = async (): Promise<StartupStatus> => {
+  const { data } = await api.get<StartupStatus>('/startup');
+  return data;
+};
+
+export interface ImportTiming {
+  module: string;
+  self_ms: number;
+  cumulative_ms: number;
+  depth: number;
+}
+
+export interface StartupProfile extends StartupStatus {
+  launched_at: number;
+  version: string | null;
+  frozen: boolean;
+  python: string;
+  imports: { modules: number; total_ms: number; slowest: ImportTiming[] } | null;
+}
+
+export interface StartupHistoryEntry {
+  launched_at: number;
+  version: string | null;
+  frozen: boolean;
+  state: StartupStatus['state'];
+  elapsed: number;
+  phases: Record<string, number | null>;  // Phase name -> duration in seconds
+  imports_ms: number | null;
+}
+
+export const getStartupProfile = async (): Promise<StartupProfile> => {
+  const { data } = await api.get<StartupProfile>('/startup/profile');
+  return data;
+};
+
+export const getStartupHistory = async (limit = 20): Promise<{ launches: StartupHistoryEntry[] }> => {
+  const { data } = await api.get<{ launches: StartupHistoryEntry[] }>('/startup/history', { params: { limit } });
+  return data;
+};
+
 // Library Types
 
 export interface LibraryConfigMetadata {
@@ -162,6 +358,17 @@ export interface LibraryConfigMetadata {
 
 export interface ListLibraryConfigsResponse {
   configs: LibraryConfigMetadata[];
+  total: number;  // Matches before paging
+  offset: number;
+  limit: number | null;
+}
+
+export interface LibraryQuery {
+  q?: string;  // Case-insensitive substring of the config name
+  sort?: 'name' | 'created_at';
+  descending?: boolean;
+  offset?: number;
+  limit?: number;
 }
 
 export interface SaveLibraryConfigRequest {
@@ -192,9 +399,9 @@ export const saveLibraryConfig = async (config: SaveLibraryConfigRequest): Promi
   return data;
 };
 
-export const listLibraryConfigs = async (filePath: string): Promise<ListLibraryConfigsResponse> => {
+export const listLibraryConfigs = async (filePath: string, query: LibraryQuery = {}): Promise<ListLibraryConfigsResponse> => {
   const { data } = await api.get<ListLibraryConfigsResponse>('/library/list', {
-    params: { file_path: filePath }
+    params: { file_path: filePath, ...query }
   });
   return data;
 };
@@ -215,6 +422,9 @@ export interface WorkflowLibraryConfigMetadata {
 
 export interface ListWorkflowLibraryConfigsResponse {
   configs: WorkflowLibraryConfigMetadata[];
+  total: number;
+  offset: number;
+  limit: number | null;
 }
 
 export interface SaveWorkflowLibraryConfigRequest {
@@ -236,8 +446,8 @@ export const saveWorkflowLibraryConfig = async (config: SaveWorkflowLibraryConfi
   return data;
 };
 
-export const listWorkflowLibraryConfigs = async (): Promise<ListWorkflowLibraryConfigsResponse> => {
-  const { data } = await api.get<ListWorkflowLibraryConfigsResponse>('/library/list/workflows');
+export const listWorkflowLibraryConfigs = async (query: LibraryQuery = {}): Promise<ListWorkflowLibraryConfigsResponse> => {
+  const { data } = await api.get<ListWorkflowLibraryConfigsResponse>('/library/list/workflows', { params: query });
   return data;
 };
 
@@ -246,4 +456,78 @@ export const loadWorkflowLibraryConfig = async (configPath: string): Promise<Loa
   return data;
 };
 
+// Run History Types
+
+export interface RunRecord {
+  id: string;
+  kind: 'batch' | 'workflow';
+  status: string;  // 'interrupted' when the app stopped mid-run
+  started_at: number;  // Unix seconds
+  finished_at: number | null;
+  summary: Record<string, any>;  // Batch or workflow status without its rows
+  config: Record<string, any> | null;
+}
+
+export interface RunQuery {
+  kind?: 'batch' | 'workflow';
+  file_path?: string;
+  since?: string;  // ISO date/time
+  until?: string;
+  offset?: number;
+  limit?: number;
+}
+
+export interface RowQuery {
+  file_path?: string;
+  since?: string;
+  until?: string;
+  status?: string;
+  where?: string[];  // e.g. 'output.Utilization>0.95', 'input.L<=20'
+  sort?: string;  // 'finished_at', 'input.<alias>' or 'output.<alias>'
+  descending?: boolean;
+  offset?: number;
+  limit?: number;
+}
+
+export interface HistoryRow extends BatchRow {
+  run_id: string;
+  path: string;
+  finished_at: number;
+  inputs: Record<string, any>;
+}
+
+export interface QueryRowsResponse {
+  rows: HistoryRow[];
+  total: number;
+  offset: number;
+  limit: number;
+}
+
+export interface ListRunsResponse {
+  runs: RunRecord[];
+  total: number;
+  offset: number;
+  limit: number;
+}
+
+// Run History API Functions
+
+export const listRuns = async (query: RunQuery = {}): Promise<ListRunsResponse> => {
+  const { data } = await api.get<ListRunsResponse>('/history/runs', { params: query });
+  return data;
+};
+
+export const queryRows = async (query: RowQuery = {}): Promise<QueryRowsResponse> => {
+  const { data } = await api.get<QueryRowsResponse>('/history/rows', {
+    params: query,
+    paramsSerializer: { indexes: null }  // where=a&where=b, as FastAPI expects
+  });
+  return data;
+};
+
+export const getRun = async (runId: string, offset = 0, limit = 500): Promise<RunRecord & { rows: BatchRow[] }> => {
+  const { data } = await api.get<RunRecord & { rows: BatchRow[] }>(`/history/runs/${runId}`, { params: { offset, limit } });
+  return data;
+};
+
 export default api;
@@ -2,8 +2,8 @@
 Mathcad Automator - Desktop Application Entry Point
 
 This script launches the application with:
-- FastAPI backend server in a separate process
-- pywebview native window for the UI
+- FastAPI backend server in a separate process, started first
+- pywebview native window for the UI, shown while the server comes up
 - Mathcad Prime detection on startup
 - Operation-in-progress close confirmation
 - Clean process termination on exit
@@ -19,6 +19,7 @@ import time
 import ctypes
 import atexit
 import json
+import threading
 
 
 # Application Info
@@ -32,6 +33,15 @@ WINDOW_TITLE = f"Mathcad Automator v{APP_VERSION}"
 DEFAULT_WINDOW_WIDTH = 1280
 DEFAULT_WINDOW_HEIGHT = 800
 SERVER_STARTUP_TIMEOUT = 30
+SERVER_POLL_INTERVAL = 0.05
+LAUNCH_ENV = "MATHCAD_AUTOMATOR_LAUNCHED"  # Launch time, read by src.server.startup
+
+# Shown until the server answers; the app then replaces it
+LOADING_HTML = """<!DOCTYPE html>
+<html><body style="margin:0;height:100vh;display:flex;align-items:center;justify-content:center;
+font-family:'Segoe UI',sans-serif;background:#f8fafc;color:#334155">
+<div style="text-align:center"><h2 style="font-weight:500">Mathcad Automator</h2>
+<p id="status">Starting...</p></div></body></html>"""
 
 
 # Global reference to server process for cleanup
@@ -178,8 +188,6 @@ def run_server():
     """
     Run the FastAPI server in a separate process.
     """
-    import uvicorn
-
     if getattr(sys, 'frozen', False):
         sys.path.insert(0, sys._MEIPASS)
     else:
@@ -187,6 +195,11 @@ def run_server():
         if project_root not in sys.path:
             sys.path.insert(0, project_root)
 
+    # Profile imports from here on; the report lands in the logs directory
+    from src.server.startup import import_profiler
+    import_profiler.install()
+
+    import uvicorn
     from src.server.main import app
 
     uvicorn.run(
@@ -199,7 +212,8 @@ def run_server():
     )
 
 
-def wait_for_server(url: str, timeout: float = SERVER_STARTUP_TIMEOUT) -> bool:
+def wait_for_server(url: str, timeout: float = SERVER_STARTUP_TIMEOUT,
+                    interval: float = SERVER_POLL_INTERVAL) -> bool:
     """
     Wait for the server to be ready.
     """
@@ -217,7 +231,7 @@ def wait_for_server(url: str, timeout: float = SERVER_STARTUP_TIMEOUT) -> bool:
                     return True
         except (urllib.error.URLError, OSError):
             pass
-        time.sleep(0.3)
+        time.sleep(interval)
 
     return False
 
@@ -273,12 +287,55 @@ def cleanup_server_process():
             _server_process.kill()
 
 
+class LaunchTimer:
+    """
+    Phases timed in the launcher process. They are printed as they finish and
+    sent to the server, which merges them into its startup profile.
+    """
+
+    def __init__(self):
+        self.launched = time.time()
+        self.phases = []
+
+    def start(self, name: str) -> dict:
+        phase = {'name': name, 'start': time.time(), 'end': None}
+        self.phases.append(phase)
+        return phase
+
+    def end(self, phase: dict) -> None:
+        phase['end'] = time.time()
+        print(f"[startup] {phase['name']}: {phase['end'] - phase['start']:.2f}s "
+              f"(done at {phase['end'] - self.launched:.2f}s)")
+
+    def send(self, url: str) -> None:
+        """Posts the phases to the server's startup profile."""
+        import urllib.request
+        import urllib.error
+
+        req = urllib.request.Request(
+            f"{url}/api/v1/startup/phases",
+            data=json.dumps({'phases': self.phases}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=2):
+                pass
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Warning: Could not send startup timings: {e}")
+
+
 def main():
     """
     Main entry point.
+
+    The server process is spawned before anything else is imported so it boots
+    while the window toolkit loads; the window opens on a loading page and
+    switches to the app once the server answers.
     """
     global _server_process
-    import webview
+    timer = LaunchTimer()
+    os.environ[LAUNCH_ENV] = repr(timer.launched)  # Inherited by the server process
 
     print(f"Starting {WINDOW_TITLE}...")
     print(f"App data directory: {get_app_data_dir()}")
@@ -293,25 +350,39 @@ def main():
     print(f"Mathcad Prime {version or 'detected'} found{f' at {path}' if path else ''}")
 
     # Start backend server
+    spawn = timer.start('server_spawn')
     _server_process = multiprocessing.Process(
         target=run_server,
         daemon=False
     )
     _server_process.start()
+    timer.end(spawn)
     print(f"Server process started (PID: {_server_process.pid})")
 
     atexit.register(cleanup_server_process)
 
-    # Wait for server
-    server_url = f"http://{SERVER_HOST}:{SERVER_PORT}"
-    print(f"Waiting for server at {server_url}...")
-
-    if not wait_for_server(server_url):
-        print("ERROR: Server failed to start within timeout")
-        cleanup_server_process()
-        sys.exit(1)
+    phase = timer.start('webview_import')
+    import webview
+    timer.end(phase)
 
-    print("Server is ready!")
+    server_url = f"http://{SERVER_HOST}:{SERVER_PORT}"
+    window_shown = threading.Event()
+
+    def show_app_when_ready():
+        """Runs on pywebview's worker thread once the window exists."""
+        print(f"Waiting for server at {server_url}...")
+        waiting = timer.start('server_wait')
+        if not wait_for_server(server_url):
+            print("ERROR: Server failed to start within timeout")
+            window.evaluate_js(
+                'document.getElementById("status").textContent = '
+                '"The server failed to start. Close this window and try again."'
+            )
+            return
+        timer.end(waiting)
+        window.load_url(server_url)
+        window_shown.wait(timeout=5)
+        timer.send(server_url)
 
     # Load saved window configuration
     window_config = load_window_config()
@@ -350,9 +421,10 @@ def main():
         print("Cleanup complete.")
 
     # Create window with saved configuration
+    creating = timer.start('window_create')
     window = webview.create_window(
         title=WINDOW_TITLE,
-        url=server_url,
+        html=LOADING_HTML,
         width=window_config['width'],
         height=window_config['height'],
         x=window_config['x'],
@@ -365,7 +437,13 @@ def main():
     window.events.closing += on_closing
     window.events.closed += on_closed
 
-    webview.start()
+    def on_shown():
+        timer.end(creating)
+        window_shown.set()
+
+    window.events.shown += on_shown
+
+    webview.start(func=show_app_when_ready)
 
     cleanup_server_process()
     cleanup_mathcad_processes()
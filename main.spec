@@ -54,6 +54,9 @@ additional_imports = [
 
     # psutil for process management
     'psutil',
+
+    # Engine queue wire format
+    'msgpack',
 ]
 
 # Collect pywebview data files
@@ -0,0 +1,124 @@
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field, model_validator
+
+# A grid point as one index per sweep axis
+Point = Tuple[int, ...]
+# A cell as an (low, high) index pair per axis
+Cell = Tuple[Tuple[int, int], ...]
+
+
+class AdaptiveSpec(BaseModel):
+    """
+    Adaptive sampling over a sweep product: evaluate a coarse grid first, then
+    only subdivide cells where `output` crosses `threshold` or changes by more
+    than `max_change` between corners.
+    """
+    output: str  # Output alias driving refinement, e.g. "Utilization"
+    threshold: Optional[float] = None
+    max_change: Optional[float] = None
+    coarse_points: int = Field(default=5, ge=2)  # Points per axis in the first pass
+    max_depth: int = Field(default=4, ge=0)  # Refinement passes, each halves the spacing
+    max_rows: Optional[int] = Field(default=None, ge=1)
+
+    @model_validator(mode="after")
+    def _check_criteria(self):
+        if self.threshold is None and self.max_change is None:
+            raise ValueError("Adaptive sampling needs a threshold and/or max_change")
+        return self
+
+
+class AdaptiveRefiner:
+    """
+    Plans which points of a dense grid to evaluate. Works in index space over
+    the sweep axes, so any point maps back to its row in the full sweep.
+    """
+
+    def __init__(self, spec: AdaptiveSpec, sizes: List[int]):
+        self.spec = spec
+        self.sizes = sizes
+        self.depth = 0
+        self.cells: List[Cell] = []
+        self.planned: set = set()
+
+    def row_index(self, point: Point) -> int:
+        """Row of the full sweep (last axis fastest) for a grid point."""
+        index = 0
+        for position, size in zip(point, self.sizes):
+            index = index * size + position
+        return index
+
+    def coarse(self) -> List[Point]:
+        """Points of the initial coarse grid, ends of every axis included."""
+        coords = []
+        for size in self.sizes:
+            n = min(self.spec.coarse_points, size)
+            if n <= 1:
+                coords.append([0])
+            else:
+                coords.append(sorted({round(k * (size - 1) / (n - 1)) for k in range(n)}))
+        self.cells = [
+            tuple(pairs) for pairs in itertools.product(
+                *[list(zip(c, c[1:])) or [(c[0], c[0])] for c in coords]
+            )
+        ]
+        return self._plan(itertools.product(*coords))
+
+    def refine(self, values: Dict[Point, Any]) -> List[Point]:
+        """
+        Subdivides every interesting cell given the outputs evaluated so far and
+        returns the new points to evaluate. Empty once nothing needs refining.
+        """
+        if self.depth >= self.spec.max_depth:
+            return []
+        self.depth += 1
+
+        next_cells: List[Cell] = []
+        new_points = []
+        for cell in self.cells:
+            if not any(high - low > 1 for low, high in cell):
+                continue  # Already at full resolution
+            if not self._interesting(cell, values):
+                continue
+            splits = []
+            for low, high in cell:
+                if high - low > 1:
+                    mid = (low + high) // 2
+                    splits.append([(low, mid), (mid, high)])
+                else:
+                    splits.append([(low, high)])
+            for sub_cell in itertools.product(*splits):
+                next_cells.append(sub_cell)
+                new_points.extend(self._corners(sub_cell))
+        self.cells = next_cells
+        return self._plan(new_points)
+
+    def _plan(self, points) -> List[Point]:
+        """Dedupes points against everything already planned, honoring max_rows."""
+        planned = []
+        for point in points:
+            if point in self.planned:
+                continue
+            if self.spec.max_rows is not None and len(self.planned) >= self.spec.max_rows:
+                break
+            self.planned.add(point)
+            planned.append(point)
+        return planned
+
+    @staticmethod
+    def _corners(cell: Cell) -> List[Point]:
+        return list(itertools.product(*[sorted({low, high}) for low, high in cell]))
+
+    def _interesting(self, cell: Cell, values: Dict[Point, Any]) -> bool:
+        corner_values = [
+            v for v in (values.get(p) for p in self._corners(cell))
+            if isinstance(v, (int, float)) and not isinstance(v, bool)
+        ]
+        if len(corner_values) < 2:
+            return False
+        low, high = min(corner_values), max(corner_values)
+        if self.spec.threshold is not None and low < self.spec.threshold <= high:
+            return True
+        if self.spec.max_change is not None and high - low > self.spec.max_change:
+            return True
+        return False
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from engine.dedup import row_key
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactManifest:
+    """
+    Record of the exports in a batch output directory: for each file, the
+    fingerprint of what produced it (worksheet, inputs, export format) and its
+    hash. A rerun whose fingerprint matches an intact file reuses it instead
+    of exporting again.
+    """
+    FILENAME = "artifact_manifest.json"
+    SAVE_EVERY = 20
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._worksheets: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._unsaved = 0
+        self.load()
+
+    def fingerprint(self, row_input: Dict[str, Any], export_format: str) -> str:
+        """Identity of an export: row inputs, worksheet version (size, mtime) and format."""
+        path = row_input.get("path")
+        if path not in self._worksheets:
+            try:
+                st = os.stat(path)
+                self._worksheets[path] = (st.st_size, st.st_mtime_ns)
+            except (OSError, TypeError, ValueError):
+                self._worksheets[path] = None
+        digest = hashlib.blake2b(row_key(row_input), digest_size=16)
+        digest.update(json.dumps([self._worksheets[path], export_format]).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _name(self, file_path: str) -> str:
+        return os.path.relpath(file_path, self.output_dir)
+
+    def reusable(self, file_path: str, fingerprint: str) -> bool:
+        """True if file_path was produced from this fingerprint and hasn't changed since."""
+        entry = self.entries.get(self._name(file_path))
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return False
+        try:
+            st = os.stat(file_path)
+            if st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns"):
+                return True
+            # Touched but possibly identical (e.g. restored from a copy): compare content
+            if st.st_size != entry.get("size") or file_sha256(file_path) != entry.get("sha256"):
+                return False
+        except OSError:
+            return False
+        self.record(file_path, fingerprint)
+        return True
+
+    def record(self, file_path: str, fingerprint: str, sha256: Optional[str] = None):
+        """Records a freshly written export; pass sha256 when it is already known."""
+        try:
+            st = os.stat(file_path)
+            entry = {
+                "fingerprint": fingerprint,
+                "sha256": sha256 or file_sha256(file_path),
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+            }
+        except OSError as e:
+            print(f"Warning: Could not record artifact {file_path}: {e}")
+            return
+        self.entries[self._name(file_path)] = entry
+        self._unsaved += 1
+        if self._unsaved >= self.SAVE_EVERY:
+            self.save()
+
+    def sha256(self, file_path: str) -> Optional[str]:
+        entry = self.entries.get(self._name(file_path))
+        return entry.get("sha256") if entry else None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self.entries = {name: dict(entry) for name, entry in saved.get("files", {}).items()}
+        except (json.JSONDecodeError, OSError, AttributeError, TypeError, ValueError) as e:
+            print(f"Warning: Could not load artifact manifest: {e}")
+
+    def save(self):
+        if not self._unsaved:
+            return  # Nothing recorded since the last save
+        self._unsaved = 0
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": 1, "files": self.entries}, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not save artifact manifest: {e}")
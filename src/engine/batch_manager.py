@@ -1,182 +1,573 @@
 import threading
 import time
 import os
-from typing import List, Dict, Any, Optional
+import re
+import shutil
+import hashlib
+from collections import deque
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable
 from engine.manager import EngineManager
-from engine.protocol import JobResult, InputConfig
+from engine.protocol import JobResult, InputConfig, FailureKind, StopCondition
+from engine.sweep import SweepSpec
+from engine.table import TableSource
+from engine.adaptive import AdaptiveSpec, AdaptiveRefiner
+from engine.row_order import order_rows
+from engine.surrogate import SurrogateSpec, SurrogateModel
+from engine.dedup import row_key
+from engine.artifacts import ArtifactManifest
+from engine.wire import to_builtin
+from engine.worker import classify_error
+import numpy as np
+
+
+class JobFailedError(Exception):
+    """A job returned an error (or no result in time), tagged with its FailureKind"""
+    def __init__(self, message: str, kind: FailureKind = FailureKind.UNKNOWN,
+                 harness_replaced: bool = False):
+        super().__init__(message)
+        self.kind = kind
+        self.harness_replaced = harness_replaced  # Engine watchdog already restarted the harness
+
+    @classmethod
+    def from_result(cls, result: Optional[JobResult]) -> "JobFailedError":
+        if result is None:
+            return cls("Job timeout", FailureKind.TIMEOUT)
+        try:
+            kind = FailureKind(result.error_kind)
+        except ValueError:
+            kind = FailureKind.UNKNOWN
+        return cls(result.error_message or "Unknown error", kind,
+                   harness_replaced=bool(result.data.get("harness_replaced")))
+
+
+def _sanitize(s: str) -> str:
+    return re.sub(r'[<>:"/\\|?*]', '_', str(s))
+
+
+def _link_or_copy(src: str, dst: str):
+    """Hard-links dst to src, copying instead where the filesystem can't link."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
 
 class BatchManager:
+    # Recovery ladder, cheapest first. Each retry of a failing row climbs one rung.
+    RECOVERY_LADDER = ("retry", "reopen", "reconnect", "restart")
+    # Rung each failure kind starts on. Input errors are deterministic and never retried.
+    RECOVERY_START = {
+        FailureKind.UNKNOWN: 0,
+        FailureKind.WORKSHEET: 1,
+        FailureKind.CONNECTION: 2,
+        FailureKind.TIMEOUT: 3,
+    }
+    # Extra wait beyond the engine's own deadline; the watchdog normally answers first
+    POLL_GRACE = 10.0
+    # SaveAs format codes per export type
+    EXPORT_FORMATS = {"pdf": 3, "mcdx": 0}
+    RECOVERY_STAGES = {
+        "retry": "Retrying...",
+        "reopen": "Retrying (Reopen File)...",
+        "reconnect": "Retrying (Reconnect)...",
+        "restart": "Retrying (Engine Restart)...",
+    }
+
+    # Finished batches kept in memory; older ones are served from the run history
+    MAX_FINISHED = 20
+
     def __init__(self, engine_manager: EngineManager):
         self.engine = engine_manager
         self.batches: Dict[str, Dict[str, Any]] = {}
+        self.row_sources: Dict[str, Any] = {}  # Batch ID -> inputs list, sweep or table
 
     def start_batch(self, batch_id: str, inputs_list: List[Dict[str, Any]], output_dir: str, 
-                    export_pdf: bool = True, export_mcdx: bool = False):
+                    export_pdf: bool = True, export_mcdx: bool = False,
+                    sweep: Optional[SweepSpec] = None, reorder: bool = False,
+                    stop_when: Optional[StopCondition] = None,
+                    adaptive: Optional[AdaptiveSpec] = None,
+                    surrogate: Optional[SurrogateSpec] = None, dedupe: bool = True,
+                    window: int = 1, chunk_size: int = 1, table: Optional[TableSource] = None):
+        """
+        Starts a batch in a background thread. Rows come either from inputs_list
+        or, when given, from a sweep spec that is expanded lazily row by row,
+        or from an uploaded table read lazily record by record.
+        With reorder=True rows run in an order that minimizes input changes
+        between consecutive rows; results are still reported by original row.
+        (A reordered table is read into memory, since ordering needs every row.)
+        stop_when ends the batch at the first row whose outputs meet it.
+        adaptive (sweeps only) evaluates a coarse grid and refines it where the
+        chosen output crosses a threshold or changes steeply; rows keep their
+        index in the full sweep.
+        surrogate answers rows from an interpolant of the rows calculated so far,
+        spot-checking it against real calculations; such rows are flagged and
+        have no exports. Sweeps then run coarse to fine instead of reordered.
+        With dedupe, a row identical to one already calculated (same worksheet
+        and inputs up to key order and unit spelling) reuses its results, with
+        exports hard-linked or copied under the duplicate's file names.
+        With window > 1, up to `window` rows are queued on the engine at once
+        and handled in the order they finish, each with its own recovery
+        ladder, so the harness never waits for the batch thread between rows.
+        chunk_size > 1 sends them as calculate_many jobs of up to chunk_size
+        rows of one worksheet (and implies a window of at least chunk_size).
+        Exports of queued rows are saved by the harness right after each row.
+        Surrogate batches always run row by row, since which rows to calculate
+        depends on earlier results.
+        """
+        if window < 1 or chunk_size < 1:
+            raise ValueError("window and chunk_size must be at least 1")
+        if adaptive is not None and sweep is None:
+            raise ValueError("Adaptive sampling requires a sweep")
+        if adaptive is not None and surrogate is not None:
+            raise ValueError("Adaptive sampling and surrogate mode can't be combined")
+
         if not os.path.exists(output_dir):
             os.makedirs(output_dir, exist_ok=True)
+
+        rows: Iterable[Tuple[int, Dict[str, Any]]]
+        if sweep is not None:
+            total = sweep.count()
+            if surrogate is not None:
+                rows = sweep.coarse_to_fine_rows()  # Spread real rows over the grid early
+            else:
+                rows = sweep.ordered_rows() if reorder else enumerate(sweep.rows())
+        elif table is not None:
+            total = table.count()
+            rows = self._reordered(list(table.rows())) if reorder else enumerate(table.rows())
+        else:
+            total = len(inputs_list)
+            rows = self._reordered(inputs_list) if reorder else enumerate(inputs_list)
             
+        self.row_sources[batch_id] = sweep if sweep is not None else table if table is not None else inputs_list
         self.batches[batch_id] = {
             "id": batch_id,
-            "total": len(inputs_list),
+            "total": total,
             "completed": 0,
-            "results": [],
+            "results": {},  # Row index -> result; listed by row only when the status is read
             "generated_files": [],
             "status": "running",
-            "error": None
+            "error": None,
+            "stop_reason": None,
+            "sweep": sweep.model_dump() if sweep is not None else None,
+            "surrogate": None,
+            "duplicates": 0
         }
+        self.engine.store.start_run(batch_id, "batch", self._summary(self.batches[batch_id]), config={
+            "output_dir": output_dir,
+            "export_pdf": export_pdf,
+            "export_mcdx": export_mcdx,
+            "reorder": reorder,
+            "stop_when": stop_when.model_dump() if stop_when is not None else None,
+            "adaptive": adaptive.model_dump() if adaptive is not None else None,
+            "surrogate": surrogate.model_dump() if surrogate is not None else None,
+            "dedupe": dedupe,
+            "window": window,
+            "chunk_size": chunk_size,
+            "table": table.spec.model_dump() if table is not None else None,
+        })
+
+        if adaptive is not None:
+            # Rows are planned pass by pass; total grows as refinement adds them
+            self.batches[batch_id]["total"] = 0
+            target = self._process_adaptive
+            args = (batch_id, sweep, adaptive, output_dir, export_pdf, export_mcdx, stop_when,
+                    window, chunk_size)
+        else:
+            target = self._process_batch
+            args = (batch_id, rows, output_dir, export_pdf, export_mcdx, stop_when, surrogate, dedupe,
+                    window, chunk_size)
         
         thread = threading.Thread(
-            target=self._process_batch,
-            args=(batch_id, inputs_list, output_dir, export_pdf, export_mcdx),
+            target=target,
+            args=args,
             daemon=True
         )
         thread.start()
 
-    def _process_batch(self, batch_id: str, inputs_list: List[Dict[str, Any]], output_dir: str,
-                       export_pdf: bool, export_mcdx: bool):
+    @staticmethod
+    def _reordered(inputs_list: List[Dict[str, Any]]) -> Iterable[Tuple[int, Dict[str, Any]]]:
+        """Yields (row index, row) in optimized order; the ordering runs in the batch thread."""
+        for i in order_rows(inputs_list):
+            yield i, inputs_list[i]
+
+    def _process_batch(self, batch_id: str, rows: Iterable[Tuple[int, Dict[str, Any]]], output_dir: str,
+                       export_pdf: bool, export_mcdx: bool, stop_when: Optional[StopCondition] = None,
+                       surrogate: Optional[SurrogateSpec] = None, dedupe: bool = False,
+                       window: int = 1, chunk_size: int = 1):
         batch = self.batches[batch_id]
-        import re
-        
-        def sanitize(s: str) -> str:
-            return re.sub(r'[<>:"/\\|?*]', '_', str(s))
-
-        # Helper to update execution stage for current row
-        def update_stage(row_idx, stage_msg):
-            # Check if we already have a partial result for this row, if so update it
-            # Otherwise create a new pending result
-            found = False
-            for res in batch["results"]:
-                if res["row"] == row_idx:
-                    res["stage"] = stage_msg
-                    found = True
+        model = SurrogateModel(surrogate) if surrogate is not None else None
+        if model is not None:
+            batch["surrogate"] = model.stats
+        calculated: Dict[bytes, Dict[str, Any]] = {}  # Row key -> result of its first successful row
+        manifest = ArtifactManifest(output_dir)
+
+        if model is None and max(window, chunk_size) > 1:
+            _RowPipeline(self, batch, output_dir, export_pdf, export_mcdx, manifest, window, chunk_size,
+                         stop_when, calculated if dedupe else None).run(rows)
+            rows = ()  # All handled by the pipeline
+
+        for i, row_input in rows:
+            if batch["status"] == "stopped":
+                break
+            key = row_key(row_input) if dedupe else None
+            if key in calculated:
+                data = self._fan_out(batch, i, row_input, calculated[key], output_dir, manifest)
+                if self._stop_condition_met(batch, i, data, stop_when):
                     break
-            if not found:
-                batch["results"].append({
-                    "row": row_idx,
-                    "status": "running",
-                    "stage": stage_msg
+                continue
+
+            prediction = model.predict(row_input) if model is not None else None
+            if prediction is not None and not model.spot_check_due():
+                # Approximate rows are reported but never end the batch
+                model.record_prediction()
+                self._update_stage(batch, i, "Estimating...")
+                batch["results"][i].update({
+                    "status": "success",
+                    "stage": "Surrogate",
+                    "data": {"outputs": prediction.outputs},
+                    "surrogate": True,
+                    "error_estimate": prediction.error_estimate
                 })
+                self._row_finished(batch, i, row_input)
+                continue
 
-        for i, row_input in enumerate(inputs_list):
-            if batch["status"] == "stopped":
+            data = self._run_row(batch, i, row_input, output_dir, export_pdf, export_mcdx, manifest)
+            if key is not None and data is not None:
+                calculated[key] = self._row_result(batch, i)
+            if model is not None and data is not None:
+                check = model.observe(row_input, data.get("outputs", {}), prediction)
+                if check is not None:
+                    self._row_result(batch, i)["surrogate_check"] = check
+            if self._stop_condition_met(batch, i, data, stop_when):
                 break
-                
-            success = False
-            retries = 1
-            while not success and retries >= 0:
+
+        manifest.save()
+        if batch["status"] == "running":
+            batch["status"] = "completed"
+        self._finish(batch)
+
+    def _process_adaptive(self, batch_id: str, sweep: SweepSpec, adaptive: AdaptiveSpec, output_dir: str,
+                          export_pdf: bool, export_mcdx: bool, stop_when: Optional[StopCondition] = None,
+                          window: int = 1, chunk_size: int = 1):
+        batch = self.batches[batch_id]
+        grid = sweep.grid
+        axes = grid.axes if grid.type == "product" else [grid]
+        refiner = AdaptiveRefiner(adaptive, [axis.count() for axis in axes])
+        manifest = ArtifactManifest(output_dir)
+
+        values: Dict[Tuple[int, ...], Any] = {}
+        points = refiner.coarse()
+        stopped = False
+        while points and not stopped:
+            batch["total"] += len(points)
+            if max(window, chunk_size) > 1:
+                # Points of one pass don't depend on each other, so they can be pipelined
+                by_row = {refiner.row_index(point): point for point in points}
+
+                def record(i: int, data: Optional[Dict[str, Any]]):
+                    if data is not None:
+                        values[by_row[i]] = data.get("outputs", {}).get(adaptive.output)
+
+                pipeline = _RowPipeline(self, batch, output_dir, export_pdf, export_mcdx, manifest,
+                                        window, chunk_size, stop_when, on_done=record)
+                stopped = pipeline.run((i, sweep.row_at(i)) for i in by_row) or batch["status"] == "stopped"
+                points = ()
+            for point in points:
+                if batch["status"] == "stopped":
+                    stopped = True
+                    break
+                i = refiner.row_index(point)
+                data = self._run_row(batch, i, sweep.row_at(i), output_dir, export_pdf, export_mcdx, manifest)
+                if data is not None:
+                    values[point] = data.get("outputs", {}).get(adaptive.output)
+                if self._stop_condition_met(batch, i, data, stop_when):
+                    stopped = True
+                    break
+            if not stopped:
+                points = refiner.refine(values)
+
+        manifest.save()
+        if batch["status"] == "running":
+            batch["status"] = "completed"
+        self._finish(batch)
+
+    def _row_finished(self, batch: Dict[str, Any], i: int, row_input: Dict[str, Any]):
+        """Counts a row whose result is final and records it in the run history."""
+        batch["completed"] += 1
+        self.engine.store.record_row(batch["id"], i, row_input, self._row_result(batch, i))
+
+    @staticmethod
+    def _summary(batch: Dict[str, Any]) -> Dict[str, Any]:
+        """Batch status without its rows, as kept in the run history."""
+        return {k: v for k, v in batch.items() if k not in ("results", "generated_files")}
+
+    def _finish(self, batch: Dict[str, Any]):
+        """
+        Records the end of a batch. Beyond MAX_FINISHED, the oldest finished
+        batches are dropped from memory; their status is then read back from
+        the run history.
+        """
+        self.engine.store.finish_run(batch["id"], self._summary(batch))
+        source = self.row_sources.get(batch["id"])
+        close = getattr(source, "close", None)  # Tables; duck-typed like get_row_input
+        if close is not None:
+            close()  # Reopened if rows are looked up later
+        finished = [batch_id for batch_id, b in list(self.batches.items()) if b["status"] != "running"]
+        for batch_id in finished[:max(len(finished) - self.MAX_FINISHED, 0)]:
+            self.batches.pop(batch_id, None)
+            self.row_sources.pop(batch_id, None)
+
+    def _fan_out(self, batch: Dict[str, Any], i: int, row_input: Dict[str, Any],
+                 source: Dict[str, Any], output_dir: str,
+                 manifest: Optional[ArtifactManifest] = None) -> Dict[str, Any]:
+        """
+        Reports a duplicate row with the results of the identical row `source`,
+        linking (or copying) its exports under this row's file names.
+        """
+        self._update_stage(batch, i, "Reusing duplicate...")
+        _, _, filename_base = self._row_job(row_input, i)
+        exports = {}
+        for field, ext in (("pdf", ".pdf"), ("mcdx", ".mcdx")):
+            src = source.get(field)
+            exports[field] = None
+            if not src:
+                continue
+            target = os.path.join(output_dir, f"{filename_base}{ext}")
+            if os.path.abspath(target) != os.path.abspath(src):
                 try:
-                    update_stage(i, "Calculating...")
-                    
-                    # 1. Submit job (assuming calculate_job command)
-                    path = row_input.get("path")
-                    base_name = os.path.splitext(os.path.basename(path))[0]
-
-                    # Extract input configs and build suffix for filename
-                    input_configs = []
-                    suffix_parts = []
-                    for k, v in row_input.items():
-                        if k == "path":
-                            continue
-                        
-                        val = v["value"] if isinstance(v, dict) and "value" in v else v
-                        units = v.get("units") if isinstance(v, dict) else None
-                        
-                        input_configs.append(InputConfig(alias=k, value=val, units=units))
-                        suffix_parts.append(f"{sanitize(k)}-{sanitize(val)}")
-
-                    filename_base = f"{base_name}_{'_'.join(suffix_parts)}" if suffix_parts else f"{base_name}_{i}"
-                    
-                    job_id = self.engine.submit_job("calculate_job", {"path": path, "inputs": input_configs})
+                    _link_or_copy(src, target)
+                except OSError as e:
+                    print(f"Warning: {field.upper()} copy of row {source['row']} failed: {e}")
+                    continue
+                batch["generated_files"].append(target)
+                if manifest is not None:
+                    manifest.record(target, manifest.fingerprint(row_input, field), manifest.sha256(src))
+            exports[field] = target
+
+        self._row_result(batch, i).update({
+            "status": "success",
+            "stage": "Completed",
+            "data": source["data"],
+            "duplicate_of": source["row"],
+            **exports
+        })
+        self._row_finished(batch, i, row_input)
+        batch["duplicates"] += 1
+        return source["data"]
+
+    @staticmethod
+    def _row_result(batch: Dict[str, Any], row_idx: int) -> Optional[Dict[str, Any]]:
+        return batch["results"].get(row_idx)
+
+    @staticmethod
+    def _row_job(row_input: Dict[str, Any], i: int) -> Tuple[str, List[InputConfig], str]:
+        """Worksheet path, input configs and export file name (without extension) of a row."""
+        path = row_input.get("path")
+        base_name = os.path.splitext(os.path.basename(path))[0]
+
+        # Extract input configs and build suffix for filename
+        input_configs = []
+        suffix_parts = []
+        for k, v in row_input.items():
+            if k == "path":
+                continue
+
+            val = v["value"] if isinstance(v, dict) and "value" in v else v
+            units = v.get("units") if isinstance(v, dict) else None
+
+            if isinstance(val, list):
+                # Matrix input: an array goes to the engine in shared memory when large,
+                # and the file name gets a digest instead of the values
+                val = np.asarray(val, dtype=float)
+                digest = hashlib.blake2b(val.tobytes(), digest_size=4).hexdigest()
+                suffix_parts.append(f"{_sanitize(k)}-{digest}")
+            else:
+                suffix_parts.append(f"{_sanitize(k)}-{_sanitize(val)}")
+            input_configs.append(InputConfig(alias=k, value=val, units=units))
+
+        filename_base = f"{base_name}_{'_'.join(suffix_parts)}" if suffix_parts else f"{base_name}_{i}"
+        return path, input_configs, filename_base
+
+    def _stop_condition_met(self, batch: Dict[str, Any], i: int, data: Optional[Dict[str, Any]],
+                            stop_when: Optional[StopCondition]) -> bool:
+        """Checks a finished row against the batch's stop condition, recording why it stopped."""
+        if stop_when is None or data is None or not stop_when.is_met(data.get("outputs", {})):
+            return False
+        batch["stop_reason"] = (
+            f"Stop condition met at row {i}: {stop_when.output} {stop_when.op} {stop_when.value}"
+        )
+        batch["total"] = batch["completed"]
+        return True
+
+    def _update_stage(self, batch: Dict[str, Any], row_idx: int, stage_msg: str):
+        """Update execution stage for a row, creating its pending result if needed."""
+        res = batch["results"].get(row_idx)
+        if res is not None:
+            res["stage"] = stage_msg
+        else:
+            batch["results"][row_idx] = {
+                "row": row_idx,
+                "status": "running",
+                "stage": stage_msg
+            }
+
+    def _run_row(self, batch: Dict[str, Any], i: int, row_input: Dict[str, Any], output_dir: str,
+                 export_pdf: bool, export_mcdx: bool,
+                 manifest: Optional[ArtifactManifest] = None) -> Optional[Dict[str, Any]]:
+        """
+        Calculates and exports one row, walking the recovery ladder on failure.
+        Returns the job data on success, None if the row failed.
+        """
+        batch_id = batch["id"]
+        rung = 0  # Next recovery rung if this row fails
+        force_reopen = False
+        while True:
+            try:
+                self._update_stage(batch, i, "Calculating...")
+                
+                # 1. Submit job (assuming calculate_job command)
+                path, input_configs, filename_base = self._row_job(row_input, i)
+
+                payload = {"path": path, "inputs": input_configs}
+                if force_reopen:
+                    payload["force_reopen"] = True
+                job_id = self.engine.submit_job("calculate_job", payload)
+                
+                # 2. Poll for completion - the engine watchdog enforces the job deadline
+                result = self._poll_result(job_id, timeout=self._job_timeout("calculate_job"))
+                if result and result.status == "success":
+                    # 3. Export as PDF / MCDX if requested
+                    pdf_path = mcdx_path = None
+                    if export_pdf:
+                        pdf_path = self._export(batch, i, row_input, output_dir, filename_base, "pdf", manifest)
+                    if export_mcdx:
+                        mcdx_path = self._export(batch, i, row_input, output_dir, filename_base, "mcdx", manifest)
+
+                    # Finalize row; matrix outputs become lists so the status stays JSON
+                    data = to_builtin(result.data)
+                    # Update the existing 'running' entry
+                    batch["results"][i].update({
+                        "status": "success",
+                        "stage": "Completed",
+                        "data": data,
+                        "pdf": pdf_path,
+                        "mcdx": mcdx_path
+                    })
                     
-                    # 2. Poll for completion - INCREASED TIMEOUT to 120s
-                    result = self._poll_result(job_id, timeout=120.0)
-                    if result and result.status == "success":
-                        pdf_path = None
-                        mcdx_path = None
-
-                        # 3. Export as PDF if requested
-                        if export_pdf:
-                            update_stage(i, "Saving PDF...")
-                            save_path = os.path.join(output_dir, f"{filename_base}.pdf")
-                            # Delete if exists to avoid Mathcad prompt
-                            if os.path.exists(save_path):
-                                try:
-                                    os.remove(save_path)
-                                except:
-                                    pass
-                                    
-                            save_job_id = self.engine.submit_job("save_as", {"path": save_path, "format": 3})
-                            save_result = self._poll_result(save_job_id, timeout=120.0)
-                            if save_result and save_result.status == "success":
-                                pdf_path = save_path
-                                batch["generated_files"].append(pdf_path)
-                            else:
-                                print(f"Warning: PDF export failed: {save_result.error_message if save_result else 'Timeout'}")
-                        
-                        # 4. Export as MCDX if requested
-                        if export_mcdx:
-                            update_stage(i, "Saving MCDX...")
-                            save_path = os.path.join(output_dir, f"{filename_base}.mcdx")
-                            # Delete if exists
-                            if os.path.exists(save_path):
-                                try:
-                                    os.remove(save_path)
-                                except:
-                                    pass
-
-                            save_job_id = self.engine.submit_job("save_as", {"path": save_path, "format": 0})
-                            save_result = self._poll_result(save_job_id, timeout=120.0)
-                            if save_result and save_result.status == "success":
-                                mcdx_path = save_path
-                                batch["generated_files"].append(mcdx_path)
-                            else:
-                                print(f"Warning: MCDX export failed: {save_result.error_message if save_result else 'Timeout'}")
-                        
-                        # Finalize row
-                        # Update the existing 'running' entry
-                        for res in batch["results"]:
-                            if res["row"] == i:
-                                res.update({
-                                    "status": "success",
-                                    "stage": "Completed",
-                                    "data": result.data,
-                                    "pdf": pdf_path,
-                                    "mcdx": mcdx_path
-                                })
-                                break
-                        
-                        batch["completed"] += 1
-                        success = True
-                    else:
-                        raise Exception(result.error_message if result else "Job timeout")
-                except Exception as e:
-                    print(f"Batch {batch_id} Row {i} failed: {e}")
-                    retries -= 1
-                    stages = [] # dummy
-                    if retries >= 0:
-                        update_stage(i, "Retrying (Engine Restart)...")
-                        print("Restarting engine and retrying...")
-                        try:
-                            self.engine.restart_engine()
-                            conn_job = self.engine.submit_job("connect")
-                            self._poll_result(conn_job)
-                        except:
-                            pass
+                    self._row_finished(batch, i, row_input)
+                    return data
+                else:
+                    raise JobFailedError.from_result(result)
+            except Exception as e:
+                print(f"Batch {batch_id} Row {i} failed: {e}")
+                kind = classify_error(e)  # Rows that fail to build are INPUT, like in the harness
+                rung = max(rung, self.RECOVERY_START.get(kind, len(self.RECOVERY_LADDER)))
+                if rung < len(self.RECOVERY_LADDER):
+                    step = self.RECOVERY_LADDER[rung]
+                    rung += 1
+                    self._update_stage(batch, i, self.RECOVERY_STAGES[step])
+                    if step == "reopen":
+                        force_reopen = True
+                    if step == "restart" and getattr(e, "harness_replaced", False):
+                        print("Engine watchdog already replaced the harness, retrying...")
                     else:
-                        # Update existing entry to failed
-                        for res in batch["results"]:
-                            if res["row"] == i:
-                                res.update({
-                                    "status": "failed",
-                                    "stage": "Failed",
-                                    "error": str(e)
-                                })
-                                break
-                        batch["completed"] += 1
-                        success = True 
+                        self._recover(step)
+                else:
+                    # Update existing entry to failed
+                    batch["results"][i].update({
+                        "status": "failed",
+                        "stage": "Failed",
+                        "error": str(e),
+                        "error_kind": kind.value
+                    })
+                    self._row_finished(batch, i, row_input)
+                    return None
 
-        if batch["status"] == "running":
-            batch["status"] = "completed"
+    def _export(self, batch: Dict[str, Any], i: int, row_input: Dict[str, Any], output_dir: str,
+                filename_base: str, export_type: str, manifest: Optional[ArtifactManifest]) -> Optional[str]:
+        """
+        Saves the calculated worksheet as `export_type`, or reuses the file a
+        previous run exported from the same worksheet and inputs. Returns the
+        file path, or None if the export failed.
+        """
+        label = export_type.upper()
+        save_path, fingerprint, reused = self._export_target(row_input, output_dir, filename_base,
+                                                             export_type, manifest)
+        if reused:
+            self._update_stage(batch, i, f"Reusing {label}...")
+            batch["generated_files"].append(save_path)
+            return save_path
+
+        self._update_stage(batch, i, f"Saving {label}...")
+        # Delete if exists to avoid Mathcad prompt
+        if os.path.exists(save_path):
+            try:
+                os.remove(save_path)
+            except:
+                pass
+
+        save_job_id = self.engine.submit_job(
+            "save_as", {"path": save_path, "format": self.EXPORT_FORMATS[export_type]}
+        )
+        save_result = self._poll_result(save_job_id, timeout=self._job_timeout("save_as"))
+        if save_result and save_result.status == "success":
+            batch["generated_files"].append(save_path)
+            if manifest is not None:
+                manifest.record(save_path, fingerprint)
+            return save_path
+        print(f"Warning: {label} export failed: {save_result.error_message if save_result else 'Timeout'}")
+        return None
+
+    @staticmethod
+    def _export_target(row_input: Dict[str, Any], output_dir: str, filename_base: str, export_type: str,
+                       manifest: Optional[ArtifactManifest]) -> Tuple[str, Optional[str], bool]:
+        """(file path, fingerprint, whether a previous run's file can be reused) of an export."""
+        save_path = os.path.join(output_dir, f"{filename_base}.{export_type}")
+        fingerprint = manifest.fingerprint(row_input, export_type) if manifest is not None else None
+        reused = manifest is not None and manifest.reusable(save_path, fingerprint)
+        return save_path, fingerprint, reused
+
+    @staticmethod
+    def _saved_export(batch: Dict[str, Any], result: JobResult, target: Optional[Tuple[str, Optional[str], bool]],
+                      manifest: Optional[ArtifactManifest]) -> Optional[str]:
+        """Records an export the harness saved along with a pipelined row (or reused); returns its path."""
+        if target is None:
+            return None
+        save_path, fingerprint, reused = target
+        if not reused:
+            error = (result.data.get("exports") or {}).get(save_path, "Not saved")
+            if error is not None:
+                print(f"Warning: Export to {save_path} failed: {error}")
+                return None
+            if manifest is not None:
+                manifest.record(save_path, fingerprint)
+        batch["generated_files"].append(save_path)
+        return save_path
+
+    def _recover(self, step: str):
+        """
+        Run one rung of the recovery ladder before the row is retried.
+        "retry" needs no action and "reopen" is handled by the next calculate_job
+        payload, so only reconnect and restart talk to the engine here.
+        """
+        try:
+            if step == "reconnect":
+                print("Reconnecting to Mathcad and retrying...")
+                conn_job = self.engine.submit_job("reconnect")
+                self._poll_result(conn_job, timeout=self._job_timeout("reconnect"))
+            elif step == "restart":
+                print("Restarting engine and retrying...")
+                self.engine.restart_engine()
+                conn_job = self.engine.submit_job("connect")
+                self._poll_result(conn_job, timeout=self._job_timeout("connect"))
+        except Exception as e:
+            print(f"Recovery step '{step}' failed: {e}")
+
+    def _job_timeout(self, command: str) -> float:
+        """How long to poll for a command's result before giving up on it."""
+        return self.engine.get_timeout(command) + self.POLL_GRACE
 
     def _poll_result(self, job_id: str, timeout: float = 30.0) -> Optional[JobResult]:
         """
@@ -192,8 +583,253 @@ class BatchManager:
         return None
 
     def get_status(self, batch_id: str) -> Optional[Dict[str, Any]]:
-        return self.batches.get(batch_id)
+        batch = self.batches.get(batch_id)
+        if batch is not None:
+            # Rows may run out of order; they are listed by original row here only
+            results = sorted(list(batch["results"].values()), key=lambda r: r["row"])
+            return {**batch, "results": results}
+        # Finished earlier (or before a restart): rebuild it from the run history
+        run = self.engine.store.get_run(batch_id)
+        if run is None or run["kind"] != "batch":
+            return None
+        return {
+            **run["summary"],
+            "status": run["status"],
+            "results": self.engine.store.run_rows(batch_id),
+            "generated_files": self.engine.store.run_artifacts(batch_id),
+        }
+
+    def get_row_input(self, batch_id: str, row_idx: int) -> Optional[Dict[str, Any]]:
+        """Inputs of a batch row by its original index."""
+        source = self.row_sources.get(batch_id)
+        if source is None:
+            return self.engine.store.row_input(batch_id, row_idx)
+        try:
+            # Duck-typed: the server builds sweeps from the src.engine package, a distinct class
+            if hasattr(source, "row_at"):
+                return source.row_at(row_idx)
+            return source[row_idx]
+        except IndexError:
+            return None
 
     def stop_batch(self, batch_id: str):
         if batch_id in self.batches:
             self.batches[batch_id]["status"] = "stopped"
+
+
+class _RowTask:
+    """A row in a _RowPipeline: the job it is queued as and its place on the recovery ladder."""
+    __slots__ = ("i", "row_input", "key", "planned", "job_id", "deadline", "rung", "force_reopen")
+
+    def __init__(self, i: int, row_input: Dict[str, Any], key: Optional[bytes]):
+        self.i = i
+        self.row_input = row_input
+        self.key = key  # Row key when deduplicating
+        self.planned: Optional[Dict[str, Tuple[str, Optional[str], bool]]] = None  # Export targets
+        self.job_id: Optional[str] = None
+        self.deadline = 0.0
+        self.rung = 0  # Next recovery rung if the row fails
+        self.force_reopen = False
+
+
+class _RowPipeline:
+    """
+    Runs batch rows with up to `window` of them queued on the engine at once,
+    in calculate_many jobs of up to chunk_size rows of one worksheet.
+
+    Rows are pulled from the row iterator only while the window has room, so
+    a lazy sweep is never expanded further ahead than the engine can use.
+    Finished rows are handled in whatever order their results arrive; a
+    failed row climbs the recovery ladder and is queued again on its own
+    without holding up the others. Since later rows are already queued
+    behind a row, its exports are saved by the harness along with it.
+    """
+    POLL_INTERVAL = 0.02
+
+    def __init__(self, manager: BatchManager, batch: Dict[str, Any], output_dir: str,
+                 export_pdf: bool, export_mcdx: bool, manifest: ArtifactManifest,
+                 window: int, chunk_size: int, stop_when: Optional[StopCondition] = None,
+                 calculated: Optional[Dict[bytes, Dict[str, Any]]] = None,
+                 on_done: Optional[Callable[[int, Optional[Dict[str, Any]]], None]] = None):
+        self.manager = manager
+        self.engine = manager.engine
+        self.batch = batch
+        self.output_dir = output_dir
+        self.export_types = [t for t, wanted in (("pdf", export_pdf), ("mcdx", export_mcdx)) if wanted]
+        self.manifest = manifest
+        self.window = max(window, chunk_size)
+        self.chunk_size = chunk_size
+        self.stop_when = stop_when
+        self.calculated = calculated  # Row key -> result of its first successful row, when deduplicating
+        self.on_done = on_done  # Called with (row index, data or None) for every finished row
+
+        self.ready: deque = deque()  # Tasks to queue: new rows and retries
+        self.in_flight: Dict[str, _RowTask] = {}
+        self.waiting: Dict[bytes, List[Tuple[int, Dict[str, Any]]]] = {}  # Duplicates of rows still running
+        self.stopping = False  # No new rows or retries; queued rows are still collected
+        self.met = False
+
+    def run(self, rows: Iterable[Tuple[int, Dict[str, Any]]]) -> bool:
+        """Runs the rows; returns True if the stop condition ended the batch."""
+        rows = iter(rows)
+        exhausted = False
+        while True:
+            if self.batch["status"] == "stopped":
+                self.stopping = True
+            while not (self.stopping or exhausted) and len(self.ready) + len(self.in_flight) < self.window:
+                row = next(rows, None)
+                if row is None:
+                    exhausted = True
+                else:
+                    self._add(*row)
+            self._queue_ready()
+            if not self.in_flight and not self.ready:
+                if self.stopping or exhausted:
+                    break
+                continue
+            if not self._collect():
+                time.sleep(self.POLL_INTERVAL)
+
+        if self.met:
+            self.batch["total"] = self.batch["completed"]  # Rows already queued at the stop were kept
+        return self.met
+
+    def _add(self, i: int, row_input: Dict[str, Any]):
+        key = row_key(row_input) if self.calculated is not None else None
+        if key is not None and key in self.calculated:
+            self._done(i, self.manager._fan_out(self.batch, i, row_input, self.calculated[key],
+                                                self.output_dir, self.manifest))
+        elif key is not None and key in self.waiting:
+            self.waiting[key].append((i, row_input))  # Fanned out once the first occurrence finishes
+        else:
+            if key is not None:
+                self.waiting[key] = []
+            self.ready.append(_RowTask(i, row_input, key))
+
+    def _queue_ready(self):
+        """Queues ready tasks, consecutive rows of one worksheet sharing a calculate_many job."""
+        while self.ready:
+            chunk = [self.ready.popleft()]
+            path = chunk[0].row_input.get("path")
+            # A retry that reopens the worksheet goes on its own
+            while (self.ready and len(chunk) < self.chunk_size and not chunk[0].force_reopen
+                   and not self.ready[0].force_reopen and self.ready[0].row_input.get("path") == path):
+                chunk.append(self.ready.popleft())
+            self._queue_chunk(chunk)
+
+    def _queue_chunk(self, chunk: List[_RowTask]):
+        tasks, rows = [], []
+        for task in chunk:
+            self.manager._update_stage(self.batch, task.i, "Calculating...")
+            try:
+                _, input_configs, filename_base = self.manager._row_job(task.row_input, task.i)
+                if task.planned is None:
+                    task.planned = {
+                        export_type: self.manager._export_target(task.row_input, self.output_dir, filename_base,
+                                                                 export_type, self.manifest)
+                        for export_type in self.export_types
+                    }
+            except Exception as e:
+                self._failed(task, e)
+                continue
+            exports = [{"path": save_path, "format": BatchManager.EXPORT_FORMATS[export_type]}
+                       for export_type, (save_path, _, reused) in task.planned.items() if not reused]
+            tasks.append(task)
+            rows.append({"inputs": input_configs, "exports": exports})
+        if not tasks:
+            return
+        try:
+            job_ids = self.engine.submit_many(tasks[0].row_input.get("path"), rows,
+                                              force_reopen=tasks[0].force_reopen)
+        except Exception as e:
+            for task in tasks:
+                self._failed(task, e)
+            return
+        timeout = self.manager._job_timeout("calculate_job")
+        for task, job_id in zip(tasks, job_ids):
+            # Backstop only (the engine watchdog enforces the real deadline): a
+            # queued row waits for every row ahead of it
+            task.job_id = job_id
+            task.deadline = time.time() + timeout * (len(self.in_flight) + 1)
+            self.in_flight[job_id] = task
+
+    def _collect(self) -> bool:
+        """Handles every row whose result is in; returns False if none was."""
+        finished = []
+        now = time.time()
+        for job_id, task in list(self.in_flight.items()):
+            result = self.engine.get_job(job_id)
+            if result is not None or now > task.deadline:
+                del self.in_flight[job_id]
+                finished.append((task, result))
+        for task, result in finished:
+            if result is not None and result.status == "success":
+                self._succeeded(task, result)
+            else:
+                self._failed(task, JobFailedError.from_result(result))
+        return bool(finished)
+
+    def _succeeded(self, task: _RowTask, result: JobResult):
+        manager = self.manager
+        pdf_path = manager._saved_export(self.batch, result, task.planned.get("pdf"), self.manifest)
+        mcdx_path = manager._saved_export(self.batch, result, task.planned.get("mcdx"), self.manifest)
+        # Matrix outputs become lists so the status stays JSON
+        data = to_builtin({k: v for k, v in result.data.items() if k != "exports"})
+        row = manager._row_result(self.batch, task.i)
+        row.update({
+            "status": "success",
+            "stage": "Completed",
+            "data": data,
+            "pdf": pdf_path,
+            "mcdx": mcdx_path
+        })
+        self.manager._row_finished(self.batch, task.i, task.row_input)
+        self._done(task.i, data)
+        if task.key is not None:
+            self.calculated[task.key] = row
+            for i, row_input in self.waiting.pop(task.key, []):
+                if not self.stopping:
+                    self._done(i, manager._fan_out(self.batch, i, row_input, row, self.output_dir, self.manifest))
+
+    def _failed(self, task: _RowTask, error: Exception):
+        """Queues the row again one rung up the recovery ladder, or records it as failed."""
+        manager = self.manager
+        print(f"Batch {self.batch['id']} Row {task.i} failed: {error}")
+        kind = classify_error(error)
+        rung = max(task.rung, manager.RECOVERY_START.get(kind, len(manager.RECOVERY_LADDER)))
+        if rung < len(manager.RECOVERY_LADDER) and not self.stopping:
+            step = manager.RECOVERY_LADDER[rung]
+            task.rung = rung + 1
+            manager._update_stage(self.batch, task.i, manager.RECOVERY_STAGES[step])
+            if step == "reopen":
+                task.force_reopen = True
+            if step == "restart" and getattr(error, "harness_replaced", False):
+                print("Engine watchdog already replaced the harness, retrying...")
+            elif step in ("reconnect", "restart"):
+                manager._recover(step)
+                if step == "restart":
+                    # A restarted engine has dropped everything that was queued
+                    self.ready.extend(self.in_flight.values())
+                    self.in_flight.clear()
+            self.ready.append(task)
+            return
+
+        manager._row_result(self.batch, task.i).update({
+            "status": "failed",
+            "stage": "Failed",
+            "error": str(error),
+            "error_kind": kind.value
+        })
+        self.manager._row_finished(self.batch, task.i, task.row_input)
+        # The first waiting duplicate of a failed row gets a try of its own
+        duplicates = self.waiting.pop(task.key, []) if task.key is not None else []
+        if duplicates and not self.stopping:
+            self.waiting[task.key] = duplicates[1:]
+            self.ready.append(_RowTask(*duplicates[0], task.key))
+        self._done(task.i, None)
+
+    def _done(self, i: int, data: Optional[Dict[str, Any]]):
+        if self.on_done is not None:
+            self.on_done(i, data)
+        if not self.met and self.manager._stop_condition_met(self.batch, i, data, self.stop_when):
+            self.met = self.stopping = True
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+# Spellings that Mathcad treats as the same unit, mapped to one canonical form.
+# Unit names are otherwise case-sensitive (mm vs Mm), so only exact spellings are listed.
+_UNIT_ALIASES = {
+    "feet": "ft", "foot": "ft",
+    "inch": "in", "inches": "in",
+    "kips": "kip",
+    "meter": "m", "meters": "m", "metre": "m", "metres": "m",
+    "millimeter": "mm", "millimeters": "mm",
+    "centimeter": "cm", "centimeters": "cm",
+    "second": "s", "seconds": "s",
+    "lbs": "lb",
+    "kilonewton": "kN", "kilonewtons": "kN",
+    "newton": "N", "newtons": "N",
+    "megapascal": "MPa",
+}
+
+
+def canonical_units(units: Optional[str]) -> Optional[str]:
+    """Canonical spelling of a units string; None for no units, like MathcadWorker.set_input."""
+    if units is None:
+        return None
+    units = "".join(units.split()).replace("²", "^2").replace("³", "^3")
+    if units == "" or units.lower() == "unitless":
+        return None
+    return _UNIT_ALIASES.get(units, units)
+
+
+def _canonical_value(v: Any) -> Any:
+    units = None
+    if isinstance(v, dict) and "value" in v:
+        v, units = v["value"], v.get("units")
+    if isinstance(v, str):
+        return [v, None]  # Strings are set as-is, units don't apply
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        v = float(v)  # 10 and 10.0 set the same input
+    return [v, canonical_units(units)]
+
+
+def row_key(row: Dict[str, Any]) -> bytes:
+    """
+    Content address of a batch row: a digest of its worksheet path and inputs,
+    independent of key order, int/float spelling and equivalent unit spellings.
+    Rows with the same key produce the same results.
+    """
+    canonical = {}
+    for alias, v in row.items():
+        if alias == "path":
+            canonical[alias] = os.path.normcase(os.path.abspath(v)) if isinstance(v, str) else v
+        else:
+            canonical[alias] = _canonical_value(v)
+    text = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
@@ -1,9 +1,11 @@
 import time
 import multiprocessing
+import threading
 import traceback
 import sys
 import os
 from queue import Empty
+from typing import Any, Dict, Iterator, List, Optional
 
 # Ensure we can import sibling modules when running in a separate process
 # This might be redundant if the environment is set up correctly, but safe for standalone
@@ -12,161 +14,401 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-from engine.protocol import JobRequest, JobResult, InputConfig
-from engine.worker import MathcadWorker
+from engine.protocol import JobRequest, JobResult, InputConfig, FailureKind
+from engine.worker import MathcadWorker, classify_error
+from engine.optimize import bisection, brent, nelder_mead
+from engine.wire import SharedArrays, decode_requests, encode_results
 
-def run_harness(input_queue: multiprocessing.Queue, output_queue: multiprocessing.Queue):
+# Longest a finished result waits to share a queue message with later ones
+RESULT_FLUSH_INTERVAL = 0.05
+
+# Failure kinds whose traceback this harness already sent; later failures of
+# the same kind send just the exception, which keeps error rows small
+_traced_kinds = set()
+
+def apply_inputs(worker: MathcadWorker, inputs_config: List[Any]):
+    """Sets InputConfig objects (or their dict form) on the open worksheet."""
+    for input_config in inputs_config:
+        # Support both old dict format and new InputConfig objects
+        if isinstance(input_config, dict):
+            alias = input_config.get("alias")
+            value = input_config.get("value")
+            units = input_config.get("units")
+        else:
+            # InputConfig object
+            alias = input_config.alias
+            value = input_config.value
+            units = input_config.units
+
+        if alias and value is not None:
+            worker.set_input(alias, value, units)
+
+def collect_outputs(worker: MathcadWorker) -> Dict[str, Any]:
+    """Reads every output of the open worksheet; failed reads become error strings."""
+    output_data = {}
+    for out_meta in worker.get_outputs():
+        alias = out_meta["alias"]
+        try:
+            output_data[alias] = worker.get_output_value(alias)
+        except Exception as e:
+            output_data[alias] = f"Error: {str(e)}"
+    return output_data
+
+def save_exports(worker: MathcadWorker, exports: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    """Saves the calculated worksheet to each {path, format}; returns path -> error (None if saved)."""
+    saved = {}
+    for export in exports:
+        path = export.get("path")
+        try:
+            # Delete if exists to avoid Mathcad prompt
+            if os.path.exists(path):
+                os.remove(path)
+            worker.save_as(path, export.get("format"))
+            saved[path] = None
+        except Exception as e:
+            saved[path] = str(e)
+    return saved
+
+def run_calculate_many(worker: MathcadWorker, job: JobRequest) -> Iterator[JobResult]:
+    """
+    Calculates a chunk of rows of one worksheet. Each row is a calculate_job
+    of its own (its "id" is the job ID the manager tracks); results are
+    yielded as rows finish so they can be sent back while the rest run.
+    """
+    path = job.payload.get("path")
+    force_reopen = job.payload.get("force_reopen", False)
+    for n, row in enumerate(job.payload.get("rows", [])):
+        yield process_job(worker, JobRequest(command="calculate_job", id=row.get("id"), payload={
+            "path": path,
+            "inputs": row.get("inputs", []),
+            "exports": row.get("exports"),
+            "force_reopen": force_reopen and n == 0,
+        }))
+
+def run_optimize(worker: MathcadWorker, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drives one or more inputs until an output hits a target (bisection/brent,
+    one variable) or is minimized/maximized/matched (nelder-mead). Every
+    iteration is a recalculation of the already-open worksheet.
+
+    Payload: path, inputs (fixed InputConfigs), method, variables
+    [{alias, lower, upper, initial?, units?}], objective {output, target?, goal?},
+    xtol, ftol, max_iterations.
+    """
+    method = payload.get("method", "brent")
+    variables = payload.get("variables") or []
+    objective = payload.get("objective") or {}
+    output = objective.get("output")
+    target = objective.get("target")
+    goal = objective.get("goal") or ("target" if target is not None else "minimize")
+    xtol = payload.get("xtol", 1e-6)
+    ftol = payload.get("ftol", 1e-9)
+    max_iter = payload.get("max_iterations", 100)
+
+    if not variables or not output:
+        raise ValueError("Optimization needs at least one variable and an objective output")
+    if goal not in ("target", "minimize", "maximize"):
+        raise ValueError(f"Unknown objective goal: {goal}")
+    if goal == "target" and target is None:
+        raise ValueError("Objective goal 'target' needs a target value")
+
+    path = payload.get("path")
+    if path:
+        worker.open_file(path)
+    apply_inputs(worker, payload.get("inputs", []))
+
+    trace: List[Dict[str, Any]] = []
+
+    def evaluate(values: List[float]) -> float:
+        for var, value in zip(variables, values):
+            worker.set_input(var["alias"], float(value), var.get("units"))
+        worker.synchronize()
+        value = worker.get_output_value(output)
+        trace.append({"inputs": {v["alias"]: x for v, x in zip(variables, values)}, "output": value})
+        return float(value)
+
+    if method in ("bisection", "brent"):
+        if len(variables) != 1 or goal != "target":
+            raise ValueError(f"'{method}' solves for one variable hitting an objective target")
+        var = variables[0]
+        solver = bisection if method == "bisection" else brent
+        x, _, iterations, converged = solver(
+            lambda v: evaluate([v]) - target, float(var["lower"]), float(var["upper"]),
+            xtol=xtol, ftol=ftol, max_iter=max_iter
+        )
+        solution = [x]
+    elif method == "nelder-mead":
+        if goal == "target":
+            cost = lambda values: (evaluate(values) - target) ** 2
+        elif goal == "minimize":
+            cost = evaluate
+        else:
+            cost = lambda values: -evaluate(values)
+        bounds = None
+        if all("lower" in v and "upper" in v for v in variables):
+            bounds = [(float(v["lower"]), float(v["upper"])) for v in variables]
+        x0 = [
+            float(v["initial"]) if v.get("initial") is not None
+            else (float(v["lower"]) + float(v["upper"])) / 2
+            for v in variables
+        ]
+        solution, _, iterations, converged = nelder_mead(
+            cost, x0, bounds=bounds, xtol=xtol, ftol=ftol, max_iter=max_iter
+        )
+    else:
+        raise ValueError(f"Unknown optimization method: {method}")
+
+    # Leave the worksheet at the solution so outputs (and any save_as) reflect it
+    solution_inputs = {v["alias"]: x for v, x in zip(variables, solution)}
+    if not trace or trace[-1]["inputs"] != solution_inputs:
+        evaluate(solution)
+
+    return {
+        "converged": converged,
+        "method": method,
+        "inputs": solution_inputs,
+        "output": trace[-1]["output"],
+        "iterations": iterations,
+        "evaluations": len(trace),
+        "trace": trace,
+        "outputs": collect_outputs(worker),
+    }
+
+def process_job(worker: MathcadWorker, job: JobRequest) -> JobResult:
+    """Runs one job against the worker; failures become error results."""
+    try:
+        # Process commands
+        if job.command == "ping":
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data={"response": "pong"}
+            )
+        elif job.command == "connect":
+            worker.connect()
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data={"message": "Connected to Mathcad"}
+            )
+        elif job.command == "reconnect":
+            # Recovery step: drop the (possibly dead) COM connection and open a new one
+            worker.connect()
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data={"message": "Reconnected to Mathcad"}
+            )
+        elif job.command == "save_as":
+            path = job.payload.get("path")
+            format_enum = job.payload.get("format")
+            if not path:
+                raise ValueError("Payload missing 'path'")
+            worker.save_as(path, format_enum)
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data={"message": f"Saved to {path}"}
+            )
+        elif job.command == "load_file":
+            path = job.payload.get("path")
+            if not path:
+                 raise ValueError("Payload missing 'path'")
+            worker.open_file(path)
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data={"message": f"Opened {path}"}
+            )
+        elif job.command == "preload":
+            # Warm-up: open recently used worksheets before anyone asks for them
+            status = worker.preload(job.payload.get("paths") or [])
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data={
+                    "opened": [path for path, error in status.items() if error is None],
+                    "failed": {path: error for path, error in status.items() if error is not None},
+                }
+            )
+        elif job.command == "worksheet_stats":
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data=worker.cache_info()
+            )
+        elif job.command == "get_metadata":
+            # Ensure connected
+            worker.ensure_connected()
+
+            path = job.payload.get("path")
+            if path:
+                worker.open_file(path)
+                
+            inputs = worker.get_inputs()
+            outputs = worker.get_outputs()
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data={
+                    "inputs": inputs,
+                    "outputs": outputs
+                }
+            )
+        elif job.command == "calculate_job":
+            path = job.payload.get("path")
+            inputs_config = job.payload.get("inputs", [])  # Array of InputConfig objects
+            force_reopen = job.payload.get("force_reopen", False)
+
+            # Performance optimization: open_file now skips reopening if same file already open
+            # If operations fail, they'll raise exceptions and caller can retry with force_reopen
+            if path:
+                worker.open_file(path, force_reopen=force_reopen)
+
+            # Set inputs with units
+            apply_inputs(worker, inputs_config)
+
+            # Recalculate worksheet (synchronous - blocks until complete)
+            worker.synchronize()
+
+            # Fetch all outputs
+            output_data = collect_outputs(worker)
+            data = {"outputs": output_data}
+
+            # Exports of this row, saved while its inputs are still applied
+            exports = job.payload.get("exports")
+            if exports:
+                data["exports"] = save_exports(worker, exports)
+
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data=data
+            )
+        elif job.command == "optimize":
+            # Goal seek / optimization loop runs here, next to the open worksheet
+            result = JobResult(
+                job_id=job.id,
+                status="success",
+                data=run_optimize(worker, job.payload)
+            )
+        else:
+            result = JobResult(
+                job_id=job.id,
+                status="error",
+                error_message=f"Unknown command: {job.command}",
+                error_kind=FailureKind.INPUT.value
+            )
+        return result
+    except Exception as e:
+        # Catch job-processing errors
+        kind = classify_error(e)
+        if kind in _traced_kinds:
+            err_msg = f"{type(e).__name__}: {e}"
+        else:
+            _traced_kinds.add(kind)
+            err_msg = "".join(traceback.format_exception(None, e, e.__traceback__))
+        if kind == FailureKind.CONNECTION:
+            worker.mark_lost()  # The next job reconnects before touching Mathcad
+        return JobResult(
+            job_id=job.id,
+            status="error",
+            error_message=err_msg,
+            error_kind=kind.value
+        )
+
+class ResultSender:
+    """
+    Sends results back in batches: results finished close together share one
+    queue message, and a long job never holds back results finished before it.
+    """
+
+    def __init__(self, output_queue: multiprocessing.Queue, shared: Optional[SharedArrays] = None):
+        self.output_queue = output_queue
+        self.shared = shared
+        self.buffer: List[JobResult] = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def add(self, result: JobResult):
+        with self.lock:
+            self.buffer.append(result)
+
+    def flush(self):
+        # Put under the lock so messages keep result order
+        with self.lock:
+            results, self.buffer = self.buffer, []
+            if results:
+                self.output_queue.put(encode_results(results, self.shared))
+
+    def _run(self):
+        while True:
+            time.sleep(RESULT_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error sending results: {e}")
+
+def run_harness(input_queue: multiprocessing.Queue, output_queue: multiprocessing.Queue,
+                max_open_worksheets: Optional[int] = None):
     """
     The entry point for the sidecar process.
+    max_open_worksheets: worksheets the worker keeps open (MathcadWorker's default if None).
+    Each queue message carries a batch of jobs (see engine.wire); results are
+    sent back batched by ResultSender. Large arrays travel in shared memory:
+    a job's input blocks are closed once it has run, result blocks once the
+    manager sends them back in a release message.
     """
     print(f"Harness process started. PID: {os.getpid()}")
     
-    worker = MathcadWorker()
+    worker = MathcadWorker(max_open_worksheets)
+    shared = SharedArrays()
+    sender = ResultSender(output_queue, shared)
 
     while True:
         try:
             # Blocking get with timeout
             try:
-                job_data = input_queue.get(timeout=0.5)
+                message = input_queue.get(timeout=0.5)
             except Empty:
+                # Idle: the only time the connection is probed, so jobs don't pay for it
+                worker.check_connection()
                 continue
             
             # Check for exit signal
-            if job_data is None:
+            if message is None:
                 print("Harness received exit signal. Shutting down.")
                 break
                 
-            # Parse job
-            if not isinstance(job_data, JobRequest):
-                 result = JobResult(
-                     job_id="unknown",
-                     status="error",
-                     error_message=f"Invalid job data type: {type(job_data)}"
-                 )
-                 output_queue.put(result)
-                 continue
-            
-            job: JobRequest = job_data
-            # print(f"Processing job: {job.id} - {job.command}")
-            
+            # Parse jobs
             try:
-                # Process commands
-                if job.command == "ping":
-                    result = JobResult(
-                        job_id=job.id,
-                        status="success",
-                        data={"response": "pong"}
-                    )
-                elif job.command == "connect":
-                    worker.connect()
-                    result = JobResult(
-                        job_id=job.id,
-                        status="success",
-                        data={"message": "Connected to Mathcad"}
-                    )
-                elif job.command == "save_as":
-                    path = job.payload.get("path")
-                    format_enum = job.payload.get("format")
-                    if not path:
-                        raise ValueError("Payload missing 'path'")
-                    worker.save_as(path, format_enum)
-                    result = JobResult(
-                        job_id=job.id,
-                        status="success",
-                        data={"message": f"Saved to {path}"}
-                    )
-                elif job.command == "load_file":
-                    path = job.payload.get("path")
-                    if not path:
-                         raise ValueError("Payload missing 'path'")
-                    worker.open_file(path)
-                    result = JobResult(
-                        job_id=job.id,
-                        status="success",
-                        data={"message": f"Opened {path}"}
-                    )
-                elif job.command == "get_metadata":
-                    # Ensure connected
-                    if not worker.is_connected():
-                        worker.connect()
-
-                    path = job.payload.get("path")
-                    if path:
-                        worker.open_file(path)
-                        
-                    inputs = worker.get_inputs()
-                    outputs = worker.get_outputs()
-                    result = JobResult(
-                        job_id=job.id,
-                        status="success",
-                        data={
-                            "inputs": inputs,
-                            "outputs": outputs
-                        }
-                    )
-                elif job.command == "calculate_job":
-                    path = job.payload.get("path")
-                    inputs_config = job.payload.get("inputs", [])  # Array of InputConfig objects
-
-                    # Performance optimization: open_file now skips reopening if same file already open
-                    # If operations fail, they'll raise exceptions and caller can retry with force_reopen
-                    if path:
-                        worker.open_file(path)
-
-                    # Set inputs with units
-                    for input_config in inputs_config:
-                        # Support both old dict format and new InputConfig objects
-                        if isinstance(input_config, dict):
-                            alias = input_config.get("alias")
-                            value = input_config.get("value")
-                            units = input_config.get("units")
-                        else:
-                            # InputConfig object
-                            alias = input_config.alias
-                            value = input_config.value
-                            units = input_config.units
-
-                        if alias and value is not None:
-                            worker.set_input(alias, value, units)
-
-                    # Recalculate worksheet (synchronous - blocks until complete)
-                    worker.synchronize()
-
-                    # Fetch all outputs
-                    meta_outputs = worker.get_outputs()
-                    output_data = {}
-
-                    for out_meta in meta_outputs:
-                        alias = out_meta["alias"]
-                        try:
-                            val = worker.get_output_value(alias)
-                            output_data[alias] = val
-                        except Exception as e:
-                            output_data[alias] = f"Error: {str(e)}"
-
-                    result = JobResult(
-                        job_id=job.id,
-                        status="success",
-                        data={"outputs": output_data}
-                    )
-                else:
-                    result = JobResult(
-                        job_id=job.id,
-                        status="error",
-                        error_message=f"Unknown command: {job.command}"
-                    )
-                
-                output_queue.put(result)
-                
+                jobs, released = decode_requests(message, shared)
+                shared.release(released)
             except Exception as e:
-                # Catch job-processing errors
-                err_msg = "".join(traceback.format_exception(None, e, e.__traceback__))
-                result = JobResult(
-                    job_id=job.id,
+                jobs = []
+                sender.add(JobResult(
+                    job_id="unknown",
                     status="error",
-                    error_message=err_msg
-                )
-                output_queue.put(result)
+                    error_message=f"Invalid job message: {e}"
+                ))
+
+            while jobs:
+                job = jobs.pop(0)
+                results = []
+                if job.command == "calculate_many":
+                    # Row results carry their own IDs, so they can go out right away
+                    for result in run_calculate_many(worker, job):
+                        sender.add(result)
+                else:
+                    results.append(process_job(worker, job))
+                job_id = job.id
+                del job  # Drop our views of its input arrays so their blocks can close
+                # Before sending its result, whose blocks would share the job's ID
+                shared.release_owner(job_id)
+                for result in results:
+                    sender.add(result)
+            # Don't keep the last result of a message waiting for the timer
+            sender.flush()
 
         except KeyboardInterrupt:
              print("Harness caught KeyboardInterrupt. Exiting.")
@@ -174,4 +416,7 @@ def run_harness(input_queue: multiprocessing.Queue, output_queue: multiprocessin
         except Exception as e:
             print(f"CRITICAL HARNESS ERROR: {e}")
             traceback.print_exc()
-            time.sleep(1) 
+            time.sleep(1)
+
+    sender.flush()
+    shared.release_all()
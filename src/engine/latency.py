@@ -0,0 +1,87 @@
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LatencyTracker:
+    """
+    Rolling latency history per (command, worksheet), used to derive job deadlines.
+
+    Once a key has MIN_SAMPLES warm timings, its deadline is the p99 of the
+    recent window times FACTOR, clamped to [FLOOR, CEILING]. History is saved
+    to a JSON file so deadlines survive restarts.
+    """
+    WINDOW = 200
+    MIN_SAMPLES = 5
+    FACTOR = 3.0
+    FLOOR = 5.0
+    CEILING = 600.0
+    SAVE_EVERY = 20
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.samples: Dict[str, Deque[float]] = {}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def key(command: str, file_path: str) -> str:
+        return f"{command}|{os.path.normcase(os.path.abspath(file_path))}"
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            window = self.samples.setdefault(key, deque(maxlen=self.WINDOW))
+            window.append(round(seconds, 3))
+            self._unsaved += 1
+            should_save = self._unsaved >= self.SAVE_EVERY
+        if should_save:
+            self.save()
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """q-th percentile (0-100) of the recorded samples, or None without history."""
+        with self._lock:
+            values = sorted(self.samples.get(key, ()))
+        if not values:
+            return None
+        # Nearest-rank percentile
+        rank = max(1, math.ceil(q * len(values) / 100.0))
+        return values[min(rank, len(values)) - 1]
+
+    def timeout_for(self, key: Optional[str], default: float) -> float:
+        """Learned deadline for a key, or `default` until there is enough history."""
+        if key is None or len(self.samples.get(key, ())) < self.MIN_SAMPLES:
+            return default
+        p99 = self.percentile(key, 99)
+        return min(max(p99 * self.FACTOR, self.FLOOR), self.CEILING)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            with self._lock:
+                self.samples = {
+                    key: deque((float(v) for v in values), maxlen=self.WINDOW)
+                    for key, values in saved.items()
+                }
+        except (json.JSONDecodeError, OSError, AttributeError, TypeError, ValueError) as e:
+            print(f"Warning: Could not load latency history: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = {key: list(values) for key, values in self.samples.items()}
+            self._unsaved = 0
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not save latency history: {e}")
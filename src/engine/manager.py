@@ -2,7 +2,8 @@ import multiprocessing
 import queue
 import time
 import threading
-from typing import Optional, Dict, Any, Union
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Union, Tuple
 import sys
 import os
 
@@ -12,12 +13,38 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-from engine.protocol import JobRequest, JobResult
-from engine.harness import run_harness
+from engine.protocol import JobRequest, JobResult, FailureKind
+from engine.latency import LatencyTracker
+from engine.store import RunStore
+from engine.wire import SharedArrays, encode_requests, encode_release, decode_results
 from engine.workflow_manager import WorkflowManager
 
 class EngineManager:
-    def __init__(self):
+    # Per-command deadlines (seconds) enforced by the watchdog until there is
+    # latency history for the worksheet. Cold jobs (connect, first open of a file)
+    # always use these. calculate_job gets the full ceiling so heavy sheets can
+    # finish once and be learned; LatencyTracker tightens it from there.
+    COMMAND_TIMEOUTS = {
+        "ping": 10.0,
+        "connect": 120.0,
+        "reconnect": 120.0,
+        "get_metadata": 120.0,
+        "load_file": 120.0,
+        "calculate_job": LatencyTracker.CEILING,
+        "save_as": 120.0,
+        "optimize": 1800.0,  # Many recalculations in one job
+        "preload": 480.0,  # Opens up to MathcadWorker.MAX_OPEN_WORKSHEETS files
+    }
+    DEFAULT_TIMEOUT = 60.0
+    # Commands whose "path" payload is the worksheet they run against
+    WORKSHEET_COMMANDS = ("calculate_job", "get_metadata", "load_file")
+    WATCHDOG_INTERVAL = 0.5
+    # Recently used worksheets opened by warm_up when no list is given
+    WARMUP_WORKSHEETS = 3
+    # Worksheets the harness keeps open at once (see MathcadWorker.open_file)
+    MAX_OPEN_WORKSHEETS = 4
+
+    def __init__(self, latency_path: Optional[str] = None, store_path: Optional[str] = None):
         self.process: Optional[multiprocessing.Process] = None
         self.input_queue: Optional[multiprocessing.Queue] = None
         self.output_queue: Optional[multiprocessing.Queue] = None
@@ -26,6 +53,33 @@ class EngineManager:
         self.results: Dict[str, JobResult] = {}
         self.collector_thread: Optional[threading.Thread] = None
         self.stop_collector: bool = False
+
+        # Watchdog state. The harness works through its queue in order, so the
+        # oldest pending job is the one in flight; in_flight_since is when it started.
+        self.pending: "OrderedDict[str, Tuple[JobRequest, float, Optional[str]]]" = OrderedDict()
+        self.in_flight_since: Optional[float] = None
+        self.watchdog_thread: Optional[threading.Thread] = None
+        self.stop_watchdog: bool = False
+        self._lock = threading.RLock()
+
+        # Learned deadlines. last_path is the worksheet the harness will have active
+        # once everything queued so far has run; open_paths mirrors the worker's
+        # open worksheets, least recently used first, so switching back to one
+        # still counts as warm.
+        self.latency = LatencyTracker(latency_path)
+        self.last_path: Optional[str] = None
+        self.open_paths: "OrderedDict[str, None]" = OrderedDict()
+
+        # Run history (batches, workflows, library configs); in memory without a path
+        self.store = RunStore(store_path)
+
+        # Shared memory for large arrays (see engine.wire). Request blocks are
+        # released when their job finishes; mapped result blocks close once
+        # nothing views them any more.
+        self.shared = SharedArrays()
+        # calculate_many chunks: row job ID -> chunk ID, and the chunk's unfinished rows
+        self.row_chunk: Dict[str, str] = {}
+        self.chunk_rows: Dict[str, set] = {}
         
         from engine.batch_manager import BatchManager
         self.batch_manager = BatchManager(self)
@@ -39,21 +93,34 @@ class EngineManager:
             print("Engine already running.")
             return
 
+        self._spawn_process()
+        print(f"Engine started with PID: {self.process.pid}")
+        
+        # Start collector thread
+        self.stop_collector = False
+        self.collector_thread = threading.Thread(target=self._collect_results, daemon=True)
+        self.collector_thread.start()
+
+        # Start watchdog thread
+        self.stop_watchdog = False
+        self.watchdog_thread = threading.Thread(target=self._watchdog, daemon=True)
+        self.watchdog_thread.start()
+
+    def _spawn_process(self):
+        """Creates fresh queues and launches a harness process on them."""
         self.input_queue = multiprocessing.Queue()
         self.output_queue = multiprocessing.Queue()
-        
+        self.last_path = None  # New harness has nothing open
+        self.open_paths.clear()
+
+        # Imported here so the server process never loads the worker's COM stack
+        from engine.harness import run_harness
         self.process = multiprocessing.Process(
             target=run_harness,
-            args=(self.input_queue, self.output_queue),
+            args=(self.input_queue, self.output_queue, self.MAX_OPEN_WORKSHEETS),
             daemon=True 
         )
         self.process.start()
-        print(f"Engine started with PID: {self.process.pid}")
-        
-        # Start collector thread
-        self.stop_collector = False
-        self.collector_thread = threading.Thread(target=self._collect_results, daemon=True)
-        self.collector_thread.start()
 
     def stop_engine(self):
         """Stops the sidecar process gracefully, then forcefully."""
@@ -61,6 +128,11 @@ class EngineManager:
             return
 
         print("Stopping engine...")
+
+        # Stop watchdog first so it doesn't mistake the shutdown for a hang
+        self.stop_watchdog = True
+        if self.watchdog_thread:
+            self.watchdog_thread.join(timeout=1.0)
         
         # Stop collector
         self.stop_collector = True
@@ -84,7 +156,14 @@ class EngineManager:
         self.input_queue = None
         self.output_queue = None
         self.collector_thread = None
+        self.watchdog_thread = None
         self.results.clear()
+        self.pending.clear()
+        self.in_flight_since = None
+        self.row_chunk.clear()
+        self.chunk_rows.clear()
+        self.shared.release_all()
+        self.latency.save()
         print("Engine stopped.")
 
     def restart_engine(self):
@@ -94,19 +173,216 @@ class EngineManager:
     def is_running(self) -> bool:
         return self.process is not None and self.process.is_alive()
 
-    def submit_job(self, command: str, payload: Optional[Dict[str, Any]] = None) -> str:
+    def get_timeout(self, command: str) -> float:
+        """
+        Upper bound on how long the watchdog lets a command run, in seconds.
+        Learned deadlines may exceed the static default, so callers polling as a
+        backstop to the watchdog should wait at least this long.
+        """
+        return max(self.COMMAND_TIMEOUTS.get(command, self.DEFAULT_TIMEOUT), self.latency.CEILING)
+
+    def _latency_key(self, command: str, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Latency history key for a job about to be queued, or None if the job is
+        cold (connects, or opens a worksheet that isn't open yet) and so
+        shouldn't be judged by, or counted towards, warm timings.
+        Caller must hold _lock; updates last_path and open_paths.
+        """
+        if command in ("connect", "reconnect"):
+            self.last_path = None  # Worker drops its worksheets on (re)connect
+            self.open_paths.clear()
+            return None
+        if command in self.WORKSHEET_COMMANDS:
+            path = payload.get("path") or self.last_path
+            cold = not self._touch_open(path, payload.get("force_reopen", False))
+            self.last_path = path
+        elif command == "save_as":
+            path, cold = self.last_path, False
+        elif command == "optimize":
+            # Opens its worksheet like calculate_job, but its duration depends on
+            # the iteration count, so it is never learned
+            self.last_path = payload.get("path") or self.last_path
+            self._touch_open(self.last_path)
+            return None
+        else:
+            return None
+        if cold or path is None:
+            return None
+        if command == "calculate_job" and payload.get("exports"):
+            command = "calculate_job+export"  # Saves included: timed separately
+        return LatencyTracker.key(command, path)
+
+    def _touch_open(self, path: Optional[str], reopen: bool = False) -> bool:
+        """
+        Marks a worksheet most recently used in the open_paths mirror, evicting
+        like the worker does. True if it was already open (and isn't reopened).
+        Preloads aren't mirrored: which files opened is only known afterwards,
+        and counting a failed one as open would judge its first job as warm.
+        """
+        if path is None:
+            return False
+        key = os.path.normcase(os.path.abspath(path))
+        was_open = key in self.open_paths and not reopen
+        self.open_paths[key] = None
+        self.open_paths.move_to_end(key)
+        while len(self.open_paths) > self.MAX_OPEN_WORKSHEETS:
+            self.open_paths.popitem(last=False)
+        return was_open
+
+    def submit_job(self, command: str, payload: Optional[Dict[str, Any]] = None,
+                   timeout: Optional[float] = None) -> str:
         """
         Submits a job to the engine. Returns the job ID.
+        If the harness spends longer than `timeout` (default: per-command deadline)
+        on the job, the watchdog fails it and replaces the harness process.
+        """
+        return self.submit_jobs(command, [payload], timeout)[0]
+
+    def submit_jobs(self, command: str, payloads: List[Dict[str, Any]],
+                    timeout: Optional[float] = None) -> List[str]:
+        """
+        Submits several jobs of one command in a single queue message, saving
+        per-message overhead when jobs are cheap. Each job still gets its own
+        ID, deadline and result. Returns the job IDs in order.
         """
         if not self.is_running() or self.input_queue is None:
             raise RuntimeError("Engine is not running")
-            
-        if payload is None:
-            payload = {}
-            
-        req = JobRequest(command=command, payload=payload)
-        self.input_queue.put(req)
-        return req.id
+
+        reqs = [JobRequest(command=command, payload=payload or {}) for payload in payloads]
+        with self._lock:
+            if not self.pending and reqs:
+                self.in_flight_since = time.time()
+            for req in reqs:
+                self._track(req, timeout)
+            self.input_queue.put(encode_requests(reqs, self.shared))
+        return [req.id for req in reqs]
+
+    def submit_many(self, path: str, rows: List[Dict[str, Any]], force_reopen: bool = False,
+                    timeout: Optional[float] = None) -> List[str]:
+        """
+        Submits rows of one worksheet as a single calculate_many job. Each row
+        is a dict with "inputs" and optionally "exports" ([{path, format}],
+        saved right after the row is calculated). Rows are tracked as separate
+        calculate_job jobs: each gets its own ID, deadline and result, sent
+        back as soon as it finishes. Returns the row job IDs in order.
+        """
+        if not self.is_running() or self.input_queue is None:
+            raise RuntimeError("Engine is not running")
+
+        reqs = [JobRequest(command="calculate_job", payload={"path": path, **row}) for row in rows]
+        if force_reopen and reqs:
+            reqs[0].payload["force_reopen"] = True
+        chunk = JobRequest(command="calculate_many", payload={
+            "path": path,
+            "force_reopen": force_reopen,
+            "rows": [{"id": req.id, **row} for req, row in zip(reqs, rows)],
+        })
+        with self._lock:
+            if not self.pending and reqs:
+                self.in_flight_since = time.time()
+            for req in reqs:
+                self._track(req, timeout)
+                self.row_chunk[req.id] = chunk.id
+            self.chunk_rows[chunk.id] = {req.id for req in reqs}
+            self.input_queue.put(encode_requests([chunk], self.shared))
+        return [req.id for req in reqs]
+
+    def _release_shared(self, job_id: str):
+        """Releases a finished job's shared memory; for a chunk row, the chunk's once all its rows are done."""
+        self.shared.release_owner(job_id)
+        chunk_id = self.row_chunk.pop(job_id, None)
+        if chunk_id is not None:
+            rows = self.chunk_rows.get(chunk_id, set())
+            rows.discard(job_id)
+            if not rows:
+                self.chunk_rows.pop(chunk_id, None)
+                self.shared.release_owner(chunk_id)
+
+    def _track(self, req: JobRequest, timeout: Optional[float] = None):
+        """Adds a job to the pending list with its deadline. Caller must hold _lock."""
+        key = self._latency_key(req.command, req.payload)
+        if timeout is None:
+            default = self.COMMAND_TIMEOUTS.get(req.command, self.DEFAULT_TIMEOUT)
+            timeout = self.latency.timeout_for(key, default)
+        self.pending[req.id] = (req, timeout, key)
+
+    def _job_finished(self, result: JobResult):
+        """Drops a job from the pending list; the next one (if any) is now in flight."""
+        was_in_flight = next(iter(self.pending), None) == result.job_id
+        entry = self.pending.pop(result.job_id, None)
+        self._release_shared(result.job_id)
+        if was_in_flight:
+            now = time.time()
+            key = entry[2] if entry else None
+            if key and result.is_success and self.in_flight_since is not None:
+                self.latency.record(key, now - self.in_flight_since)
+            self.in_flight_since = now if self.pending else None
+
+    def _watchdog(self):
+        """
+        Background thread that fails the in-flight job once it exceeds its deadline
+        (or the harness dies under it), then replaces the harness process and
+        re-queues the jobs that were waiting behind it.
+        """
+        while not self.stop_watchdog:
+            time.sleep(self.WATCHDOG_INTERVAL)
+            if self.stop_watchdog:
+                break
+            try:
+                self._check_in_flight()
+            except Exception as e:
+                print(f"Error in watchdog: {e}")
+
+    def _check_in_flight(self):
+        """One watchdog pass. Returns the ID of the job it failed, if any."""
+        with self._lock:
+            if not self.pending or self.process is None:
+                return None
+
+            job_id, (req, timeout, _) = next(iter(self.pending.items()))
+            elapsed = time.time() - (self.in_flight_since or time.time())
+            if not self.process.is_alive():
+                error_message = f"Harness process exited unexpectedly during {req.command}"
+                error_kind = FailureKind.UNKNOWN
+            elif elapsed > timeout:
+                error_message = f"Job timed out after {timeout:.0f}s ({req.command}); harness restarted"
+                error_kind = FailureKind.TIMEOUT
+            else:
+                return None
+
+            print(f"Watchdog: job {job_id} failed: {error_message}")
+            self.pending.pop(job_id)
+            self._release_shared(job_id)
+            self.results[job_id] = JobResult(
+                job_id=job_id,
+                status="error",
+                data={"harness_replaced": True},
+                error_message=error_message,
+                error_kind=error_kind.value
+            )
+            self._replace_process()
+            return job_id
+
+    def _replace_process(self):
+        """Kills the current harness and starts a new one. Caller must hold _lock."""
+        old_process = self.process
+        if old_process is not None and old_process.is_alive():
+            old_process.kill()
+            old_process.join(timeout=1.0)
+
+        # The collector reads self.output_queue on every iteration, so it
+        # switches to the new queue on its own
+        self._spawn_process()
+        print(f"Harness replaced. New PID: {self.process.pid}")
+
+        # Re-derive deadlines: the first queued job now runs cold on the new harness
+        requeued = [req for req, _, _ in self.pending.values()]
+        self.pending.clear()
+        for req in requeued:
+            self._track(req)
+        if requeued:
+            self.input_queue.put(encode_requests(requeued, self.shared))
+        self.in_flight_since = time.time() if self.pending else None
         
     def _collect_results(self):
         """Background thread to drain output queue into results dict."""
@@ -115,14 +391,35 @@ class EngineManager:
                 break
             try:
                 # Short timeout to allow checking stop_collector
-                result = self.output_queue.get(timeout=0.1)
-                if result:
-                    self.results[result.job_id] = result
+                message = self.output_queue.get(timeout=0.1)
+                if message:
+                    results = decode_results(message, self.shared)
+                    with self._lock:
+                        for result in results:
+                            self._job_finished(result)
+                            self.results[result.job_id] = result
+                        # Our mappings keep the blocks alive; the harness can let go
+                        mapped = self.shared.take_attached()
+                        if mapped and self.input_queue:
+                            self.input_queue.put(encode_release(mapped))
             except queue.Empty:
                 continue
             except Exception as e:
                 print(f"Error in result collector: {e}")
                 
+    def warm_up(self, paths: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Queues a preload of worksheets (by default the most recently used ones,
+        from the run store) so the first job on each skips opening it.
+        Returns the job ID, or None if none of the files exist.
+        """
+        if paths is None:
+            paths = self.store.recent_worksheets(self.WARMUP_WORKSHEETS)
+        paths = [p for p in paths if os.path.isfile(p)]
+        if not paths:
+            return None
+        return self.submit_job("preload", {"paths": paths})
+
     def get_job(self, job_id: str) -> Optional[JobResult]:
         """Returns the result of a job if available."""
         return self.results.get(job_id)
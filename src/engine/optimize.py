@@ -0,0 +1,177 @@
+"""
+Small derivative-free solvers used by the "optimize" harness command.
+
+Implemented in pure Python: every evaluation is a Mathcad recalculation, so
+solver overhead is irrelevant, and SciPy is excluded from the packaged build.
+All solvers return (x, fx, iterations, converged).
+"""
+import math
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+def _not_bracketed(lo: float, hi: float, flo: float, fhi: float) -> ValueError:
+    return ValueError(
+        f"Target is not bracketed: f({lo}) = {flo} and f({hi}) = {fhi} have the same sign"
+    )
+
+
+def bisection(f: Callable[[float], float], lo: float, hi: float,
+              xtol: float = 1e-6, ftol: float = 1e-9,
+              max_iter: int = 100) -> Tuple[float, float, int, bool]:
+    """Root of f in [lo, hi] by bisection. f(lo) and f(hi) must differ in sign."""
+    flo, fhi = f(lo), f(hi)
+    if flo == 0:
+        return lo, flo, 0, True
+    if fhi == 0:
+        return hi, fhi, 0, True
+    if (flo > 0) == (fhi > 0):
+        raise _not_bracketed(lo, hi, flo, fhi)
+
+    mid, fmid = lo, flo
+    for iteration in range(1, max_iter + 1):
+        mid = (lo + hi) / 2
+        fmid = f(mid)
+        if abs(fmid) <= ftol or (hi - lo) / 2 <= xtol:
+            return mid, fmid, iteration, True
+        if (fmid > 0) == (flo > 0):
+            lo, flo = mid, fmid
+        else:
+            hi = mid
+    return mid, fmid, max_iter, False
+
+
+def brent(f: Callable[[float], float], lo: float, hi: float,
+          xtol: float = 1e-6, ftol: float = 1e-9,
+          max_iter: int = 100) -> Tuple[float, float, int, bool]:
+    """
+    Root of f in [lo, hi] by Brent's method (inverse quadratic interpolation
+    with a bisection fallback). Usually needs far fewer evaluations than
+    bisection on smooth worksheets.
+    """
+    a, b = lo, hi
+    fa, fb = f(a), f(b)
+    if fa == 0:
+        return a, fa, 0, True
+    if fb == 0:
+        return b, fb, 0, True
+    if (fa > 0) == (fb > 0):
+        raise _not_bracketed(lo, hi, fa, fb)
+
+    c, fc = a, fa
+    d = e = b - a
+    for iteration in range(1, max_iter + 1):
+        if (fb > 0) == (fc > 0):
+            # Keep the root bracketed between b and c
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+
+        tol = 2 * 2.2e-16 * abs(b) + xtol / 2
+        m = (c - b) / 2
+        if abs(m) <= tol or abs(fb) <= ftol:
+            return b, fb, iteration, True
+
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:
+                # Secant step
+                p = 2 * m * s
+                q = 1 - s
+            else:
+                # Inverse quadratic interpolation
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * m * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            else:
+                p = -p
+            if 2 * p < min(3 * m * q - abs(tol * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                d = e = m
+        else:
+            d = e = m
+
+        a, fa = b, fb
+        b += d if abs(d) > tol else math.copysign(tol, m)
+        fb = f(b)
+    return b, fb, max_iter, False
+
+
+def nelder_mead(f: Callable[[List[float]], float], x0: Sequence[float],
+                bounds: Optional[Sequence[Tuple[float, float]]] = None,
+                step: Optional[Sequence[float]] = None,
+                xtol: float = 1e-6, ftol: float = 1e-9,
+                max_iter: int = 200) -> Tuple[List[float], float, int, bool]:
+    """
+    Minimizes f over several variables with the Nelder-Mead simplex method.
+    Points are clamped to `bounds`. `step` sizes the initial simplex
+    (default: 5% of each bound range, or of x0).
+    """
+    n = len(x0)
+
+    def clamp(x: List[float]) -> List[float]:
+        if bounds is None:
+            return x
+        return [min(max(v, lo), hi) for v, (lo, hi) in zip(x, bounds)]
+
+    if step is None:
+        if bounds is not None:
+            step = [0.05 * (hi - lo) or 0.05 for lo, hi in bounds]
+        else:
+            step = [0.05 * v if v else 0.00025 for v in x0]
+
+    simplex = [clamp(list(x0))]
+    for i in range(n):
+        vertex = list(x0)
+        vertex[i] += step[i]
+        if bounds is not None and vertex[i] > bounds[i][1]:
+            vertex[i] = x0[i] - step[i]  # Step inward when x0 sits on the upper bound
+        simplex.append(clamp(vertex))
+    values = [f(x) for x in simplex]
+
+    for iteration in range(1, max_iter + 1):
+        order = sorted(range(n + 1), key=lambda k: values[k])
+        simplex = [simplex[k] for k in order]
+        values = [values[k] for k in order]
+
+        spread = max(abs(v - values[0]) for v in values[1:])
+        size = max(max(abs(a - b) for a, b in zip(x, simplex[0])) for x in simplex[1:])
+        if spread <= ftol and size <= xtol:
+            return simplex[0], values[0], iteration, True
+
+        centroid = [sum(x[i] for x in simplex[:-1]) / n for i in range(n)]
+        worst = simplex[-1]
+
+        def towards(coeff: float) -> List[float]:
+            return clamp([c + coeff * (w - c) for c, w in zip(centroid, worst)])
+
+        reflected = towards(-1.0)
+        f_reflected = f(reflected)
+        if f_reflected < values[0]:
+            expanded = towards(-2.0)
+            f_expanded = f(expanded)
+            if f_expanded < f_reflected:
+                simplex[-1], values[-1] = expanded, f_expanded
+            else:
+                simplex[-1], values[-1] = reflected, f_reflected
+        elif f_reflected < values[-2]:
+            simplex[-1], values[-1] = reflected, f_reflected
+        else:
+            contracted = towards(0.5 if f_reflected >= values[-1] else -0.5)
+            f_contracted = f(contracted)
+            if f_contracted < min(f_reflected, values[-1]):
+                simplex[-1], values[-1] = contracted, f_contracted
+            else:
+                # Shrink everything towards the best vertex
+                best = simplex[0]
+                for k in range(1, n + 1):
+                    simplex[k] = clamp([b + 0.5 * (x - b) for b, x in zip(best, simplex[k])])
+                    values[k] = f(simplex[k])
+
+    best = min(range(n + 1), key=lambda k: values[k])
+    return simplex[best], values[best], max_iter, False
@@ -2,7 +2,8 @@ import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional
+import operator
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 class EngineStatus(str, Enum):
@@ -11,6 +12,14 @@ class EngineStatus(str, Enum):
     ERROR = "ERROR"
     DEAD = "DEAD"
 
+class FailureKind(str, Enum):
+    """Why a job failed; decides how far up the recovery ladder a caller must go"""
+    INPUT = "input"           # Bad alias/value/units - deterministic, retrying won't help
+    WORKSHEET = "worksheet"   # Worksheet failed to open/calculate - reopen the file
+    CONNECTION = "connection" # Mathcad COM server went away - reconnect
+    TIMEOUT = "timeout"       # No result in time - harness is stuck, restart the process
+    UNKNOWN = "unknown"
+
 @dataclass
 class JobRequest:
     command: str
@@ -23,6 +32,7 @@ class JobResult:
     status: str  # "success" or "error"
     data: Dict[str, Any] = field(default_factory=dict)
     error_message: Optional[str] = None
+    error_kind: Optional[str] = None  # FailureKind value when status == "error"
 
     @property
     def is_success(self) -> bool:
@@ -36,6 +46,27 @@ class InputConfig:
     units: Optional[str] = None  # Units specification (e.g., "in", "ft", "kip", or None for default)
 
 
+# Rows a batch started over the API keeps queued on the engine unless it asks otherwise
+PIPELINE_WINDOW = 4
+
+
+_STOP_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt,
+             "<=": operator.le, "==": operator.eq, "!=": operator.ne}
+
+
+class StopCondition(BaseModel):
+    """Stops a batch as soon as a row's output satisfies `output op value`"""
+    output: str  # Output alias, e.g. "Utilization"
+    op: Literal[">", ">=", "<", "<=", "==", "!="]
+    value: float
+
+    def is_met(self, outputs: Dict[str, Any]) -> bool:
+        actual = outputs.get(self.output)
+        if isinstance(actual, bool) or not isinstance(actual, (int, float)):
+            return False  # Missing or errored output never triggers a stop
+        return _STOP_OPS[self.op](actual, self.value)
+
+
 class FileMapping(BaseModel):
     """Maps an output from one file to an input in another"""
     source_file: str  # e.g., "file_a.mcdx"
@@ -0,0 +1,54 @@
+import json
+from typing import Any, Dict, List
+
+# Greedy nearest-neighbour is O(n^2) per file; above this we fall back to sorting
+NEAREST_NEIGHBOR_LIMIT = 1000
+
+
+def _canonical(row: Dict[str, Any]) -> Dict[str, str]:
+    """Input values of a row (excluding path) as comparable strings, units included."""
+    values = {}
+    for alias, v in row.items():
+        if alias == "path":
+            continue
+        if isinstance(v, dict) and "value" in v:
+            v = (v["value"], v.get("units"))
+        values[alias] = json.dumps(v, sort_keys=True, default=str)
+    return values
+
+
+def _changes(a: Dict[str, str], b: Dict[str, str]) -> int:
+    """Number of inputs that must be set again when going from row a to row b."""
+    return sum(1 for alias in a.keys() | b.keys() if a.get(alias) != b.get(alias))
+
+
+def order_rows(rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Execution order for batch rows that keeps consecutive rows as similar as possible.
+
+    Rows are grouped by worksheet path (first-seen order) so each file is opened
+    once, then ordered within a file by greedy nearest neighbour on the number of
+    changed inputs, or by a lexicographic sort for large groups. Returns original
+    row indices in the order they should run.
+    """
+    groups: Dict[Any, List[int]] = {}
+    for i, row in enumerate(rows):
+        groups.setdefault(row.get("path"), []).append(i)
+
+    order: List[int] = []
+    for indices in groups.values():
+        canonical = {i: _canonical(rows[i]) for i in indices}
+        if len(indices) > NEAREST_NEIGHBOR_LIMIT:
+            order.extend(sorted(indices, key=lambda i: sorted(canonical[i].items())))
+            continue
+
+        remaining = indices[1:]
+        current = indices[0]
+        order.append(current)
+        while remaining:
+            # Ties go to the earliest original row, keeping the order stable
+            best_pos = min(range(len(remaining)),
+                           key=lambda p: (_changes(canonical[current], canonical[remaining[p]]), p))
+            current = remaining.pop(best_pos)
+            order.append(current)
+    return order
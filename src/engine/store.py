@@ -0,0 +1,381 @@
+"""
+Run store: one SQLite database (WAL mode) under the app data directory with
+the history of batch and workflow runs, their per-row results and exports,
+and a copy of every saved library config.
+
+Rows are recorded as they finish and committed in small transactions, so
+history survives restarts and finished runs don't have to stay in memory.
+Numeric inputs and outputs of each row also go into row_values, indexed by
+(alias, value), so range queries ("Utilization > 0.95") use the index
+instead of scanning results.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    summary TEXT NOT NULL,
+    config TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started_at);
+
+CREATE TABLE IF NOT EXISTS rows (
+    run_id TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    path TEXT,
+    path_key TEXT,
+    status TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    inputs TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (run_id, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rows_path ON rows(path_key, finished_at);
+CREATE INDEX IF NOT EXISTS rows_finished ON rows(finished_at);
+
+CREATE TABLE IF NOT EXISTS row_values (
+    run_id TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    alias TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, row, kind, alias)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS row_values_range ON row_values(kind, alias, value);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (run_id, row, kind)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS library_configs (
+    path_key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT,
+    saved_at REAL NOT NULL,
+    config TEXT NOT NULL
+);
+"""
+
+# row_values kinds
+INPUT = "i"
+OUTPUT = "o"
+_KINDS = {"input": INPUT, "in": INPUT, "output": OUTPUT, "out": OUTPUT}
+_OPS = (">=", "<=", "!=", "==", ">", "<")
+_FILTER = re.compile(r"^\s*(\w+)\.(.+?)\s*(>=|<=|!=|==|=|>|<)\s*(\S+)\s*$")
+
+
+class ValueFilter(NamedTuple):
+    """`alias op value` on a row's numeric input (kind INPUT) or output (OUTPUT)"""
+    kind: str
+    alias: str
+    op: str
+    value: float
+
+
+def parse_filter(text: str) -> ValueFilter:
+    """Parses "output.Utilization>0.95" or "input.L <= 20"; raises ValueError."""
+    match = _FILTER.match(text)
+    if not match or match.group(1).lower() not in _KINDS:
+        raise ValueError(f"Filter '{text}' is not of the form input.<alias> <op> <number> "
+                         f"or output.<alias> <op> <number>")
+    kind, alias, op, value = match.groups()
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"Filter '{text}' compares with '{value}', which is not a number")
+    return ValueFilter(_KINDS[kind.lower()], alias.strip(), "==" if op == "=" else op, number)
+
+
+def parse_sort(text: str) -> Optional[Tuple[str, str]]:
+    """(kind, alias) for "output.<alias>" or "input.<alias>"; None for "finished_at"."""
+    if text == "finished_at":
+        return None
+    kind, _, alias = text.partition(".")
+    if kind.lower() not in _KINDS or not alias:
+        raise ValueError(f"Sort '{text}' must be finished_at, input.<alias> or output.<alias>")
+    return _KINDS[kind.lower()], alias
+
+
+def path_key(path: Optional[str]) -> Optional[str]:
+    """Normalized worksheet path, so one file matches however its path was spelled."""
+    return os.path.normcase(os.path.abspath(path)) if path else None
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), default=str)
+
+
+def _number(v: Any) -> Optional[float]:
+    v = v["value"] if isinstance(v, dict) and "value" in v else v
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return float(v)
+    return None
+
+
+class RunStore:
+    """
+    History of runs, persisted in a SQLite file (or kept in memory when path
+    is None). Thread-safe: batch and workflow threads write, request
+    handlers read.
+    """
+    FLUSH_ROWS = 50  # Buffered rows committed together...
+    FLUSH_SECONDS = 2.0  # ...or once the oldest has waited this long
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._local = threading.local()  # Reader connection per thread (file databases)
+        self._pending: List[Tuple[tuple, List[tuple], List[tuple]]] = []
+        self._pending_since = 0.0
+        self._conn = self._connect()
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            # Runs still marked running were cut short by a crash or shutdown
+            self._conn.execute("UPDATE runs SET status = 'interrupted' WHERE status = 'running'")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path or ":memory:", timeout=10.0, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.path:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Connection for queries; WAL lets them run alongside the writer."""
+        if not self.path:
+            return self._conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _query(self, sql: str, params: Any = ()) -> List[sqlite3.Row]:
+        if self.path:
+            return self._reader().execute(sql, params).fetchall()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # Writing
+
+    def start_run(self, run_id: str, kind: str, summary: Dict[str, Any],
+                  config: Optional[Dict[str, Any]] = None):
+        """Records a new run (replacing any earlier run with the same ID)."""
+        with self._lock:
+            self._flush()
+            with self._conn:
+                for table in ("rows", "row_values", "artifacts"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO runs (id, kind, status, started_at, summary, config) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (run_id, kind, summary.get("status", "running"), time.time(), _dumps(summary),
+                     _dumps(config) if config is not None else None))
+
+    def record_row(self, run_id: str, row: int, row_input: Dict[str, Any], result: Dict[str, Any]):
+        """Queues a finished row; it is committed with the next flush."""
+        inputs = {k: v for k, v in row_input.items() if k != "path"}
+        path = row_input.get("path")
+        values = [(run_id, row, INPUT, alias, n) for alias, n in
+                  ((alias, _number(v)) for alias, v in inputs.items()) if n is not None]
+        outputs = (result.get("data") or {}).get("outputs") or {}
+        values.extend((run_id, row, OUTPUT, alias, n) for alias, n in
+                      ((alias, _number(v)) for alias, v in outputs.items()) if n is not None)
+        artifacts = [(run_id, row, kind, result[kind]) for kind in ("pdf", "mcdx") if result.get(kind)]
+        record = (run_id, row, path, path_key(path), result.get("status", "unknown"), time.time(),
+                  _dumps(inputs), _dumps(result))
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.time()
+            self._pending.append((record, values, artifacts))
+            if len(self._pending) >= self.FLUSH_ROWS or time.time() - self._pending_since >= self.FLUSH_SECONDS:
+                self._flush()
+
+    def finish_run(self, run_id: str, summary: Dict[str, Any]):
+        """Commits the run's remaining rows and its final summary."""
+        with self._lock:
+            self._flush()
+            with self._conn:
+                self._conn.execute("UPDATE runs SET status = ?, finished_at = ?, summary = ? WHERE id = ?",
+                                   (summary.get("status"), time.time(), _dumps(summary), run_id))
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            with self._conn:
+                for record, values, artifacts in pending:
+                    run_id, row = record[0], record[1]
+                    # A row finished again (e.g. a retried run) replaces its old values
+                    self._conn.execute("DELETE FROM row_values WHERE run_id = ? AND row = ?", (run_id, row))
+                    self._conn.execute("DELETE FROM artifacts WHERE run_id = ? AND row = ?", (run_id, row))
+                    self._conn.execute("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)", record)
+                    self._conn.executemany("INSERT OR REPLACE INTO row_values VALUES (?, ?, ?, ?, ?)", values)
+                    self._conn.executemany("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)", artifacts)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not save {len(pending)} run rows: {e}")
+
+    def save_library_config(self, path: str, kind: str, config: Dict[str, Any]):
+        """Keeps a copy of a saved library config (kind "batch" or "workflow")."""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO library_configs VALUES (?, ?, ?, ?, ?, ?)",
+                                   (path_key(path), path, kind, config.get("name"), time.time(), _dumps(config)))
+        except sqlite3.Error as e:
+            print(f"Warning: Could not store library config {path}: {e}")
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    # Reading
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT * FROM runs WHERE id = ?", (run_id,))
+        return self._run(rows[0]) if rows else None
+
+    @staticmethod
+    def _run(r: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": r["id"],
+            "kind": r["kind"],
+            "status": r["status"],
+            "started_at": r["started_at"],
+            "finished_at": r["finished_at"],
+            "summary": json.loads(r["summary"]),
+            "config": json.loads(r["config"]) if r["config"] else None,
+        }
+
+    def run_rows(self, run_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Row results of a run, by row index."""
+        rows = self._query("SELECT result FROM rows WHERE run_id = ? ORDER BY row LIMIT ? OFFSET ?",
+                           (run_id, -1 if limit is None else limit, offset))
+        return [json.loads(r["result"]) for r in rows]
+
+    def row_input(self, run_id: str, row: int) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT path, inputs FROM rows WHERE run_id = ? AND row = ?", (run_id, row))
+        if not rows:
+            return None
+        return {"path": rows[0]["path"], **json.loads(rows[0]["inputs"])}
+
+    def run_artifacts(self, run_id: str) -> List[str]:
+        return [r["path"] for r in self._query(
+            "SELECT path FROM artifacts WHERE run_id = ? ORDER BY row, kind", (run_id,))]
+
+    def runs(self, kind: Optional[str] = None, path: Optional[str] = None,
+             since: Optional[float] = None, until: Optional[float] = None,
+             offset: int = 0, limit: Optional[int] = 50) -> Tuple[List[Dict[str, Any]], int]:
+        """(one page of runs, newest first, total matches); path keeps runs with rows of that worksheet."""
+        where, params = [], []
+        if kind is not None:
+            where.append("kind = ?")
+            params.append(kind)
+        if path is not None:
+            where.append("id IN (SELECT DISTINCT run_id FROM rows WHERE path_key = ?)")
+            params.append(path_key(path))
+        if since is not None:
+            where.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("started_at < ?")
+            params.append(until)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        total = self._query(f"SELECT COUNT(*) FROM runs{clause}", params)[0][0]
+        rows = self._query(f"SELECT * FROM runs{clause} ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                           [*params, -1 if limit is None else limit, offset])
+        return [self._run(r) for r in rows], total
+
+    def find_rows(self, path: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+                  status: Optional[str] = None, filters: Optional[List[ValueFilter]] = None,
+                  sort: Optional[Tuple[str, str]] = None, descending: bool = True,
+                  offset: int = 0, limit: Optional[int] = 50) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        (one page of finished rows, total matches) across runs: rows of
+        worksheet `path`, finished in [since, until), with the given status
+        and meeting every filter. Each filter is a join on the (kind, alias,
+        value) index, so only matching rows are read. Rows are ordered by
+        finish time, or by the (kind, alias) value `sort` (rows without it
+        last).
+        """
+        joins, where, params = [], [], []
+        for n, f in enumerate(filters or ()):
+            if f.op not in _OPS:
+                raise ValueError(f"Unknown filter operator '{f.op}'")
+            op = "=" if f.op == "==" else f.op
+            joins.append(f"JOIN row_values v{n} ON v{n}.run_id = r.run_id AND v{n}.row = r.row "
+                         f"AND v{n}.kind = ? AND v{n}.alias = ? AND v{n}.value {op} ?")
+            params.extend((f.kind, f.alias, f.value))
+        order = "r.finished_at"
+        if sort is not None:
+            joins.append("LEFT JOIN row_values s ON s.run_id = r.run_id AND s.row = r.row "
+                         "AND s.kind = ? AND s.alias = ?")
+            params.extend(sort)
+            order = "s.value IS NULL, s.value"
+        if path is not None:
+            where.append("r.path_key = ?")
+            params.append(path_key(path))
+        if since is not None:
+            where.append("r.finished_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("r.finished_at < ?")
+            params.append(until)
+        if status is not None:
+            where.append("r.status = ?")
+            params.append(status)
+        body = f"FROM rows r {' '.join(joins)}" + (f" WHERE {' AND '.join(where)}" if where else "")
+        total = self._query(f"SELECT COUNT(*) {body}", params)[0][0]
+        direction = "DESC" if descending else "ASC"
+        rows = self._query(
+            f"SELECT r.run_id, r.path, r.finished_at, r.inputs, r.result {body} "
+            f"ORDER BY {order} {direction}, r.run_id, r.row LIMIT ? OFFSET ?",
+            [*params, -1 if limit is None else limit, offset])
+        return [{"run_id": r["run_id"], "path": r["path"], "finished_at": r["finished_at"],
+                 "inputs": json.loads(r["inputs"]), **json.loads(r["result"])} for r in rows], total
+
+    def recent_worksheets(self, limit: int = 10) -> List[str]:
+        """
+        Worksheets most recently calculated or saved as a batch library config,
+        newest first. A batch config lives in {worksheet stem}_configs next to
+        its .mcdx, which is how its worksheet is found.
+        """
+        used: Dict[str, Tuple[float, str]] = {}
+        for r in self._query("SELECT path, MAX(finished_at) AS used FROM rows WHERE path IS NOT NULL "
+                             "GROUP BY path_key ORDER BY used DESC LIMIT ?", (limit,)):
+            used[path_key(r["path"])] = (r["used"], os.path.abspath(r["path"]))
+        for r in self._query("SELECT path, saved_at FROM library_configs WHERE kind = 'batch' "
+                             "ORDER BY saved_at DESC LIMIT ?", (limit,)):
+            config_dir = os.path.dirname(r["path"])
+            if not config_dir.endswith("_configs"):
+                continue
+            worksheet = f"{config_dir[:-len('_configs')]}.mcdx"
+            key = path_key(worksheet)
+            if key not in used or used[key][0] < r["saved_at"]:
+                used[key] = (r["saved_at"], os.path.abspath(worksheet))
+        return [path for _, path in sorted(used.values(), reverse=True)][:limit]
+
+    def library_config(self, path: str) -> Optional[Dict[str, Any]]:
+        """The stored copy of a library config, by the path it was saved to."""
+        rows = self._query("SELECT config FROM library_configs WHERE path_key = ?", (path_key(path),))
+        return json.loads(rows[0]["config"]) if rows else None
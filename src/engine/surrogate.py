@@ -0,0 +1,208 @@
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel, Field
+
+
+class SurrogateSpec(BaseModel):
+    """
+    Answers rows of a smooth worksheet from an interpolant of real results.
+    After `warmup_rows` real evaluations, rows that lie inside the evaluated
+    region and whose estimated error is within `max_error` are predicted
+    instead of calculated. Every `spot_check_every`-th predictable row is still
+    calculated and compared; a failed check suspends the surrogate for the next
+    `spot_check_every` rows, which are calculated and refine the fit.
+    """
+    outputs: Optional[List[str]] = None  # Outputs to model, default every numeric output
+    warmup_rows: int = Field(default=20, ge=2)
+    spot_check_every: int = Field(default=10, ge=1)
+    max_error: float = Field(default=0.01, gt=0)  # Relative to the output value
+    abs_error: float = Field(default=0.0, ge=0)  # Always acceptable, for outputs near zero
+
+
+class Prediction(BaseModel):
+    outputs: Dict[str, float]
+    error_estimate: Dict[str, float]  # Absolute, per output
+    tolerance: Dict[str, float]  # Largest acceptable absolute error, per output
+
+
+def _split_row(row: Dict[str, Any]) -> Tuple[str, Dict[str, float]]:
+    """
+    Splits a row into a signature (path, units and non-numeric inputs) and its
+    numeric inputs. Only rows with the same signature share a surrogate.
+    """
+    signature: Dict[str, Any] = {}
+    features: Dict[str, float] = {}
+    for alias, v in row.items():
+        units = None
+        if isinstance(v, dict) and "value" in v:
+            v, units = v["value"], v.get("units")
+        if alias != "path" and isinstance(v, (int, float)) and not isinstance(v, bool):
+            features[alias] = float(v)
+            signature[alias] = ["units", units]
+        else:
+            signature[alias] = [v, units]
+    return json.dumps(signature, sort_keys=True, default=str), dict(sorted(features.items()))
+
+
+class _RBFGroup:
+    """
+    Cubic radial basis function interpolant with a linear tail, fitted to every
+    modeled output at once over the scaled numeric inputs of one signature.
+    Only the most recent MAX_SAMPLES results are kept, which bounds the dense
+    solve every refit costs.
+    """
+    MAX_SAMPLES = 200
+
+    def __init__(self, aliases: List[str], outputs: List[str]):
+        self.aliases = aliases
+        self.outputs = outputs
+        # Latest result per point, oldest first
+        self.samples: "OrderedDict[Tuple[float, ...], List[float]]" = OrderedDict()
+        self.fitted = False
+
+    def add(self, x: Tuple[float, ...], y: List[float]):
+        self.samples[x] = y
+        self.samples.move_to_end(x)
+        while len(self.samples) > self.MAX_SAMPLES:
+            self.samples.popitem(last=False)
+        self.fitted = False
+
+    def fit(self) -> bool:
+        if self.fitted:
+            return True
+        points = np.array(list(self.samples.keys()), dtype=float)
+        self.values = np.array(list(self.samples.values()), dtype=float)
+        self.lo = points.min(axis=0)
+        self.hi = points.max(axis=0)
+        self.span = np.where(self.hi > self.lo, self.hi - self.lo, 1.0)
+        self.centers = (points - self.lo) / self.span
+
+        n, d = self.centers.shape
+        P = np.hstack([np.ones((n, 1)), self.centers])
+        A = np.zeros((n + d + 1, n + d + 1))
+        A[:n, :n] = self._kernel(self.centers)
+        A[:n, n:] = P
+        A[n:, :n] = P.T
+        rhs = np.vstack([self.values, np.zeros((d + 1, len(self.outputs)))])
+        # A is symmetric but indefinite; one eigendecomposition gives both the
+        # coefficients and the diagonal of A^-1 without forming the inverse
+        try:
+            eigenvalues, vectors = np.linalg.eigh(A)
+        except np.linalg.LinAlgError:
+            return False
+        magnitude = np.abs(eigenvalues)
+        if magnitude.min() <= magnitude.max() * len(A) * np.finfo(float).eps:
+            return False  # Degenerate layout (e.g. all points on a line in 2D); keep calculating
+        self.coef = vectors @ ((vectors.T @ rhs) / eigenvalues[:, None])
+        # Rippa's leave-one-out error of each sample, used as the local error estimate
+        inverse_diagonal = (vectors[:n] ** 2) @ (1.0 / eigenvalues)
+        self.loo_error = np.abs(self.coef[:n] / inverse_diagonal[:, None])
+        self.fitted = True
+        return True
+
+    def _kernel(self, points: np.ndarray) -> np.ndarray:
+        r = np.linalg.norm(points[:, None, :] - self.centers[None, :, :], axis=-1)
+        return r ** 3
+
+    def predict(self, x: Tuple[float, ...]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Values and error estimates at x, or None if x lies outside the evaluated box."""
+        point = np.array(x, dtype=float)
+        if np.any(point < self.lo - 1e-9 * self.span) or np.any(point > self.hi + 1e-9 * self.span):
+            return None
+        scaled = ((point - self.lo) / self.span)[None, :]
+        basis = np.hstack([self._kernel(scaled), np.ones((1, 1)), scaled])
+        values = (basis @ self.coef)[0]
+        # Worst leave-one-out error among the samples surrounding x
+        distances = np.linalg.norm(self.centers - scaled, axis=1)
+        nearest = np.argsort(distances)[:2 ** len(self.aliases)]
+        return values, self.loo_error[nearest].max(axis=0)
+
+
+class SurrogateModel:
+    """Per-batch surrogate state: training samples, spot-check schedule and stats."""
+
+    def __init__(self, spec: SurrogateSpec):
+        self.spec = spec
+        self.groups: Dict[str, _RBFGroup] = {}
+        self.since_check = 0
+        self.suspended = 0  # Rows to calculate for real after a failed spot check
+        self.stats = {"calculated": 0, "predicted": 0, "spot_checks": 0, "spot_check_failures": 0}
+
+    def predict(self, row: Dict[str, Any]) -> Optional[Prediction]:
+        """Surrogate answer for a row, or None if the row has to be calculated."""
+        if self.suspended:
+            return None
+        signature, features = _split_row(row)
+        group = self.groups.get(signature)
+        if group is None or not features or list(features) != group.aliases:
+            return None
+        warmup = max(min(self.spec.warmup_rows, group.MAX_SAMPLES), len(features) + 2)
+        if len(group.samples) < warmup or not group.fit():
+            return None
+        predicted = group.predict(tuple(features.values()))
+        if predicted is None:
+            return None
+        values, errors = predicted
+        tolerance = np.maximum(self.spec.max_error * np.abs(values), self.spec.abs_error)
+        if np.any(errors > tolerance):
+            return None
+        return Prediction(
+            outputs=dict(zip(group.outputs, values.tolist())),
+            error_estimate=dict(zip(group.outputs, errors.tolist())),
+            tolerance=dict(zip(group.outputs, tolerance.tolist())),
+        )
+
+    def spot_check_due(self) -> bool:
+        """Called for each predictable row; True when this one should be calculated anyway."""
+        self.since_check += 1
+        if self.since_check >= self.spec.spot_check_every:
+            self.since_check = 0
+            return True
+        return False
+
+    def record_prediction(self):
+        self.stats["predicted"] += 1
+
+    def observe(self, row: Dict[str, Any], outputs: Dict[str, Any],
+                prediction: Optional[Prediction] = None) -> Optional[Dict[str, Any]]:
+        """
+        Adds a calculated row to the training set. If the row was a spot check,
+        compares it to the prediction and returns the comparison.
+        """
+        self.stats["calculated"] += 1
+        if self.suspended:
+            self.suspended -= 1
+
+        signature, features = _split_row(row)
+        if features:
+            group = self.groups.get(signature)
+            if group is None:
+                names = self.spec.outputs or [
+                    alias for alias, v in outputs.items()
+                    if isinstance(v, (int, float)) and not isinstance(v, bool)
+                ]
+                group = self.groups[signature] = _RBFGroup(list(features), names)
+            y = [outputs.get(name) for name in group.outputs]
+            if list(features) == group.aliases and group.outputs and all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) for v in y
+            ):
+                group.add(tuple(features.values()), [float(v) for v in y])
+
+        if prediction is None:
+            return None
+        self.stats["spot_checks"] += 1
+        check: Dict[str, Any] = {"passed": True, "outputs": {}}
+        for name, predicted in prediction.outputs.items():
+            actual = outputs.get(name)
+            if not isinstance(actual, (int, float)) or isinstance(actual, bool):
+                continue
+            error = abs(actual - predicted)
+            check["outputs"][name] = {"predicted": predicted, "actual": actual, "error": error}
+            if error > prediction.tolerance[name]:
+                check["passed"] = False
+        if not check["passed"]:
+            self.stats["spot_check_failures"] += 1
+            self.suspended = self.spec.spot_check_every
+        return check
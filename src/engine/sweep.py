@@ -0,0 +1,171 @@
+import itertools
+import math
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
+from pydantic import BaseModel, Field, model_validator
+
+
+def _axis_levels(size: int) -> List[int]:
+    """
+    Refinement level of each position on an axis: 0 for both ends, 1 for the
+    midpoint, 2 for the quarter points, and so on until every position has one.
+    """
+    levels: List[Optional[int]] = [None] * size
+    level, parts = 0, 1
+    while None in levels:
+        for k in range(parts + 1):
+            position = round(k * (size - 1) / parts)
+            if levels[position] is None:
+                levels[position] = level
+        level += 1
+        parts *= 2
+    return levels
+
+
+class SweepNode(BaseModel):
+    """
+    One node of a compact sweep definition.
+
+    "range" and "list" nodes are value axes for a single alias; "product" and
+    "zip" combine child nodes the same way generateCartesian/generateZip do on
+    the frontend (product: last axis varies fastest, zip: shortest axis wins).
+    Rows are computed from their index, so a sweep never has to be expanded
+    in memory.
+    """
+    type: Literal["range", "list", "product", "zip"]
+    alias: Optional[str] = None
+    units: Optional[str] = None  # Applied to numeric values, like InputConfig.units
+
+    # range: start..end inclusive by step
+    start: Optional[float] = None
+    end: Optional[float] = None
+    step: Optional[float] = None
+
+    # list
+    values: Optional[List[Any]] = None
+
+    # product / zip
+    axes: List["SweepNode"] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def _check_fields(self):
+        if self.type in ("range", "list") and not self.alias:
+            raise ValueError(f"'{self.type}' sweep node requires an alias")
+        if self.type == "range" and (self.start is None or self.end is None or self.step is None):
+            raise ValueError("'range' sweep node requires start, end and step")
+        if self.type == "list" and self.values is None:
+            raise ValueError("'list' sweep node requires values")
+        if self.type in ("product", "zip") and not self.axes:
+            raise ValueError(f"'{self.type}' sweep node requires at least one axis")
+        return self
+
+    def count(self) -> int:
+        """Number of rows this node expands to."""
+        if self.type == "list":
+            return len(self.values)
+        if self.type == "range":
+            if self.step == 0:
+                return 1
+            span = (self.end - self.start) / self.step
+            if span < -1e-9:
+                return 0  # Step points away from end
+            # Tolerance mirrors the toFixed(10) rounding in generateRange
+            return int(math.floor(span + 1e-9)) + 1
+        sizes = [axis.count() for axis in self.axes]
+        if self.type == "zip":
+            return min(sizes)
+        return math.prod(sizes)
+
+    def row_at(self, index: int) -> Dict[str, Any]:
+        """Inputs for row `index` as {alias: value}, the same shape /batch/start takes."""
+        if self.type in ("range", "list"):
+            if self.type == "list":
+                value = self.values[index]
+            else:
+                value = round(self.start + index * self.step, 10)
+            if self.units and not isinstance(value, str):
+                return {self.alias: {"value": value, "units": self.units}}
+            return {self.alias: value}
+
+        row: Dict[str, Any] = {}
+        if self.type == "zip":
+            for axis in self.axes:
+                row.update(axis.row_at(index))
+            return row
+
+        # Mixed-radix decomposition: last axis varies fastest
+        positions = []
+        for axis in reversed(self.axes):
+            index, position = divmod(index, axis.count())
+            positions.append(position)
+        for axis, position in zip(self.axes, reversed(positions)):
+            row.update(axis.row_at(position))
+        return row
+
+    def ordered_index(self, step: int) -> int:
+        """
+        Row index to run at execution step `step` so that consecutive rows of a
+        product change a single axis (reflected mixed-radix Gray code: each axis
+        sweeps back and forth instead of jumping back to its first value).
+        Other node types run in their natural order.
+        """
+        if self.type != "product":
+            return step
+        sizes = [axis.count() for axis in self.axes]
+        positions = []
+        for axis, size in zip(reversed(self.axes), reversed(sizes)):
+            step, digit = divmod(step, size)
+            if step % 2:
+                digit = size - 1 - digit  # Odd pass over this axis runs backwards
+            positions.append(axis.ordered_index(digit))
+        index = 0
+        for position, size in zip(reversed(positions), sizes):
+            index = index * size + position
+        return index
+
+
+class SweepSpec(BaseModel):
+    """Compact batch definition: fixed inputs plus a sweep tree expanded lazily."""
+    constants: Dict[str, Any] = Field(default_factory=dict)  # Same for every row, e.g. {"path": ...}
+    grid: SweepNode
+
+    def count(self) -> int:
+        return self.grid.count()
+
+    def row_at(self, index: int) -> Dict[str, Any]:
+        if not 0 <= index < self.count():
+            raise IndexError(f"Sweep row {index} out of range")
+        return {**self.constants, **self.grid.row_at(index)}
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Yields every row in order without materializing the sweep."""
+        for index in range(self.count()):
+            yield {**self.constants, **self.grid.row_at(index)}
+
+    def ordered_rows(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yields (row index, row) in Gray order, minimizing input changes between rows."""
+        for step in range(self.count()):
+            index = self.grid.ordered_index(step)
+            yield index, {**self.constants, **self.grid.row_at(index)}
+
+    def coarse_to_fine_rows(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Yields (row index, row) level by level: the corners of the grid first,
+        then the midpoints of every axis of a product, then the quarter points,
+        until every row has run. Early rows therefore span the whole sweep.
+        """
+        if self.count() == 0:
+            return
+        axes = self.grid.axes if self.grid.type == "product" else [self.grid]
+        sizes = [axis.count() for axis in axes]
+        levels = [_axis_levels(size) for size in sizes]
+        for level in range(max(max(axis_levels) for axis_levels in levels) + 1):
+            positions = [
+                [p for p, l in enumerate(axis_levels) if l <= level] for axis_levels in levels
+            ]
+            for point in itertools.product(*positions):
+                if max(axis_levels[p] for axis_levels, p in zip(levels, point)) != level:
+                    continue  # Already yielded at a coarser level
+                index = 0
+                for position, size in zip(point, sizes):
+                    index = index * size + position
+                yield index, {**self.constants, **self.grid.row_at(index)}
@@ -0,0 +1,279 @@
+"""
+Batch rows from an uploaded table (CSV, or XLSX converted to CSV on upload).
+
+An upload is scanned once when it arrives: the byte offset of every record
+goes into an index file next to it, and per-column statistics are reported
+so the column-to-alias mapping can be checked before a batch starts. A batch
+then reads its rows lazily from the file, and row_at seeks straight to a
+record, so a large table is never loaded into memory or sent as JSON.
+"""
+import array
+import csv
+import json
+import os
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, Field, model_validator
+
+TABLE_EXTENSIONS = (".csv", ".xlsx", ".xlsm")
+MAX_ERRORS = 20  # Malformed records listed in an upload summary
+PREVIEW_ROWS = 5
+_ENCODINGS = ("utf-8", "cp1252")  # cp1252: CSV saved by Excel on Windows
+
+
+class TableColumn(BaseModel):
+    column: str  # Header in the table
+    alias: str  # Worksheet input it feeds
+    units: Optional[str] = None  # Applied to numeric values, like InputConfig.units
+
+
+class TableSpec(BaseModel):
+    """Batch rows from an uploaded table: one row per record, mapped columns as inputs."""
+    upload_id: str
+    path: Optional[str] = None  # Worksheet for every row...
+    path_column: Optional[str] = None  # ...or the column naming each row's worksheet
+    columns: List[TableColumn] = Field(min_length=1)
+
+    @model_validator(mode="after")
+    def _check_path(self):
+        if (self.path is None) == (self.path_column is None):
+            raise ValueError("Table needs either 'path' or 'path_column'")
+        return self
+
+
+def _cell(text: str) -> Any:
+    """Cell text as int, float or string; None when empty."""
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _records(f: BinaryIO, encoding: str) -> Iterator[Tuple[int, List[str]]]:
+    """(byte offset, fields) of every non-blank CSV record from the file's position on."""
+    position = [f.tell()]
+
+    def lines() -> Iterator[str]:
+        for line in f:
+            position[0] += len(line)
+            yield line.decode(encoding)
+
+    reader = csv.reader(lines())
+    while True:
+        # The reader pulls lines only as a record needs them, so this is where it starts
+        start = position[0]
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        if any(field.strip() for field in record):
+            yield start, record
+
+
+def _bom_length(f: BinaryIO) -> int:
+    f.seek(0)
+    skip = 3 if f.read(3) == b"\xef\xbb\xbf" else 0
+    f.seek(skip)
+    return skip
+
+
+def xlsx_to_csv(xlsx_path: str, csv_path: str):
+    """Streams the first worksheet of an Excel workbook into a UTF-8 CSV."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Reading .xlsx files requires openpyxl")
+    workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            for values in sheet.iter_rows(values_only=True):
+                writer.writerow(["" if v is None else v for v in values])
+    finally:
+        workbook.close()
+
+
+def _paths(upload_dir: str, upload_id: str) -> Dict[str, str]:
+    if not upload_id.isalnum():
+        raise ValueError(f"Invalid upload ID '{upload_id}'")
+    base = os.path.join(upload_dir, upload_id)
+    return {"csv": f"{base}.csv", "index": f"{base}.idx", "meta": f"{base}.json"}
+
+
+def prepare_upload(raw_path: str, filename: str, upload_dir: str, upload_id: str) -> Dict[str, Any]:
+    """
+    Turns a received file into a stored table: converts XLSX to CSV, indexes
+    the records and returns (and saves) a summary with the columns, row count,
+    per-column statistics, a preview and any malformed records.
+    Raises ValueError for a file that isn't a readable table.
+    """
+    paths = _paths(upload_dir, upload_id)
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in TABLE_EXTENSIONS:
+        raise ValueError(f"Unsupported table type '{ext}' (use {', '.join(TABLE_EXTENSIONS)})")
+    try:
+        if ext == ".csv":
+            os.replace(raw_path, paths["csv"])
+        else:
+            xlsx_to_csv(raw_path, paths["csv"])
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+    for encoding in _ENCODINGS:
+        try:
+            summary = _scan(paths, encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError("Table is neither UTF-8 nor Windows-1252 text")
+    summary.update({"upload_id": upload_id, "filename": filename, "uploaded_at": time.time()})
+    with open(paths["meta"], "w", encoding="utf-8") as f:
+        json.dump(summary, f)
+    return summary
+
+
+def _scan(paths: Dict[str, str], encoding: str) -> Dict[str, Any]:
+    offsets = array.array("q")
+    header: Optional[List[str]] = None
+    stats: List[Dict[str, int]] = []
+    preview: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    error_count = 0
+    with open(paths["csv"], "rb") as f:
+        _bom_length(f)
+        for offset, record in _records(f, encoding):
+            if header is None:
+                header = [name.strip() for name in record]
+                if len(set(header)) != len(header) or not all(header):
+                    raise ValueError("Table header has empty or duplicate column names")
+                stats = [{"numeric": 0, "text": 0, "empty": 0} for _ in header]
+                continue
+            row = len(offsets)
+            if len(record) > len(header):
+                error_count += 1
+                if len(errors) < MAX_ERRORS:
+                    errors.append(f"Row {row}: {len(record)} fields, header has {len(header)}")
+            for column, text in zip(stats, record + [""] * (len(header) - len(record))):
+                value = _cell(text)
+                column["empty" if value is None else "text" if isinstance(value, str) else "numeric"] += 1
+            if len(preview) < PREVIEW_ROWS:
+                preview.append(dict(zip(header, (_cell(text) for text in record))))
+            offsets.append(offset)
+    if header is None:
+        raise ValueError("Table is empty")
+    with open(paths["index"], "wb") as f:
+        offsets.tofile(f)
+    return {
+        "encoding": encoding,
+        "rows": len(offsets),
+        "columns": [{"name": name, **column} for name, column in zip(header, stats)],
+        "preview": preview,
+        "errors": errors,
+        "error_count": error_count,
+    }
+
+
+def load_summary(upload_dir: str, upload_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_paths(upload_dir, upload_id)["meta"], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def prune_uploads(upload_dir: str, max_age: float):
+    """Deletes stored tables older than max_age seconds."""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(upload_dir))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass  # In use by a running batch (Windows) or already gone
+
+
+class TableSource:
+    """The batch rows of a TableSpec, read from its stored upload on demand."""
+
+    def __init__(self, spec: TableSpec, upload_dir: str):
+        self.spec = spec
+        summary = load_summary(upload_dir, spec.upload_id)
+        if summary is None:
+            raise ValueError(f"Upload {spec.upload_id} not found")
+        paths = _paths(upload_dir, spec.upload_id)
+        self.csv_path = paths["csv"]
+        self.encoding = summary["encoding"]
+        header = [column["name"] for column in summary["columns"]]
+        wanted = [c.column for c in spec.columns] + ([spec.path_column] if spec.path_column else [])
+        missing = [name for name in wanted if name not in header]
+        if missing:
+            raise ValueError(f"Columns not in the table: {', '.join(missing)}")
+        self.positions = [(header.index(c.column), c) for c in spec.columns]
+        self.path_position = header.index(spec.path_column) if spec.path_column else None
+
+        self.offsets = array.array("q")
+        with open(paths["index"], "rb") as f:
+            self.offsets.frombytes(f.read())
+        self._file: Optional[BinaryIO] = None
+        self._lock = threading.Lock()
+
+    def count(self) -> int:
+        return len(self.offsets)
+
+    def _row(self, record: List[str]) -> Dict[str, Any]:
+        """Batch row of a record, in the shape /batch/start takes; empty cells are left out."""
+        field = lambda position: record[position] if position < len(record) else ""
+        if self.path_position is not None:
+            row: Dict[str, Any] = {"path": field(self.path_position).strip()}
+        else:
+            row = {"path": self.spec.path}
+        for position, column in self.positions:
+            value = _cell(field(position))
+            if value is None:
+                continue
+            if column.units and not isinstance(value, str):
+                row[column.alias] = {"value": value, "units": column.units}
+            else:
+                row[column.alias] = value
+        return row
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Yields every row in order, streaming the file."""
+        if not self.offsets:
+            return
+        with open(self.csv_path, "rb") as f:
+            f.seek(self.offsets[0])
+            for _, record in _records(f, self.encoding):
+                yield self._row(record)
+
+    def row_at(self, index: int) -> Dict[str, Any]:
+        if not 0 <= index < len(self.offsets):
+            raise IndexError(f"Table row {index} out of range")
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.csv_path, "rb")
+            self._file.seek(self.offsets[index])
+            # Read just this record; the file position is only valid until the next seek
+            _, record = next(_records(self._file, self.encoding))
+        return self._row(record)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
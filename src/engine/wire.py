@@ -0,0 +1,264 @@
+"""
+Wire format for the engine queues.
+
+Each queue message is a msgpack stream: a message kind, then the jobs going
+to the harness or the results coming back. JobRequest/JobResult travel as
+positional arrays instead of pickled dataclasses, InputConfig as a compact
+extension type, and NumPy arrays as raw buffers. Anything else falls back to
+pickle so payloads stay as flexible as they were.
+
+Arrays of SharedArrays.THRESHOLD bytes or more skip the queue entirely when
+the sender passes a SharedArrays: they are copied once into a shared memory
+block and only its name, dtype and shape are sent. The receiver maps the
+block and gets a zero-copy view. Blocks are grouped by job ID so each side
+can release them with the job:
+
+- request blocks are created by EngineManager and unlinked when the job's
+  result arrives (the harness closes its mapping as soon as the job is done);
+- result blocks are created by the harness and kept until EngineManager,
+  having mapped them, sends a release message back.
+"""
+import pickle
+import threading
+import weakref
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+import msgpack
+import numpy as np
+
+from engine.protocol import JobRequest, JobResult, InputConfig
+
+# msgpack extension type codes
+_EXT_INPUT_CONFIG = 1
+_EXT_NDARRAY = 2
+_EXT_PICKLE = 3
+_EXT_SHARED_ARRAY = 4
+
+# Message kinds (first object of each message)
+_MSG_JOBS = 0
+_MSG_RESULTS = 1
+_MSG_RELEASE = 2
+
+
+class SharedArrays:
+    """
+    Shared memory blocks this process created or mapped, by name, grouped
+    by owner (the job ID being encoded or decoded when they were made).
+    Thread-safe: the harness encodes results on its sender thread.
+    """
+    THRESHOLD = 256 * 1024  # Smaller arrays are cheaper to copy through the queue
+
+    def __init__(self):
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.created: set = set()
+        self.owners: Dict[Optional[str], List[str]] = {}
+        self.owner_of: Dict[str, Optional[str]] = {}
+        self.attached: List[str] = []  # Mapped since the last take_attached()
+        # Arrays handed out per mapped block. NumPy doesn't pin the mapping, so
+        # a block is only closed once all of them (and views of them) are gone.
+        self.views: Dict[str, List[weakref.ref]] = {}
+        self.closing: Dict[str, shared_memory.SharedMemory] = {}  # Released, still viewed
+        self.owner: Optional[str] = None
+        self.lock = threading.RLock()
+
+    def _add(self, shm: shared_memory.SharedMemory, owner: Optional[str]):
+        self.blocks[shm.name] = shm
+        self.owner_of[shm.name] = owner
+        self.owners.setdefault(owner, []).append(shm.name)
+
+    def share(self, array: np.ndarray) -> str:
+        """Copies array into a new block owned by the current owner; returns its name."""
+        with self.lock:
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            self.created.add(shm.name)
+            self._add(shm, self.owner)
+            return shm.name
+
+    def attach(self, name: str, dtype: str, shape: List[int]) -> np.ndarray:
+        """Maps a block created by the other process; returns a read-only view of it."""
+        with self.lock:
+            shm = self.blocks.get(name)
+            if shm is None:
+                shm = shared_memory.SharedMemory(name=name)
+                self._add(shm, self.owner)
+                self.attached.append(name)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            array.flags.writeable = False
+            self.views.setdefault(name, []).append(weakref.ref(array))
+            return array
+
+    def take_attached(self) -> List[str]:
+        """Names mapped since the last call (for EngineManager to acknowledge)."""
+        with self.lock:
+            names, self.attached = self.attached, []
+            return names
+
+    def release(self, names: List[str]):
+        """Closes blocks (and unlinks those we created). A block that arrays
+        still view stays mapped and is closed by a later release instead."""
+        with self.lock:
+            for name in names:
+                shm = self.blocks.pop(name, None)
+                if shm is None:
+                    continue
+                owner = self.owner_of.pop(name, None)
+                owned = self.owners.get(owner)
+                if owned is not None and name in owned:
+                    owned.remove(name)
+                    if not owned:
+                        del self.owners[owner]
+                if name in self.created:
+                    self.created.discard(name)
+                    try:
+                        shm.unlink()
+                    except FileNotFoundError:
+                        pass
+                self.closing[name] = shm
+            for name, shm in list(self.closing.items()):
+                if any(ref() is not None for ref in self.views.get(name, [])):
+                    continue
+                self.views.pop(name, None)
+                del self.closing[name]
+                shm.close()
+
+    def release_owner(self, owner: str):
+        """Releases every block made while encoding or decoding job `owner`."""
+        with self.lock:
+            self.release(list(self.owners.pop(owner, [])))
+
+    def release_all(self):
+        with self.lock:
+            self.attached = []
+            self.release(list(self.blocks))
+            self.owners.clear()
+
+
+def _packer(shared: Optional[SharedArrays]) -> msgpack.Packer:
+    def default(obj: Any) -> Any:
+        if isinstance(obj, InputConfig):
+            return msgpack.ExtType(_EXT_INPUT_CONFIG, _pack([obj.alias, obj.value, obj.units], shared))
+        if isinstance(obj, np.ndarray):
+            array = np.ascontiguousarray(obj)
+            if array.dtype.hasobject:
+                return array.tolist()
+            header = [array.dtype.str, list(array.shape)]
+            if shared is not None and array.nbytes >= shared.THRESHOLD:
+                return msgpack.ExtType(_EXT_SHARED_ARRAY, _pack([shared.share(array), *header]))
+            return msgpack.ExtType(_EXT_NDARRAY, _pack([*header, array.tobytes()]))
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return msgpack.ExtType(_EXT_PICKLE, pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    return msgpack.Packer(default=default, use_bin_type=True)
+
+
+def _ext_hook(shared: Optional[SharedArrays]):
+    def hook(code: int, data: bytes) -> Any:
+        if code == _EXT_INPUT_CONFIG:
+            alias, value, units = _unpack(data, shared)
+            return InputConfig(alias=alias, value=value, units=units)
+        if code == _EXT_NDARRAY:
+            dtype, shape, buffer = _unpack(data)
+            return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape)
+        if code == _EXT_SHARED_ARRAY:
+            if shared is None:
+                raise ValueError("Message references shared memory but no SharedArrays was given")
+            return shared.attach(*_unpack(data))
+        if code == _EXT_PICKLE:
+            return pickle.loads(data)
+        return msgpack.ExtType(code, data)
+
+    return hook
+
+
+def _pack(obj: Any, shared: Optional[SharedArrays] = None) -> bytes:
+    return _packer(shared).pack(obj)
+
+
+def _unpack(data: bytes, shared: Optional[SharedArrays] = None) -> Any:
+    return msgpack.unpackb(data, ext_hook=_ext_hook(shared), raw=False, strict_map_key=False)
+
+
+def _encode(kind: int, items: List[Tuple[str, list]], shared: Optional[SharedArrays]) -> bytes:
+    """Packs (owner, fields) items one by one so shared blocks are grouped by owner."""
+    packer = _packer(shared)
+    parts = [packer.pack(kind)]
+    if shared is None:
+        parts.extend(packer.pack(fields) for _, fields in items)
+        return b"".join(parts)
+    with shared.lock:
+        try:
+            for owner, fields in items:
+                shared.owner = owner
+                parts.append(packer.pack(fields))
+        finally:
+            shared.owner = None
+    return b"".join(parts)
+
+
+def _decode(data: bytes, shared: Optional[SharedArrays]) -> Tuple[int, List[Any]]:
+    """(kind, items); shared blocks are grouped by the job ID in each item's first field."""
+    unpacker = msgpack.Unpacker(ext_hook=_ext_hook(shared), raw=False, strict_map_key=False,
+                                max_buffer_size=len(data) or 1)
+    unpacker.feed(data)
+    kind = unpacker.unpack()
+    if kind == _MSG_RELEASE or shared is None:
+        return kind, list(unpacker)
+    items = []
+    with shared.lock:
+        shared.owner = None
+        while True:
+            try:
+                item = unpacker.unpack()
+            except msgpack.OutOfData:
+                break
+            # Blocks mapped while decoding the item belong to its job
+            for name in shared.owners.pop(None, []):
+                shared.owner_of[name] = item[0]
+                shared.owners.setdefault(item[0], []).append(name)
+            items.append(item)
+    return kind, items
+
+
+def encode_requests(requests: List[JobRequest], shared: Optional[SharedArrays] = None) -> bytes:
+    return _encode(_MSG_JOBS, [(req.id, [req.id, req.command, req.payload]) for req in requests], shared)
+
+
+def encode_release(names: List[str]) -> bytes:
+    """Tells the harness the listed result blocks have been mapped and can be released."""
+    return _pack(_MSG_RELEASE) + _pack(list(names))
+
+
+def decode_requests(data: bytes, shared: Optional[SharedArrays] = None) -> Tuple[List[JobRequest], List[str]]:
+    """(jobs, names of result blocks to release) from one input queue message."""
+    kind, items = _decode(data, shared)
+    if kind == _MSG_RELEASE:
+        return [], items[0] if items else []
+    return [JobRequest(command=command, payload=payload, id=job_id)
+            for job_id, command, payload in items], []
+
+
+def encode_results(results: List[JobResult], shared: Optional[SharedArrays] = None) -> bytes:
+    return _encode(_MSG_RESULTS, [(r.job_id, [r.job_id, r.status, r.data, r.error_message, r.error_kind])
+                                  for r in results], shared)
+
+
+def decode_results(data: bytes, shared: Optional[SharedArrays] = None) -> List[JobResult]:
+    _, items = _decode(data, shared)
+    return [JobResult(job_id=job_id, status=status, data=job_data,
+                      error_message=error_message, error_kind=error_kind)
+            for job_id, status, job_data, error_message, error_kind in items]
+
+
+def to_builtin(obj: Any) -> Any:
+    """Copy of obj with NumPy arrays and scalars turned into lists and numbers (for JSON)."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, dict):
+        return {k: to_builtin(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_builtin(v) for v in obj]
+    return obj
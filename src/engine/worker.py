@@ -1,12 +1,80 @@
-from MathcadPy import Mathcad
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional
+import numpy as np
+from engine.protocol import FailureKind
+
+# HRESULTs pywin32 raises once the Mathcad COM server has gone away
+_DISCONNECTED_HRESULTS = {
+    -2147023174,  # RPC_S_SERVER_UNAVAILABLE
+    -2147023170,  # RPC_S_CALL_FAILED
+    -2147417848,  # RPC_E_DISCONNECTED
+    -2147221251,  # CO_E_OBJNOTCONNECTED
+}
+
+
+def is_connection_lost(e: Exception) -> bool:
+    """True if the exception is a COM error meaning Mathcad is no longer reachable."""
+    if type(e).__name__ != "com_error":
+        return False
+    hresult = getattr(e, "hresult", None)
+    if hresult is None and e.args:
+        hresult = e.args[0]
+    return hresult in _DISCONNECTED_HRESULTS
+
+
+def classify_error(e: Exception) -> FailureKind:
+    """Map an exception raised while processing or preparing a job to a FailureKind."""
+    kind = getattr(e, "kind", None)
+    if isinstance(kind, FailureKind):
+        return kind
+    if is_connection_lost(e):
+        return FailureKind.CONNECTION
+    if isinstance(e, (FileNotFoundError, ValueError, TypeError, KeyError)):
+        # Bad payload: missing file, non-numeric value, malformed input entry
+        return FailureKind.INPUT
+    return FailureKind.UNKNOWN
+
+
+class MathcadError(Exception):
+    """Base class for worker failures. `kind` tells the caller how to recover."""
+    kind = FailureKind.UNKNOWN
+
+class MathcadInputError(MathcadError):
+    kind = FailureKind.INPUT
+
+class MathcadWorksheetError(MathcadError):
+    kind = FailureKind.WORKSHEET
+
+class MathcadConnectionError(MathcadError):
+    kind = FailureKind.CONNECTION
+
 
 class MathcadWorker:
-    def __init__(self):
+    # Worksheets kept open at once; switching between them is an activation, not a reopen
+    MAX_OPEN_WORKSHEETS = 4
+    # Seconds between liveness checks made while the harness is idle
+    HEALTH_CHECK_INTERVAL = 30.0
+
+    def __init__(self, max_open: Optional[int] = None):
+        if max_open is not None:
+            self.MAX_OPEN_WORKSHEETS = max(max_open, 1)
         self.mc = None  # Mathcad() instance
+        # Whether the connection is believed alive. Jobs trust this instead of
+        # probing COM; a connection error in a job (mark_lost) or an idle-time
+        # check_connection clears it, and the next job reconnects.
+        self.connected = False
+        self.last_checked = 0.0  # time.monotonic() of the last liveness check
         self.worksheet = None  # Worksheet() instance
         self.current_file_path = None  # Track currently open file to avoid unnecessary reopening
+        self.applied_inputs: Dict[str, Any] = {}  # alias -> (value, units) last set on the open worksheet
+        # Open worksheets by absolute path, least recently used first, and the
+        # inputs applied to each (they keep their values while switched away from)
+        self.open_sheets: "OrderedDict[str, Any]" = OrderedDict()
+        self.sheet_inputs: Dict[str, Dict[str, Any]] = {}
+        # open_file outcomes: already active, activated from the open set, opened, closed to make room
+        self.stats = {"hits": 0, "switches": 0, "misses": 0, "evictions": 0}
         # COM initialization is handled internally by MathcadPy
 
     def connect(self) -> bool:
@@ -15,11 +83,22 @@ class MathcadWorker:
         MathcadPy handles COM initialization automatically.
         """
         try:
+            # Imported on first connect: loading the COM bindings is slow, and the
+            # harness should answer pings while Mathcad is still launching
+            from MathcadPy import Mathcad
             self.mc = Mathcad(visible=True)
+            # Worksheet handles from a previous connection are dead
+            self.worksheet = None
+            self.current_file_path = None
+            self.applied_inputs = {}
+            self.open_sheets.clear()
+            self.sheet_inputs.clear()
+            self.connected = True
+            self.last_checked = time.monotonic()
             print(f"Connected to Mathcad version: {self.mc.version}")
             return True
         except Exception as e:
-            raise Exception(f"Failed to connect to Mathcad: {str(e)}")
+            raise MathcadConnectionError(f"Failed to connect to Mathcad: {str(e)}")
 
     def is_connected(self) -> bool:
         """Check if Mathcad connection is alive by testing COM accessibility."""
@@ -35,57 +114,199 @@ class MathcadWorker:
             # COM connection is dead
             return False
 
+    def ensure_connected(self):
+        """
+        Connects unless the connection is believed alive. Makes no COM call when
+        it is: a connection that died since shows up as a COM error in the job,
+        which marks it lost so the next job reconnects.
+        """
+        if self.mc is None or not self.connected:
+            if self.mc is not None:
+                print("Mathcad connection lost, reconnecting...")
+            self.connect()
+
+    def mark_lost(self):
+        """Records that a job hit a dead connection."""
+        self.connected = False
+
+    def check_connection(self, force: bool = False) -> bool:
+        """
+        Probes the connection at most every HEALTH_CHECK_INTERVAL seconds (or
+        now, with force) and updates `connected`. Called by the harness between
+        jobs, so calculations never wait on it.
+        """
+        if self.mc is None:
+            return False
+        now = time.monotonic()
+        if force or now - self.last_checked >= self.HEALTH_CHECK_INTERVAL:
+            self.last_checked = now
+            self.connected = self.is_connected()
+        return self.connected
+
     def open_file(self, path: str, force_reopen: bool = False):
         """
         Open a Mathcad file. If the same file is already open, skip reopening unless force_reopen=True.
         This optimization significantly improves batch processing performance.
         """
-        # Check if connection is alive, reconnect if necessary
-        if not self.is_connected():
-            print("Mathcad connection lost, reconnecting...")
-            self.connect()
+        # Reconnect if the connection is known to be dead (no COM round trip otherwise)
+        self.ensure_connected()
 
         abs_path = Path(path).resolve()
         if not abs_path.exists():
             raise FileNotFoundError(f"File not found: {abs_path}")
 
+        key = str(abs_path)
         # Performance optimization: Skip reopening if same file is already open
-        if not force_reopen and self.current_file_path == str(abs_path):
+        if not force_reopen and self.current_file_path == key:
+            self.stats["hits"] += 1
             return  # File already open, skip reopening
 
         try:
-            self.worksheet = self.mc.open(abs_path)
-            self.worksheet.activate()
-            self.current_file_path = str(abs_path)  # Track opened file
+            worksheet = None if force_reopen else self._activate(key)
+            if worksheet is None:
+                self._close(key)
+                self.stats["misses"] += 1
+                worksheet = self.mc.open(abs_path)
+                self.open_sheets[key] = worksheet
+                self.sheet_inputs[key] = {}  # Fresh worksheet has its saved values, not ours
+                worksheet.activate()
+            else:
+                self.stats["switches"] += 1
+            self.open_sheets.move_to_end(key)
+            self.worksheet = worksheet
+            self.current_file_path = key  # Track opened file
+            self.applied_inputs = self.sheet_inputs.setdefault(key, {})
+        except Exception as e:
+            if is_connection_lost(e):
+                raise MathcadConnectionError(f"Failed to open file {abs_path}: {str(e)}")
+            raise MathcadWorksheetError(f"Failed to open file {abs_path}: {str(e)}")
+        self._evict()
+
+    def _activate(self, key: str):
+        """
+        Brings an already open worksheet to the front. Returns None if it isn't
+        open, or if its handle no longer works (closed in Mathcad by the user),
+        in which case it is dropped so the caller opens it again.
+        """
+        worksheet = self.open_sheets.get(key)
+        if worksheet is None:
+            return None
+        try:
+            worksheet.activate()
+            return worksheet
+        except Exception as e:
+            if is_connection_lost(e):
+                raise
+            print(f"Open worksheet {key} went stale ({e}), reopening")
+            self.open_sheets.pop(key, None)
+            self.sheet_inputs.pop(key, None)
+            return None
+
+    def _close(self, key: str):
+        """Closes an open worksheet without saving; a handle that is already dead is just dropped."""
+        worksheet = self.open_sheets.pop(key, None)
+        self.sheet_inputs.pop(key, None)
+        if key == self.current_file_path:
+            self.worksheet, self.current_file_path, self.applied_inputs = None, None, {}
+        if worksheet is None:
+            return
+        try:
+            worksheet.close()
         except Exception as e:
-            raise Exception(f"Failed to open file {abs_path}: {str(e)}")
+            print(f"Could not close {key}: {e}")
+
+    def _evict(self):
+        """Closes least recently used worksheets beyond MAX_OPEN_WORKSHEETS (never the active one)."""
+        while len(self.open_sheets) > max(self.MAX_OPEN_WORKSHEETS, 1):
+            oldest = next(iter(self.open_sheets))
+            if oldest == self.current_file_path:
+                break
+            self._close(oldest)
+            self.stats["evictions"] += 1
+
+    def cache_info(self) -> Dict[str, Any]:
+        """Open worksheets (least recently used first), the active one and open_file counts."""
+        return {
+            "capacity": self.MAX_OPEN_WORKSHEETS,
+            "open": list(self.open_sheets),
+            "active": self.current_file_path,
+            **self.stats,
+        }
+
+    def preload(self, paths: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Opens worksheets ahead of use so the first job on each skips the open.
+        Takes paths most recently used first, opens at most MAX_OPEN_WORKSHEETS
+        of them, and leaves the previously active worksheet active.
+        Returns path -> error message (None if it is open).
+        """
+        active = self.current_file_path
+        room = self.MAX_OPEN_WORKSHEETS - (active is not None)
+        wanted = [p for p in dict.fromkeys(paths) if str(Path(p).resolve()) != active][:max(room, 0)]
+        status: Dict[str, Optional[str]] = {}
+        # Least recent first, so the most recent ends up least likely to be evicted
+        for path in reversed(wanted):
+            try:
+                self.open_file(path)
+                status[path] = None
+            except MathcadConnectionError:
+                raise
+            except Exception as e:
+                status[path] = str(e)
+        if active is not None and active != self.current_file_path:
+            self.open_file(active)
+        return status
 
     def get_inputs(self) -> List[Dict[str, Any]]:
         if not self.worksheet:
-            raise Exception("No worksheet open")
+            raise MathcadWorksheetError("No worksheet open")
         try:
             input_names = self.worksheet.inputs()
             return [{"alias": name, "name": name, "units": ""} for name in input_names]
         except Exception as e:
-            raise Exception(f"Failed to retrieve inputs: {str(e)}")
+            if is_connection_lost(e):
+                raise MathcadConnectionError(f"Failed to retrieve inputs: {str(e)}")
+            raise MathcadWorksheetError(f"Failed to retrieve inputs: {str(e)}")
 
     def get_outputs(self) -> List[Dict[str, Any]]:
         if not self.worksheet:
-            raise Exception("No worksheet open")
+            raise MathcadWorksheetError("No worksheet open")
         try:
             output_names = self.worksheet.outputs()
             return [{"alias": name, "name": name, "units": ""} for name in output_names]
         except Exception as e:
-            raise Exception(f"Failed to retrieve outputs: {str(e)}")
+            if is_connection_lost(e):
+                raise MathcadConnectionError(f"Failed to retrieve outputs: {str(e)}")
+            raise MathcadWorksheetError(f"Failed to retrieve outputs: {str(e)}")
 
     def set_input(self, alias: str, value: Any, units: Optional[str] = None):
+        """
+        Sets an input on the open worksheet. Skips the COM call when the same
+        value and units were already applied, so consecutive rows only pay for
+        the inputs that actually changed. Lists and NumPy arrays are set as
+        matrix inputs and never cached (comparing them would cost a full scan).
+        """
         if not self.worksheet:
-            raise Exception("No worksheet open")
+            raise MathcadWorksheetError("No worksheet open")
+        is_matrix = isinstance(value, (list, np.ndarray))
+        if not is_matrix and self.applied_inputs.get(alias) == (value, units):
+            return
+        # Forget the alias first: if setting fails its worksheet value is unknown
+        self.applied_inputs.pop(alias, None)
         try:
             if isinstance(value, str):
                 error = self.worksheet.set_string_input(alias, value)
                 if error != 0:
                     raise Exception(f"set_string_input returned error code {error}")
+            elif is_matrix:
+                is_unitless = units is None or units == "" or units.lower() == "unitless"
+                error = self.worksheet.set_matrix_input(
+                    alias, np.asarray(value, dtype=float), units="" if is_unitless else units,
+                    preserve_worksheet_units=is_unitless
+                )
+                if error != 0:
+                    raise Exception(f"set_matrix_input returned error code {error}")
+                return
             else:
                 # Pass units to MathcadPy's set_real_input
                 # Treat None, empty string, or "unitless" as no units
@@ -101,27 +322,38 @@ class MathcadWorker:
                 )
                 if error != 0:
                     raise Exception(f"set_real_input returned error code {error}")
+            self.applied_inputs[alias] = (value, units)
         except Exception as e:
-            raise Exception(f"Failed to set input {alias}: {str(e)}")
+            if is_connection_lost(e):
+                raise MathcadConnectionError(f"Failed to set input {alias}: {str(e)}")
+            raise MathcadInputError(f"Failed to set input {alias}: {str(e)}")
 
     def synchronize(self):
         if not self.worksheet:
-            raise Exception("No worksheet open")
+            raise MathcadWorksheetError("No worksheet open")
         try:
             self.worksheet.calculate()  # Alias for synchronize()
         except Exception as e:
-            raise Exception(f"Failed to synchronize worksheet: {str(e)}")
+            if is_connection_lost(e):
+                raise MathcadConnectionError(f"Failed to synchronize worksheet: {str(e)}")
+            raise MathcadWorksheetError(f"Failed to synchronize worksheet: {str(e)}")
 
     def get_output_value(self, alias: str) -> Any:
         if not self.worksheet:
-            raise Exception("No worksheet open")
+            raise MathcadWorksheetError("No worksheet open")
         try:
             value, units, error_code = self.worksheet.get_real_output(alias)
             if error_code != 0:
+                # Not a scalar: try it as a matrix (returned as a NumPy array)
+                matrix, _, matrix_error = self.worksheet.get_matrix_output(alias)
+                if matrix_error == 0:
+                    return matrix
                 raise Exception(f"Error getting output {alias}: ErrorCode {error_code}")
             return value  # Unwrap tuple, return only value
         except Exception as e:
-            raise Exception(f"Failed to get output {alias}: {str(e)}")
+            if is_connection_lost(e):
+                raise MathcadConnectionError(f"Failed to get output {alias}: {str(e)}")
+            raise MathcadWorksheetError(f"Failed to get output {alias}: {str(e)}")
 
     def save_as(self, path: str, format_enum: Optional[int] = None):
         """
@@ -130,7 +362,7 @@ class MathcadWorker:
         Explicitly handles PDF export only for Mathcad > 4.
         """
         if not self.worksheet:
-            raise Exception("No worksheet open")
+            raise MathcadWorksheetError("No worksheet open")
 
         abs_path = Path(path).resolve()
         
@@ -151,4 +383,6 @@ class MathcadWorker:
                  # Fallback if internal structure changes, though risky
                  self.worksheet.save_as(str(abs_path))
         except Exception as e:
-             raise Exception(f"Failed to save to {abs_path}: {str(e)}")
+             if is_connection_lost(e):
+                 raise MathcadConnectionError(f"Failed to save to {abs_path}: {str(e)}")
+             raise MathcadWorksheetError(f"Failed to save to {abs_path}: {str(e)}")
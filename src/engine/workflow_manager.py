@@ -14,6 +14,7 @@ from engine.protocol import (
     WorkflowConfig, WorkflowState, WorkflowStatus,
     InputConfig, FileMapping
 )
+from engine.wire import to_builtin
 
 class WorkflowManager:
     def __init__(self, engine_manager):
@@ -24,6 +25,8 @@ class WorkflowManager:
         """Submit a workflow for execution in background thread"""
         state = WorkflowState(workflow_id=workflow_id, config=config)
         self.workflows[workflow_id] = state
+        self.engine.store.start_run(workflow_id, "workflow", self.get_status(workflow_id),
+                                    config=config.model_dump(mode='json'))
 
         thread = threading.Thread(
             target=self._execute_workflow,
@@ -39,7 +42,8 @@ class WorkflowManager:
         state.status = WorkflowStatus.RUNNING
         intermediate_results = {}  # {file_path: {alias: value}}
 
-        for file_config in state.config.files:
+        for index, file_config in enumerate(state.config.files):
+            inputs: List[InputConfig] = []
             try:
                 # Build inputs for this file (explicit + mapped)
                 inputs = self._resolve_inputs(file_config, intermediate_results, state.config.mappings)
@@ -50,11 +54,13 @@ class WorkflowManager:
                     "inputs": inputs
                 })
 
-                result = self._poll_result(job_id)
+                result = self._poll_result(job_id, timeout=self.engine.get_timeout("calculate_job"))
                 if result and result.status == "success":
                     # Store outputs for downstream mapping
                     intermediate_results[file_config.file_path] = result.data
                     state.completed_files.append(file_config.file_path)
+                    self._record_step(workflow_id, index, file_config.file_path, inputs,
+                                      {"status": "success", "data": to_builtin(result.data)})
                 else:
                     raise Exception(result.error_message if result else "Job timeout")
 
@@ -73,22 +79,32 @@ class WorkflowManager:
                     if state.config.export_pdf:
                         save_path = os.path.abspath(os.path.join(output_dir, f"{filename_base}.pdf"))
                         save_job_id = self.engine.submit_job("save_as", {"path": save_path, "format": 3})
-                        self._poll_result(save_job_id) # Wait for export to finish
+                        self._poll_result(save_job_id, timeout=self.engine.get_timeout("save_as")) # Wait for export to finish
                     
                     if state.config.export_mcdx:
                         save_path = os.path.abspath(os.path.join(output_dir, f"{filename_base}.mcdx"))
                         save_job_id = self.engine.submit_job("save_as", {"path": save_path, "format": 0})
-                        self._poll_result(save_job_id)
+                        self._poll_result(save_job_id, timeout=self.engine.get_timeout("save_as"))
 
             except Exception as e:
                 state.status = WorkflowStatus.FAILED
                 state.error = str(e)
+                if file_config.file_path not in state.completed_files:
+                    self._record_step(workflow_id, index, file_config.file_path, inputs,
+                                      {"status": "failed", "error": str(e)})
                 if state.config.stop_on_error:
                     break
 
         if state.status != WorkflowStatus.FAILED:
             state.status = WorkflowStatus.COMPLETED
-            state.final_results = intermediate_results
+            state.final_results = to_builtin(intermediate_results)
+        self.engine.store.finish_run(workflow_id, self.get_status(workflow_id))
+
+    def _record_step(self, workflow_id: str, index: int, path: str, inputs: List[InputConfig],
+                     result: Dict[str, Any]):
+        """Records a workflow file as a row of its run in the run history."""
+        row_input = {"path": path, **{i.alias: {"value": i.value, "units": i.units} for i in inputs}}
+        self.engine.store.record_row(workflow_id, index, row_input, {"row": index, **result})
 
     def _resolve_inputs(self, file_config, intermediate_results, mappings) -> List[InputConfig]:
         """Build InputConfigs combining explicit inputs and mapped outputs"""
@@ -127,7 +143,11 @@ class WorkflowManager:
         """Get current workflow status"""
         state = self.workflows.get(workflow_id)
         if not state:
-            return None
+            # Not run by this process: the summary recorded in the run history
+            run = self.engine.store.get_run(workflow_id)
+            if run is None or run["kind"] != "workflow":
+                return None
+            return {**run["summary"], "status": run["status"]}
 
         return {
             "workflow_id": state.workflow_id,
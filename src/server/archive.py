@@ -0,0 +1,199 @@
+"""
+Batch archive downloads: every generated file of a batch plus a results CSV,
+streamed without buffering the files in memory.
+
+tar archives are laid out up front from file sizes alone, so any byte range
+can be served on its own and interrupted downloads can resume. zip archives
+are streamed in one pass (stored, ZIP64) and don't support ranges, because
+zip headers need CRCs that are only known once the files have been read.
+"""
+import csv
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+RESULTS_NAME = "results.csv"
+
+
+def _flat_value(v: Any) -> Any:
+    return v["value"] if isinstance(v, dict) and "value" in v else v
+
+
+def results_csv(batch: Dict[str, Any], row_input: Callable[[int], Optional[Dict[str, Any]]]) -> bytes:
+    """One line per batch row: inputs, outputs, exports and status."""
+    results = batch.get("results", [])
+    inputs = {res["row"]: row_input(res["row"]) or {} for res in results}
+    input_cols: Dict[str, None] = {}
+    output_cols: Dict[str, None] = {}
+    for res in results:
+        input_cols.update(dict.fromkeys(inputs[res["row"]]))
+        output_cols.update(dict.fromkeys(((res.get("data") or {}).get("outputs") or {})))
+
+    meta_cols = ["pdf", "mcdx", "error", "error_kind", "surrogate", "duplicate_of"]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["row", "status", *input_cols, *output_cols, *meta_cols])
+    for res in results:
+        row_inputs = inputs[res["row"]]
+        outputs = (res.get("data") or {}).get("outputs") or {}
+        writer.writerow([
+            res["row"], res.get("status"),
+            *(_flat_value(row_inputs.get(c)) for c in input_cols),
+            *(outputs.get(c) for c in output_cols),
+            *(res.get(c) for c in meta_cols),
+        ])
+    return buffer.getvalue().encode("utf-8")
+
+
+def archive_members(batch: Dict[str, Any], csv_bytes: bytes) -> List[Tuple[str, Any]]:
+    """(name in archive, file path or bytes) for the results CSV and every existing generated file."""
+    members: List[Tuple[str, Any]] = [(RESULTS_NAME, csv_bytes)]
+    names = {RESULTS_NAME}
+    for path in dict.fromkeys(batch.get("generated_files", [])):
+        if not os.path.isfile(path):
+            continue
+        name = os.path.basename(path)
+        stem, ext = os.path.splitext(name)
+        n = 1
+        while name in names:
+            name = f"{stem}_{n}{ext}"
+            n += 1
+        names.add(name)
+        members.append((name, path))
+    return members
+
+
+class TarArchive:
+    """
+    Uncompressed (pax) tar of the batch members with a precomputed layout:
+    header, data and padding offsets are known before any file is read, so
+    read(start, end) can stream any byte range.
+    """
+
+    def __init__(self, members: List[Tuple[str, Any]]):
+        # Segments of (offset, length, header/padding bytes or file path)
+        self.segments: List[Tuple[int, int, Any]] = []
+        identity = hashlib.blake2b(digest_size=16)
+        offset = 0
+        for name, source in members:
+            info = tarfile.TarInfo(name)
+            if isinstance(source, bytes):
+                info.size = len(source)
+                identity.update(source)
+            else:
+                st = os.stat(source)
+                info.size = st.st_size
+                info.mtime = int(st.st_mtime)
+                identity.update(f"{name}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8"))
+            header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+            for length, data in ((len(header), header), (info.size, source)):
+                self.segments.append((offset, length, data))
+                offset += length
+            padding = -info.size % tarfile.BLOCKSIZE
+            if padding:
+                self.segments.append((offset, padding, bytes(padding)))
+                offset += padding
+        trailer = bytes(tarfile.BLOCKSIZE * 2)
+        self.segments.append((offset, len(trailer), trailer))
+        self.size = offset + len(trailer)
+        self.etag = f'"{identity.hexdigest()}"'
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yields bytes start..end (inclusive) of the archive."""
+        end = self.size - 1 if end is None else end
+        for offset, length, data in self.segments:
+            if offset + length <= start:
+                continue
+            if offset > end:
+                break
+            lo = max(start, offset) - offset
+            hi = min(end + 1, offset + length) - offset
+            if isinstance(data, bytes):
+                yield data[lo:hi]
+            else:
+                yield from self._read_file(data, lo, hi)
+
+    @staticmethod
+    def _read_file(path: str, lo: int, hi: int) -> Iterator[bytes]:
+        remaining = hi - lo
+        try:
+            with open(path, 'rb') as f:
+                f.seek(lo)
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+        except OSError as e:
+            print(f"Warning: Could not read {path} for archive: {e}")
+        if remaining > 0:
+            # File shrank or vanished since the layout was computed; keep offsets valid
+            yield bytes(remaining)
+
+
+class _StreamBuffer:
+    """Write-only sink for ZipFile; the generator drains it after every write."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        chunks, self.chunks = self.chunks, []
+        yield from chunks
+
+
+def stream_zip(members: List[Tuple[str, Any]]) -> Iterator[bytes]:
+    """Yields a stored (uncompressed) ZIP64 archive of the members, one chunk at a time."""
+    sink = _StreamBuffer()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for name, source in members:
+            if isinstance(source, bytes):
+                zf.writestr(name, source)
+                yield from sink.drain()
+                continue
+            info = zipfile.ZipInfo.from_file(source, name)
+            info.compress_type = zipfile.ZIP_STORED
+            try:
+                with open(source, 'rb') as src, zf.open(info, 'w', force_zip64=True) as dest:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        dest.write(chunk)
+                        yield from sink.drain()
+            except OSError as e:
+                print(f"Warning: Could not add {source} to archive: {e}")
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) of a single "bytes=" range, or None to send the whole body.
+    Raises ValueError for a range that lies outside the content.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None  # Absent, other units or multiple ranges: full response
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                raise ValueError("Empty suffix range")
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None  # Malformed: ignore, as RFC 9110 allows
+    if start >= size or end < start:
+        raise ValueError(f"Range {header} not satisfiable")
+    return start, min(end, size - 1)
@@ -0,0 +1,97 @@
+"""
+HTTP caching for the frontend and for status polling.
+
+AssetStaticFiles serves the Vite build: files under assets/ carry a content
+hash in their name, so they are cached as immutable for a year, while
+index.html and other unhashed files are revalidated on every load. Text
+assets are compressed once per file version and kept in memory.
+
+etag_json answers status polls: the body's hash is its (weak) ETag, and a
+poll whose If-None-Match already holds it gets a bodyless 304. The tag is
+weak because the same one goes out with the gzip and Brotli encodings. Browsers send
+If-None-Match on their own for responses marked no-cache, so the UI's
+polling needs no changes.
+"""
+import hashlib
+import json
+import re
+import threading
+from typing import Any, Dict, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.staticfiles import StaticFiles
+from .compression import choose_encoding, compress, is_compressible, weak_etag
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Vite's default output name for bundled files: assets/[name]-[hash][extname]
+_HASHED_ASSET = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+
+def is_hashed_asset(path: str) -> bool:
+    return bool(_HASHED_ASSET.match(path.lstrip("/")))
+
+
+class AssetStaticFiles(StaticFiles):
+    """StaticFiles with cache headers for Vite output and cached compressed copies."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (file, mtime, size, encoding) -> compressed bytes
+        self._compressed: Dict[Tuple[str, int, int, str], bytes] = {}
+        self._lock = threading.Lock()
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        path = scope.get("path", "")
+        if scope.get("root_path") and path.startswith(scope["root_path"]):
+            path = path[len(scope["root_path"]):]
+        response.headers["Cache-Control"] = IMMUTABLE if is_hashed_asset(path) else REVALIDATE
+        if response.status_code != 200 or not is_compressible(response.headers.get("content-type", "")):
+            return response
+
+        accept = Request(scope).headers.get("accept-encoding", "")
+        encoding = choose_encoding(accept)
+        if encoding is None:
+            return response
+        key = (str(full_path), stat_result.st_mtime_ns, stat_result.st_size, encoding)
+        with self._lock:
+            body = self._compressed.get(key)
+        if body is None:
+            with open(full_path, "rb") as f:
+                body = compress(f.read(), encoding, static=True)
+            with self._lock:
+                # Older versions of the file are dropped with it
+                for old in [k for k in self._compressed if k[0] == key[0] and k[3] == encoding]:
+                    del self._compressed[old]
+                self._compressed[key] = body
+        headers = {name: value for name, value in response.headers.items()
+                   if name not in ("content-length", "accept-ranges")}
+        headers.update({"content-encoding": encoding, "vary": "Accept-Encoding"})
+        if "etag" in headers:
+            headers["etag"] = weak_etag(headers["etag"])
+        return Response(body, status_code=200, headers=headers)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match uses."""
+    etag = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def etag_json(request: Request, content: Any) -> Response:
+    """JSON response tagged with a hash of its body; 304 if the client already has that body."""
+    if isinstance(content, bytes):
+        body = content
+    else:
+        body = json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,129 @@
+"""
+Response compression.
+
+CompressionMiddleware compresses complete JSON and text responses above a
+size threshold: Brotli when the client accepts it and the brotli package is
+installed, gzip otherwise. Streamed responses (archives, file downloads)
+pass through untouched, so Range requests on them keep working; static
+frontend files are compressed by caching.AssetStaticFiles instead, which can
+keep the result.
+"""
+import asyncio
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MINIMUM_SIZE = 1024  # Smaller bodies aren't worth a Content-Encoding
+THREAD_MINIMUM_SIZE = 256 * 1024  # Compress bodies this large off the event loop
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "text/", "image/svg+xml")
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return any(media_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The best encoding both sides support ("br" or "gzip"), or None."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def weak_etag(etag: str) -> str:
+    """
+    ETag for a compressed copy. A strong ETag names exact bytes, so the identity
+    and compressed representations can't share one; the weak form still
+    revalidates (If-None-Match compares weakly) but is never used for If-Range.
+    """
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+def compress(body: bytes, encoding: str, static: bool = False) -> bytes:
+    """Compresses body; static content (compressed once, then cached) gets the slower, denser settings."""
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if static else 5)
+    return gzip.compress(body, compresslevel=9 if static else 6, mtime=0)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing single-message responses of compressible types."""
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+        encoding = choose_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = {name.lower(): value for name, value in message["headers"]}
+                passthrough = (b"content-encoding" in headers or message["status"] in (204, 206, 304)
+                               or not is_compressible(headers.get(b"content-type", b"").decode("latin-1")))
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message  # Held until the body shows whether it is worth compressing
+                return
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] != "http.response.body" or start is None:
+                # Later chunk of a streamed response, or a body sent some other way (pathsend)
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streamed or small: sent as is
+                await send(start)
+                start = None
+                await send(message)
+                return
+            if len(body) >= THREAD_MINIMUM_SIZE:
+                body = await asyncio.to_thread(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers = [(n, weak_etag(v.decode("latin-1")).encode("latin-1") if n.lower() == b"etag" else v)
+                       for n, v in start["headers"] if n.lower() != b"content-length"]
+            headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(len(body)).encode()),
+                        (b"vary", b"Accept-Encoding")]
+            await send({**start, "headers": headers})
+            start = None
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
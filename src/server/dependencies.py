@@ -1,3 +1,4 @@
+import os
 from src.engine.manager import EngineManager
 
 # Singleton instance
@@ -6,5 +7,8 @@ _manager = None
 def get_engine_manager() -> EngineManager:
     global _manager
     if _manager is None:
-        _manager = EngineManager()
+        from .main import get_app_data_dir
+        app_data_dir = get_app_data_dir()
+        _manager = EngineManager(latency_path=os.path.join(app_data_dir, 'latency_history.json'),
+                                 store_path=os.path.join(app_data_dir, 'runs.db'))
     return _manager
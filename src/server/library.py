@@ -0,0 +1,153 @@
+"""
+Library index: a summary (name, created_at, ...) of every saved config in a
+library directory, kept in a small index file next to the configs so listing
+doesn't have to read and parse each one.
+
+A listing checks the index against one directory scan (file size and mtime,
+which os.scandir gets without opening files, even on network shares): only
+new or changed configs are parsed, and deleted ones are dropped. Saves
+update their entry directly.
+"""
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+INDEX_NAME = ".library_index"  # No .json suffix, so it is never listed as a config
+SORT_KEYS = ("name", "created_at")
+
+
+def batch_summary(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": config.get("name"),
+        "created_at": config.get("created_at", "unknown"),
+        "version": config.get("version", "1.0"),
+    }
+
+
+def workflow_summary(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": config.get("name"),
+        "created_at": config.get("created_at", "unknown"),
+        "files_count": len(config.get("files", [])),
+    }
+
+
+class LibraryIndex:
+    """Summaries of the *.json configs in one directory, by file name."""
+    VERSION = 1
+
+    def __init__(self, directory: str, summarize: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_NAME)
+        self.summarize = summarize
+        # File name -> {"size", "mtime_ns", "summary"}; summary is None for unreadable files
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def _entry(self, file_path: str, st: os.stat_result, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        summary = None
+        try:
+            if config is None:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            summary = self.summarize(config)
+            if not summary.get("name"):
+                summary["name"] = os.path.splitext(os.path.basename(file_path))[0]
+        except (OSError, ValueError, AttributeError, TypeError):
+            pass  # Corrupted config: remembered so it isn't parsed again until it changes
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "summary": summary}
+
+    def scan(self, full: bool = False) -> List[Dict[str, Any]]:
+        """
+        Brings the index up to date with the directory and returns the config
+        summaries (with their "path"), sorted by file name. full=True parses
+        every config again instead of trusting unchanged entries.
+        """
+        with self.lock:
+            entries: Dict[str, Dict[str, Any]] = {}
+            changed = full
+            try:
+                with os.scandir(self.directory) as it:
+                    for item in it:
+                        if not item.name.lower().endswith(".json") or not item.is_file():
+                            continue
+                        st = item.stat()
+                        entry = self.entries.get(item.name)
+                        if full or entry is None or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+                            entry = self._entry(item.path, st)
+                            changed = True
+                        entries[item.name] = entry
+            except FileNotFoundError:
+                self.entries = {}
+                return []
+            changed = changed or entries.keys() != self.entries.keys()
+            self.entries = entries
+            if changed:
+                self.save()
+            return [dict(entry["summary"], path=os.path.join(self.directory, name))
+                    for name, entry in sorted(entries.items()) if entry["summary"] is not None]
+
+    def record(self, file_path: str, config: Dict[str, Any]):
+        """Updates the entry of a config that was just written."""
+        try:
+            st = os.stat(file_path)
+        except OSError as e:
+            print(f"Warning: Could not index library config {file_path}: {e}")
+            return
+        with self.lock:
+            self.entries[os.path.basename(file_path)] = self._entry(file_path, st, config)
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get("version") == self.VERSION:
+                self.entries = {name: dict(entry) for name, entry in saved.get("files", {}).items()}
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, OSError, AttributeError, TypeError, ValueError) as e:
+            print(f"Warning: Could not load library index {self.path}: {e}")
+
+    def save(self):
+        # Several users may share the directory: write whole and swap, so readers
+        # never see a partial index (a stale one is caught by the mtime check)
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": self.VERSION, "files": self.entries}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not save library index {self.path}: {e}")
+
+
+_indexes: Dict[str, LibraryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(directory: str, summarize: Callable[[Dict[str, Any]], Dict[str, Any]]) -> LibraryIndex:
+    """The process-wide index of a directory, loaded from its index file on first use."""
+    key = os.path.normcase(os.path.abspath(directory))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = LibraryIndex(directory, summarize)
+        return index
+
+
+def query(configs: List[Dict[str, Any]], q: Optional[str] = None, sort: str = "name",
+          descending: bool = False, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    One page of configs whose name contains q (case-insensitive), with the
+    number of matches before paging as "total".
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+    if q:
+        needle = q.casefold()
+        configs = [c for c in configs if needle in str(c.get("name", "")).casefold()]
+    configs = sorted(configs, key=lambda c: str(c.get(sort) or "").casefold(), reverse=descending)
+    end = None if limit is None else offset + limit
+    return {"configs": configs[offset:end], "total": len(configs), "offset": offset, "limit": limit}
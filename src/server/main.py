@@ -3,10 +3,15 @@ import os
 import json
 from pathlib import Path
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Query
 from .dependencies import get_engine_manager
 from .routes import router
+from .caching import AssetStaticFiles
+from .compression import CompressionMiddleware
+from .schemas import LauncherPhases
+from .startup import StartupTracker, start_in_background, load_history
+
+APP_VERSION = "1.0.0"
 
 
 def get_app_data_dir() -> str:
@@ -26,6 +31,13 @@ def get_app_data_dir() -> str:
     return app_dir
 
 
+def get_log_dir() -> str:
+    """Log directory; mirrors get_log_dir in main.py."""
+    log_dir = os.path.join(get_app_data_dir(), 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    return log_dir
+
+
 def get_frontend_path() -> Path:
     """
     Get path to frontend dist folder.
@@ -44,15 +56,22 @@ def get_frontend_path() -> Path:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
+    # Startup: serve requests right away; the engine and Mathcad come up behind
+    tracker = StartupTracker(log_dir=get_log_dir(), version=APP_VERSION)
+    tracker.mark("server_ready")
+    app.state.startup = tracker
     manager = get_engine_manager()
-    manager.start_engine()
+    bring_up = start_in_background(manager, tracker)
     yield
     # Shutdown
+    tracker.cancelled.set()
+    bring_up.join(timeout=10.0)  # Let a half-finished engine start complete before stopping it
     manager.stop_engine()
+    manager.store.flush()
 
 
 app = FastAPI(title="Mathcad Automator API", lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
 
 app.include_router(router, prefix="/api/v1")
 
@@ -63,11 +82,45 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/api/v1/startup")
+def get_startup_status(request: Request):
+    """Startup progress: engine and Mathcad state, with the time each phase took."""
+    tracker = getattr(request.app.state, "startup", None)
+    if tracker is None:
+        return {"state": "starting", "engine": "pending", "mathcad": "pending",
+                "error": None, "elapsed": 0.0, "phases": []}
+    return tracker.snapshot()
+
+
+@app.post("/api/v1/startup/phases")
+def add_launcher_phases(request: Request, body: LauncherPhases):
+    """Phases timed by the launcher process (spawn, window), merged into the profile."""
+    tracker = getattr(request.app.state, "startup", None)
+    if tracker is not None:
+        tracker.add_launcher_phases([p.model_dump() for p in body.phases])
+    return {"status": "recorded"}
+
+
+@app.get("/api/v1/startup/profile")
+def get_startup_profile(request: Request):
+    """Full startup profile of this launch: phases, import costs, version."""
+    tracker = getattr(request.app.state, "startup", None)
+    if tracker is None:
+        return {"state": "starting", "phases": [], "imports": None}
+    return tracker.profile()
+
+
+@app.get("/api/v1/startup/history")
+def get_startup_history(limit: int = Query(20, ge=1, le=500)):
+    """Summaries of recent launches, newest first, for spotting startup regressions."""
+    return {"launches": load_history(get_log_dir(), limit)}
+
+
 @app.get("/api/v1/app-info")
 def get_app_info():
     """Return application information and paths."""
     return {
-        "version": "1.0.0",
+        "version": APP_VERSION,
         "app_data_dir": get_app_data_dir(),
         "library_dir": os.path.join(get_app_data_dir(), 'libraries'),
     }
@@ -81,7 +134,7 @@ def read_root():
 # Mount frontend static files (must be after API routes)
 frontend_path = get_frontend_path()
 if frontend_path.exists():
-    app.mount("/", StaticFiles(directory=str(frontend_path), html=True), name="frontend")
+    app.mount("/", AssetStaticFiles(directory=str(frontend_path), html=True), name="frontend")
 else:
     print(f"Warning: Frontend not found at {frontend_path}. Run 'npm run build' in frontend/")
 
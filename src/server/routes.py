@@ -1,12 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Literal, Optional
+from datetime import datetime
 import time
 import asyncio
 import os
+import re
 import sys
 from .dependencies import get_engine_manager
 from src.engine.manager import EngineManager
-from .schemas import JobSubmission, JobResponse, ControlResponse, BatchRequest, BatchStatus
+from src.engine.wire import to_builtin
+from src.engine.store import parse_filter, parse_sort
+from src.engine.table import TableSource, TABLE_EXTENSIONS, prepare_upload, load_summary, prune_uploads
+from .schemas import JobSubmission, JobResponse, ControlResponse, BatchRequest, BatchStatus, OptimizeRequest, WarmupRequest
+from .archive import results_csv, archive_members, TarArchive, stream_zip, parse_range
+from .library import get_index, query, batch_summary, workflow_summary
+from .caching import etag_json
 
 def _open_file_dialog():
     """Open native file dialog - runs in separate thread"""
@@ -29,6 +38,17 @@ def _open_file_dialog():
 
 router = APIRouter()
 
+MAX_UPLOAD_BYTES = 1024 * 1024 * 1024
+UPLOAD_MAX_AGE = 7 * 24 * 3600  # Stored tables are kept this long for reruns
+UPLOAD_WRITE_SIZE = 1024 * 1024  # Upload bytes gathered per disk write
+WORKSHEET_STATS_WAIT = 10.0  # Longest /engine/worksheets waits behind queued jobs
+
+def _upload_dir() -> str:
+    from .main import get_app_data_dir
+    upload_dir = os.path.join(get_app_data_dir(), 'uploads')
+    os.makedirs(upload_dir, exist_ok=True)
+    return upload_dir
+
 @router.post("/jobs", response_model=JobResponse)
 async def submit_job(job: JobSubmission, manager: EngineManager = Depends(get_engine_manager)):
     if not manager.is_running():
@@ -45,7 +65,8 @@ async def get_job_result(job_id: str, manager: EngineManager = Depends(get_engin
     result = manager.get_job(job_id)
     if not result:
         raise HTTPException(status_code=404, detail="Job result not found or pending")
-    return result
+    # Matrix outputs arrive as NumPy arrays
+    return {**vars(result), "data": to_builtin(result.data)}
 
 @router.post("/control/stop", response_model=ControlResponse)
 async def stop_engine(manager: EngineManager = Depends(get_engine_manager)):
@@ -63,28 +84,183 @@ async def restart_engine(manager: EngineManager = Depends(get_engine_manager)):
 async def start_batch(req: BatchRequest, manager: EngineManager = Depends(get_engine_manager)):
     if not manager.is_running():
         raise HTTPException(status_code=503, detail="Engine is not running")
+    if not req.inputs and req.sweep is None and req.table is None:
+        raise HTTPException(status_code=400, detail="Batch needs 'inputs', 'sweep' or 'table'")
     
-    manager.batch_manager.start_batch(
-        req.batch_id, 
-        req.inputs, 
-        req.output_dir,
-        export_pdf=req.export_pdf,
-        export_mcdx=req.export_mcdx
-    )
+    try:
+        table = TableSource(req.table, _upload_dir()) if req.table is not None else None
+        manager.batch_manager.start_batch(
+            req.batch_id, 
+            req.inputs, 
+            req.output_dir,
+            export_pdf=req.export_pdf,
+            export_mcdx=req.export_mcdx,
+            sweep=req.sweep,
+            reorder=req.reorder,
+            stop_when=req.stop_when,
+            adaptive=req.adaptive,
+            surrogate=req.surrogate,
+            dedupe=req.dedupe,
+            window=req.window,
+            chunk_size=req.chunk_size,
+            table=table
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return ControlResponse(status="started", message=f"Batch {req.batch_id} initiated")
 
+@router.post("/inputs/upload")
+async def upload_table(request: Request, filename: str):
+    """
+    Stores a CSV or XLSX table sent as the raw request body (no multipart),
+    streaming it to disk. Returns its upload_id with the columns, row count,
+    per-column value counts, a preview and any malformed records, for
+    mapping columns to aliases in a batch's `table`.
+    """
+    import uuid
+
+    if os.path.splitext(filename)[1].lower() not in TABLE_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Upload a {', '.join(TABLE_EXTENSIONS)} file")
+    upload_dir = _upload_dir()
+    await asyncio.to_thread(prune_uploads, upload_dir, UPLOAD_MAX_AGE)
+    upload_id = uuid.uuid4().hex
+    raw_path = os.path.join(upload_dir, f"{upload_id}.part")
+    try:
+        received = 0
+        pending = bytearray()
+        with open(raw_path, 'wb') as f:
+            # Disk writes go to a worker thread, gathered so each hop writes a sizable block
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Table is too large")
+                pending += chunk
+                if len(pending) >= UPLOAD_WRITE_SIZE:
+                    await asyncio.to_thread(f.write, bytes(pending))
+                    pending.clear()
+            if pending:
+                await asyncio.to_thread(f.write, bytes(pending))
+        return await asyncio.to_thread(prepare_upload, raw_path, filename, upload_dir, upload_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+@router.get("/inputs/upload/{upload_id}")
+async def get_upload(upload_id: str):
+    """Summary of a stored table, as returned by the upload."""
+    try:
+        summary = load_summary(_upload_dir(), upload_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found")
+    return summary
+
 @router.get("/batch/{batch_id}", response_model=BatchStatus)
-async def get_batch_status(batch_id: str, manager: EngineManager = Depends(get_engine_manager)):
+async def get_batch_status(batch_id: str, request: Request, manager: EngineManager = Depends(get_engine_manager)):
+    """Batch progress; polls that find nothing changed since their ETag get 304."""
     status = manager.batch_manager.get_status(batch_id)
     if not status:
         raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
-    return status
+    return etag_json(request, BatchStatus.model_validate(status).model_dump_json().encode("utf-8"))
+
+@router.get("/batch/{batch_id}/archive")
+async def download_batch_archive(batch_id: str, request: Request, format: Literal["tar", "zip"] = "tar",
+                                 manager: EngineManager = Depends(get_engine_manager)):
+    """
+    Streams the batch's generated files plus a results CSV as one archive.
+    tar downloads honor Range/If-Range so they can be resumed; zip is one pass.
+    """
+    def prepare():
+        # Row lookups (run history queries for finished batches) and file stats, off the event loop
+        batch = manager.batch_manager.get_status(batch_id)
+        if not batch:
+            return None
+        csv_bytes = results_csv(batch, lambda row: manager.batch_manager.get_row_input(batch_id, row))
+        members = archive_members(batch, csv_bytes)
+        return members, TarArchive(members) if format == "tar" else None
+
+    prepared = await asyncio.to_thread(prepare)
+    if prepared is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    members, archive = prepared
+    safe_id = re.sub(r'[^\w.-]', '_', batch_id)
+    filename = f"{safe_id}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    if format == "zip":
+        return StreamingResponse(stream_zip(members), media_type="application/zip", headers=headers)
+
+    headers.update({"Accept-Ranges": "bytes", "ETag": archive.etag})
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range == archive.etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), archive.size)
+        except ValueError as e:
+            raise HTTPException(status_code=416, detail=str(e),
+                                headers={"Content-Range": f"bytes */{archive.size}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(archive.size)
+        return StreamingResponse(archive.read(), media_type="application/x-tar", headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{archive.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(archive.read(start, end), status_code=206,
+                             media_type="application/x-tar", headers=headers)
 
 @router.post("/batch/{batch_id}/stop", response_model=ControlResponse)
 async def stop_batch(batch_id: str, manager: EngineManager = Depends(get_engine_manager)):
     manager.batch_manager.stop_batch(batch_id)
     return ControlResponse(status="stopped", message=f"Batch {batch_id} stopping signal sent")
 
+@router.post("/optimize", response_model=JobResponse)
+async def start_optimization(req: OptimizeRequest, manager: EngineManager = Depends(get_engine_manager)):
+    """Runs a goal seek / optimization as one engine job; poll /jobs/{job_id} for the result."""
+    if not manager.is_running():
+        raise HTTPException(status_code=503, detail="Engine is not running")
+
+    job_id = manager.submit_job("optimize", req.model_dump(exclude_none=True))
+    return JobResponse(job_id=job_id)
+
+@router.post("/engine/warmup")
+async def warm_up_engine(req: WarmupRequest, manager: EngineManager = Depends(get_engine_manager)):
+    """
+    Preloads worksheets (by default the most recently used ones) so their first
+    job skips the open; poll /jobs/{job_id} for which ones opened.
+    """
+    if not manager.is_running():
+        raise HTTPException(status_code=503, detail="Engine is not running")
+
+    job_id = await asyncio.to_thread(manager.warm_up, req.paths)
+    if job_id is None:
+        return {"job_id": None, "status": "skipped"}  # None of the files exist
+    return {"job_id": job_id, "status": "submitted"}
+
+@router.get("/engine/worksheets")
+async def get_open_worksheets(manager: EngineManager = Depends(get_engine_manager)):
+    """
+    Worksheets the engine keeps open (least recently used first) and how often
+    a job found its worksheet already open. Answered by the harness, so it
+    waits behind any jobs already queued.
+    """
+    if not manager.is_running():
+        raise HTTPException(status_code=503, detail="Engine is not running")
+
+    job_id = manager.submit_job("worksheet_stats", {})
+    deadline = time.time() + WORKSHEET_STATS_WAIT
+    while time.time() < deadline:
+        result = manager.get_job(job_id)
+        if result:
+            if result.status != "success":
+                raise HTTPException(status_code=500, detail=result.error_message or "Unknown error")
+            return result.data
+        await asyncio.sleep(0.1)
+    raise HTTPException(status_code=504, detail="Engine is busy; try again once queued jobs finish")
+
 @router.post("/engine/analyze")
 async def analyze_file(payload: Dict[str, Any], manager: EngineManager = Depends(get_engine_manager)):
     if not manager.is_running():
@@ -98,9 +274,11 @@ async def analyze_file(payload: Dict[str, Any], manager: EngineManager = Depends
         # We'll use a blocking wait for this simple analysis
         job_id = manager.submit_job("get_metadata", {"path": path})
 
-        # Poll for result (max 60 seconds - Mathcad launch can be slow)
+        # Poll for result - Mathcad launch can be slow, but the engine watchdog
+        # answers with a timeout error once the job exceeds its deadline
         start_time = time.time()
-        while time.time() - start_time < 60:
+        timeout = manager.get_timeout("get_metadata")
+        while time.time() - start_time < timeout:
             result = manager.get_job(job_id)
             if result:
                 if result.status == "success":
@@ -151,13 +329,14 @@ async def start_workflow(workflow_id: str, manager: EngineManager = Depends(get_
     return {"workflow_id": workflow_id, "status": status["status"]}
 
 @router.get("/workflows/{workflow_id}")
-async def get_workflow_status(workflow_id: str, manager: EngineManager = Depends(get_engine_manager)):
-    """Get current workflow status"""
+async def get_workflow_status(workflow_id: str, request: Request,
+                              manager: EngineManager = Depends(get_engine_manager)):
+    """Get current workflow status (304 if unchanged since the poll's ETag)"""
     status = manager.workflow_manager.get_status(workflow_id)
     if not status:
         raise HTTPException(status_code=404, detail=f"Workflow {workflow_id} not found")
 
-    return status
+    return etag_json(request, status)
 
 @router.post("/workflows/{workflow_id}/stop")
 async def stop_workflow(workflow_id: str, manager: EngineManager = Depends(get_engine_manager)):
@@ -165,6 +344,54 @@ async def stop_workflow(workflow_id: str, manager: EngineManager = Depends(get_e
     manager.workflow_manager.stop_workflow(workflow_id)
     return {"workflow_id": workflow_id, "status": "stopped"}
 
+# Run History Endpoints
+
+@router.get("/history/runs")
+async def list_runs(kind: Optional[Literal["batch", "workflow"]] = None, file_path: Optional[str] = None,
+                    since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=1000),
+                    manager: EngineManager = Depends(get_engine_manager)):
+    """
+    Recorded batch and workflow runs, newest first: optionally only those of
+    one kind, with rows of worksheet file_path, or started in [since, until).
+    """
+    runs, total = await asyncio.to_thread(
+        manager.store.runs, kind, file_path, since.timestamp() if since else None,
+        until.timestamp() if until else None, offset, limit)
+    return {"runs": runs, "total": total, "offset": offset, "limit": limit}
+
+@router.get("/history/rows")
+async def query_rows(file_path: Optional[str] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, status: Optional[str] = None,
+                     where: List[str] = Query([]), sort: str = "finished_at", descending: bool = True,
+                     offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=10000),
+                     manager: EngineManager = Depends(get_engine_manager)):
+    """
+    Rows from every recorded run, one page at a time. `where` filters on
+    numeric inputs and outputs and may be repeated, e.g.
+    where=output.Utilization>0.95&where=input.L<=20. sort is finished_at or
+    input.<alias> / output.<alias>.
+    """
+    try:
+        filters = [parse_filter(text) for text in where]
+        sort_key = parse_sort(sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows, total = await asyncio.to_thread(
+        manager.store.find_rows, file_path, since.timestamp() if since else None,
+        until.timestamp() if until else None, status, filters, sort_key, descending, offset, limit)
+    return {"rows": rows, "total": total, "offset": offset, "limit": limit}
+
+@router.get("/history/runs/{run_id}")
+async def get_run(run_id: str, offset: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=10000),
+                  manager: EngineManager = Depends(get_engine_manager)):
+    """A recorded run with one page of its row results."""
+    run = manager.store.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    run["rows"] = await asyncio.to_thread(manager.store.run_rows, run_id, offset, limit)
+    return run
+
 @router.post("/files/open")
 async def open_file_natively(payload: Dict[str, Any]):
     """Open a file using the system default application"""
@@ -203,7 +430,7 @@ async def browse_for_file():
 # Library Endpoints
 
 @router.post("/library/save")
-async def save_library_config(req: Dict[str, Any]):
+async def save_library_config(req: Dict[str, Any], manager: EngineManager = Depends(get_engine_manager)):
     """
     Save a batch configuration as a named library template.
     Configs are stored as JSON files in {mcdx_file_parent}/{mcdx_filename}_configs/
@@ -238,6 +465,8 @@ async def save_library_config(req: Dict[str, Any]):
 
         # Write JSON file
         config_file.write_text(json.dumps(config_dict, indent=2), encoding='utf-8')
+        get_index(str(config_dir), batch_summary).record(str(config_file), config_dict)
+        manager.store.save_library_config(str(config_file), "batch", config_dict)
 
         return {
             "status": "success",
@@ -247,48 +476,58 @@ async def save_library_config(req: Dict[str, Any]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/library/list")
-async def list_library_configs(file_path: str):
-    """
-    List all saved library configurations for a given Mathcad file.
-    Returns metadata (name, path, created_at) for each config.
-    """
+def _batch_config_dir(file_path: str) -> str:
     from pathlib import Path
-    import json
 
-    try:
-        mcdx_path = Path(file_path)
-        if not mcdx_path.exists():
-            raise HTTPException(status_code=400, detail=f"Mathcad file not found: {file_path}")
+    mcdx_path = Path(file_path)
+    if not mcdx_path.exists():
+        raise HTTPException(status_code=400, detail=f"Mathcad file not found: {file_path}")
+    return str(mcdx_path.parent / f"{mcdx_path.stem}_configs")
 
-        config_dir = mcdx_path.parent / f"{mcdx_path.stem}_configs"
+def _workflow_library_dir() -> str:
+    from pathlib import Path
+    return str(Path.cwd() / "workflow_library")
 
-        if not config_dir.exists():
-            return {"configs": []}
+@router.get("/library/list")
+async def list_library_configs(file_path: str, q: Optional[str] = None,
+                               sort: Literal["name", "created_at"] = "name", descending: bool = False,
+                               offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1)):
+    """
+    List saved library configurations for a given Mathcad file.
+    Returns metadata (name, path, created_at) for each config whose name
+    contains q, one page at a time, with the number of matches as total.
+    """
+    try:
+        index = get_index(_batch_config_dir(file_path), batch_summary)
+        configs = await asyncio.to_thread(index.scan)
+        return query(configs, q, sort, descending, offset, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        configs = []
-        for config_file in config_dir.glob("*.json"):
-            try:
-                config_data = json.loads(config_file.read_text(encoding='utf-8'))
-                configs.append({
-                    "name": config_data.get("name", config_file.stem),
-                    "path": str(config_file),
-                    "created_at": config_data.get("created_at", "unknown"),
-                    "version": config_data.get("version", "1.0")
-                })
-            except Exception:
-                # Skip corrupted config files
-                continue
-
-        return {"configs": configs}
+@router.post("/library/rescan")
+async def rescan_library(req: Dict[str, Any]):
+    """
+    Rebuilds a library index by parsing every config again: the batch configs
+    of file_path, or the workflow library when file_path is omitted.
+    Listing already picks up changed files; this is for edits that kept a
+    file's size and mtime.
+    """
+    try:
+        if req.get("file_path"):
+            index = get_index(_batch_config_dir(req["file_path"]), batch_summary)
+        else:
+            index = get_index(_workflow_library_dir(), workflow_summary)
+        configs = await asyncio.to_thread(index.scan, True)
+        return {"status": "success", "total": len(configs)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/library/load")
-async def load_library_config(req: Dict[str, Any]):
+async def load_library_config(req: Dict[str, Any], manager: EngineManager = Depends(get_engine_manager)):
     """
     Load a saved library configuration by file path.
-    Returns BatchConfig with absolute paths resolved.
+    Returns BatchConfig with absolute paths resolved. A config file that has
+    been deleted is loaded from the copy kept in the run store.
     """
     from pathlib import Path
     from src.engine.protocol import BatchConfig
@@ -300,12 +539,14 @@ async def load_library_config(req: Dict[str, Any]):
             raise HTTPException(status_code=400, detail="Missing config_path")
 
         config_path = Path(config_path_str)
-        if not config_path.exists():
-            raise HTTPException(status_code=404, detail=f"Config file not found: {config_path_str}")
-
-        # Read and validate using Pydantic
-        config_json = config_path.read_text(encoding='utf-8')
-        config_dict = json.loads(config_json)
+        if config_path.exists():
+            # Read and validate using Pydantic
+            config_json = config_path.read_text(encoding='utf-8')
+            config_dict = json.loads(config_json)
+        else:
+            config_dict = manager.store.library_config(config_path_str)
+            if config_dict is None:
+                raise HTTPException(status_code=404, detail=f"Config file not found: {config_path_str}")
 
         # Resolve relative paths to absolute
         mcdx_path = config_path.parent.parent / config_dict['file_path']
@@ -325,7 +566,7 @@ async def load_library_config(req: Dict[str, Any]):
 # Workflow Library Endpoints
 
 @router.post("/library/save/workflow")
-async def save_workflow_config(req: Dict[str, Any]):
+async def save_workflow_config(req: Dict[str, Any], manager: EngineManager = Depends(get_engine_manager)):
     """
     Save a workflow configuration as a named library template.
     Workflows stored in workflow_library/ directory at project root.
@@ -376,6 +617,8 @@ async def save_workflow_config(req: Dict[str, Any]):
 
         # Write JSON file
         config_file.write_text(json.dumps(config_dict, indent=2), encoding='utf-8')
+        get_index(str(library_dir), workflow_summary).record(str(config_file), config_dict)
+        manager.store.save_library_config(str(config_file), "workflow", config_dict)
 
         return {
             "status": "success",
@@ -387,43 +630,28 @@ async def save_workflow_config(req: Dict[str, Any]):
 
 
 @router.get("/library/list/workflows")
-async def list_workflow_configs():
+async def list_workflow_configs(q: Optional[str] = None,
+                                sort: Literal["name", "created_at"] = "name", descending: bool = False,
+                                offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1)):
     """
-    List all saved workflow configurations.
-    Returns metadata (name, path, created_at) for each config.
+    List saved workflow configurations.
+    Returns metadata (name, path, created_at) for each config whose name
+    contains q, one page at a time, with the number of matches as total.
     """
-    from pathlib import Path
-    import json
-
     try:
-        library_dir = Path.cwd() / "workflow_library"
-
-        if not library_dir.exists():
-            return {"configs": []}
-
-        configs = []
-        for config_file in library_dir.glob("*.json"):
-            try:
-                config_data = json.loads(config_file.read_text(encoding='utf-8'))
-                configs.append({
-                    "name": config_data.get("name", config_file.stem),
-                    "path": str(config_file),
-                    "created_at": config_data.get("created_at", "unknown"),
-                    "files_count": len(config_data.get("files", [])),
-                })
-            except Exception:
-                continue
-
-        return {"configs": configs}
+        index = get_index(_workflow_library_dir(), workflow_summary)
+        configs = await asyncio.to_thread(index.scan)
+        return query(configs, q, sort, descending, offset, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/library/load/workflow")
-async def load_workflow_config(req: Dict[str, Any]):
+async def load_workflow_config(req: Dict[str, Any], manager: EngineManager = Depends(get_engine_manager)):
     """
     Load a saved workflow configuration by file path.
-    Returns WorkflowConfig with absolute paths resolved.
+    Returns WorkflowConfig with absolute paths resolved. A config file that
+    has been deleted is loaded from the copy kept in the run store.
     """
     from pathlib import Path
     from src.engine.protocol import WorkflowConfig
@@ -435,12 +663,14 @@ async def load_workflow_config(req: Dict[str, Any]):
             raise HTTPException(status_code=400, detail="Missing config_path")
 
         config_path = Path(config_path_str)
-        if not config_path.exists():
-            raise HTTPException(status_code=404, detail=f"Config file not found: {config_path_str}")
-
-        # Read and validate using Pydantic
-        config_json = config_path.read_text(encoding='utf-8')
-        config_dict = json.loads(config_json)
+        if config_path.exists():
+            # Read and validate using Pydantic
+            config_json = config_path.read_text(encoding='utf-8')
+            config_dict = json.loads(config_json)
+        else:
+            config_dict = manager.store.library_config(config_path_str)
+            if config_dict is None:
+                raise HTTPException(status_code=404, detail=f"Config file not found: {config_path_str}")
 
         # Resolve relative paths to absolute
         base_path = config_path.parent.parent
@@ -1,5 +1,10 @@
-from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, Any, List, Literal, Optional
+from src.engine.sweep import SweepSpec
+from src.engine.adaptive import AdaptiveSpec
+from src.engine.protocol import StopCondition, PIPELINE_WINDOW
+from src.engine.surrogate import SurrogateSpec
+from src.engine.table import TableSpec
 
 class JobSubmission(BaseModel):
     command: str
@@ -15,10 +20,22 @@ class ControlResponse(BaseModel):
 
 class BatchRequest(BaseModel):
     batch_id: str
-    inputs: List[Dict[str, Any]]
+    inputs: List[Dict[str, Any]] = []
+    sweep: Optional[SweepSpec] = None  # Compact alternative to inputs, expanded server-side
+    table: Optional[TableSpec] = None  # Rows of an uploaded table (see /inputs/upload)
     output_dir: str
     export_pdf: bool = True
     export_mcdx: bool = False
+    reorder: bool = False  # Run rows in an order that minimizes input changes
+    stop_when: Optional[StopCondition] = None  # End the batch once a row's outputs meet this
+    adaptive: Optional[AdaptiveSpec] = None  # Coarse-to-fine sampling of the sweep
+    surrogate: Optional[SurrogateSpec] = None  # Answer smooth rows from an interpolant
+    dedupe: bool = True  # Calculate identical rows once and share their results
+    window: int = Field(PIPELINE_WINDOW, ge=1)  # Rows queued on the engine at once; 1 runs rows one at a time
+    chunk_size: int = Field(1, ge=1)  # Rows per calculate_many job (implies window >= chunk_size)
+
+class WarmupRequest(BaseModel):
+    paths: Optional[List[str]] = None  # Most recent first; None preloads recently used worksheets
 
 class BatchRow(BaseModel):
     row: int
@@ -28,6 +45,11 @@ class BatchRow(BaseModel):
     pdf: Optional[str] = None
     mcdx: Optional[str] = None
     error: Optional[str] = None
+    error_kind: Optional[str] = None
+    surrogate: bool = False  # Outputs are estimated, not calculated
+    error_estimate: Optional[Dict[str, float]] = None
+    surrogate_check: Optional[Dict[str, Any]] = None  # Spot check of a calculated row
+    duplicate_of: Optional[int] = None  # Row whose results this identical row reuses
 
 class BatchStatus(BaseModel):
     id: str
@@ -37,6 +59,45 @@ class BatchStatus(BaseModel):
     results: List[BatchRow]
     generated_files: List[str] = []
     error: Optional[str] = None
+    stop_reason: Optional[str] = None
+    surrogate: Optional[Dict[str, int]] = None  # Calculated/predicted/spot-check counts
+    duplicates: int = 0
+
+class OptimizeVariable(BaseModel):
+    alias: str
+    lower: Optional[float] = None
+    upper: Optional[float] = None
+    initial: Optional[float] = None  # Nelder-Mead start, defaults to the middle of the bounds
+    units: Optional[str] = None
+
+class OptimizeObjective(BaseModel):
+    output: str
+    goal: Literal["target", "minimize", "maximize"] = "target"
+    target: Optional[float] = None
+
+class OptimizeRequest(BaseModel):
+    path: str
+    inputs: List[Dict[str, Any]] = []  # Fixed inputs as {alias, value, units}
+    method: Literal["bisection", "brent", "nelder-mead"] = "brent"
+    variables: List[OptimizeVariable] = Field(min_length=1)
+    objective: OptimizeObjective
+    xtol: float = 1e-6  # Convergence on the variables
+    ftol: float = 1e-9  # Convergence on the objective
+    max_iterations: int = Field(default=100, ge=1)
+
+    @model_validator(mode="after")
+    def _check_method(self):
+        if self.objective.goal == "target" and self.objective.target is None:
+            raise ValueError("Objective goal 'target' needs a target value")
+        if self.method in ("bisection", "brent"):
+            if len(self.variables) != 1 or self.objective.goal != "target":
+                raise ValueError(f"'{self.method}' solves for one variable hitting an objective target")
+            var = self.variables[0]
+            if var.lower is None or var.upper is None:
+                raise ValueError(f"'{self.method}' needs lower and upper bounds bracketing the target")
+        elif any(v.initial is None and (v.lower is None or v.upper is None) for v in self.variables):
+            raise ValueError("Nelder-Mead variables need an initial value or both bounds")
+        return self
 
 class SaveLibraryConfigRequest(BaseModel):
     name: str
@@ -59,6 +120,17 @@ class LibraryConfigMetadata(BaseModel):
 
 class ListLibraryConfigsResponse(BaseModel):
     configs: List[LibraryConfigMetadata]
+    total: int  # Matches before paging
+    offset: int = 0
+    limit: Optional[int] = None
 
 class LoadLibraryConfigRequest(BaseModel):
     config_path: str
+
+class LauncherPhase(BaseModel):
+    name: str
+    start: float  # time.time() in the launcher process
+    end: Optional[float] = None
+
+class LauncherPhases(BaseModel):
+    phases: List[LauncherPhase]
@@ -0,0 +1,296 @@
+"""
+Startup progress and phase timing.
+
+The server answers requests as soon as uvicorn is up; the engine process and
+the Mathcad connection come up behind it on a background thread. Each step is
+timed as a phase, measured from when the launcher started (it passes its start
+time in LAUNCH_ENV) so the numbers match what the user waited, and the whole
+picture is served by GET /api/v1/startup for the UI to show while it waits.
+After connecting, the most recently used worksheets are preloaded so the first
+job on them doesn't pay for opening the file.
+
+Once startup settles, a profile (the phases, including the launcher's own, and
+the cost of every module imported on the way) is written to the logs directory:
+startup.json for the latest launch and one line per launch in
+startup_history.jsonl, so regressions show up release over release.
+"""
+import importlib._bootstrap
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+LAUNCH_ENV = "MATHCAD_AUTOMATOR_LAUNCHED"  # time.time() when the launcher started
+POLL_INTERVAL = 0.1
+PROFILE_NAME = "startup.json"
+HISTORY_NAME = "startup_history.jsonl"
+SLOWEST_IMPORTS = 40  # Imports listed in a profile, by cumulative time
+
+
+class ImportProfiler:
+    """
+    Times module imports in this process, like python -X importtime but
+    available in the frozen build. Every import statement goes through
+    importlib's _find_and_load for modules not yet loaded, so wrapping it sees
+    each first import; nested imports are charged to the importing module's
+    cumulative time and subtracted from its own.
+    """
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self._original = None
+        self._local = threading.local()
+
+    @property
+    def installed(self) -> bool:
+        return self._original is not None
+
+    def install(self):
+        if self._original is None:
+            self._original = importlib._bootstrap._find_and_load
+            importlib._bootstrap._find_and_load = self._find_and_load
+
+    def uninstall(self):
+        if self._original is not None:
+            importlib._bootstrap._find_and_load = self._original
+            self._original = None
+
+    def _find_and_load(self, name, import_):
+        original = self._original
+        if original is None:  # Uninstalled while this import was being resolved
+            return importlib._bootstrap._find_and_load(name, import_)
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)  # Time spent in nested imports
+        start = time.perf_counter()
+        try:
+            return original(name, import_)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.records.append({"module": name, "self_ms": round((elapsed - nested) * 1000, 2),
+                                 "cumulative_ms": round(elapsed * 1000, 2), "depth": len(stack)})
+
+    def report(self, limit: int = SLOWEST_IMPORTS) -> Dict[str, Any]:
+        records = list(self.records)
+        return {
+            "modules": len(records),
+            "total_ms": round(sum(r["self_ms"] for r in records), 1),
+            "slowest": sorted(records, key=lambda r: r["cumulative_ms"], reverse=True)[:limit],
+        }
+
+
+# Installed by the launcher's run_server before anything heavy is imported
+import_profiler = ImportProfiler()
+
+
+def launch_time() -> Optional[float]:
+    try:
+        return float(os.environ[LAUNCH_ENV])
+    except (KeyError, ValueError):
+        return None
+
+
+class StartupTracker:
+    """Phases of one server startup, and where the engine and Mathcad stand."""
+
+    def __init__(self, origin: Optional[float] = None, log_dir: Optional[str] = None,
+                 version: Optional[str] = None):
+        self.origin = origin or launch_time() or time.time()
+        self.log_dir = log_dir  # No profile is written without one
+        self.version = version
+        self.phases: List[Dict[str, Any]] = []
+        self.engine = "pending"  # pending -> starting -> running | failed
+        self.mathcad = "pending"  # pending -> connecting -> connected | failed
+        self.error: Optional[str] = None
+        self.cancelled = threading.Event()
+        self.settled = False  # Engine and Mathcad have finished coming up, either way
+        # Launched standalone (dev server, tests) there are no launcher phases to wait for
+        self.launcher_reported = launch_time() is None
+        self.imports: Optional[Dict[str, Any]] = None
+        self.recorded = False  # Appended to the history
+        self._lock = threading.Lock()
+
+    def _offset(self, at: Optional[float] = None) -> float:
+        return round((time.time() if at is None else at) - self.origin, 3)
+
+    def mark(self, name: str, at: Optional[float] = None):
+        """Records an instant (e.g. "server_ready") as a zero-length phase."""
+        offset = self._offset(at)
+        with self._lock:
+            self.phases.append({"name": name, "start": offset, "end": offset})
+
+    def add_launcher_phases(self, phases: List[Dict[str, Any]]):
+        """Merges phases the launcher timed itself (absolute start/end times)."""
+        with self._lock:
+            for p in phases:
+                end = p.get("end")
+                self.phases.append({"name": p["name"], "start": self._offset(p["start"]),
+                                    "end": None if end is None else self._offset(end), "source": "launcher"})
+            self.phases.sort(key=lambda p: p["start"])
+        self.launcher_reported = True
+        self.write_profile()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Times the enclosed block; an exception is recorded on the phase and re-raised."""
+        entry: Dict[str, Any] = {"name": name, "start": self._offset(), "end": None}
+        with self._lock:
+            self.phases.append(entry)
+        try:
+            yield entry
+        except Exception as e:
+            entry["error"] = str(e)
+            raise
+        finally:
+            entry["end"] = self._offset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = [dict(p, duration=None if p["end"] is None else round(p["end"] - p["start"], 3))
+                      for p in self.phases]
+        if self.engine == "failed" or self.mathcad == "failed":
+            state = "failed"
+        elif self.mathcad == "connected":
+            state = "ready"
+        else:
+            state = "starting"
+        return {
+            "state": state,
+            "engine": self.engine,
+            "mathcad": self.mathcad,
+            "error": self.error,
+            "elapsed": self._offset(),
+            "phases": phases,
+        }
+
+    def profile(self) -> Dict[str, Any]:
+        """The snapshot plus what the profile file records about this launch."""
+        imports = self.imports if self.imports is not None else (
+            import_profiler.report() if import_profiler.installed else None)
+        return {
+            **self.snapshot(),
+            "launched_at": self.origin,
+            "version": self.version,
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "python": platform.python_version(),
+            "imports": imports,
+        }
+
+    def settle(self):
+        """Called once the engine and Mathcad are up (or have failed): stops profiling imports."""
+        if import_profiler.installed:
+            self.imports = import_profiler.report()
+            import_profiler.uninstall()  # Later lazy imports aren't startup cost
+        self.settled = True
+        self.write_profile()
+
+    def write_profile(self):
+        """Writes startup.json, and the history line once both halves of startup have reported."""
+        if not self.log_dir or not self.settled:
+            return
+        profile = self.profile()
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            with open(os.path.join(self.log_dir, PROFILE_NAME), "w", encoding="utf-8") as f:
+                json.dump(profile, f, indent=2)
+            with self._lock:
+                if self.recorded or not self.launcher_reported:
+                    return
+                self.recorded = True
+            line = {key: profile[key] for key in ("launched_at", "version", "frozen", "state", "elapsed")}
+            line["phases"] = {p["name"]: p["duration"] for p in profile["phases"]}
+            line["imports_ms"] = profile["imports"]["total_ms"] if profile["imports"] else None
+            with open(os.path.join(self.log_dir, HISTORY_NAME), "a", encoding="utf-8") as f:
+                f.write(json.dumps(line) + "\n")
+        except OSError as e:
+            print(f"Warning: Could not write startup profile: {e}")
+
+
+def load_history(log_dir: str, limit: int) -> List[Dict[str, Any]]:
+    """The last `limit` launches recorded in the history, newest first."""
+    try:
+        with open(os.path.join(log_dir, HISTORY_NAME), "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    entries = []
+    for line in reversed(lines):
+        if len(entries) >= limit:
+            break
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue  # Line cut short by a crash mid-write
+    return entries
+
+
+def start_in_background(manager, tracker: StartupTracker) -> threading.Thread:
+    """Starts the engine and connects to Mathcad without holding up the server."""
+    thread = threading.Thread(target=_bring_up, args=(manager, tracker), daemon=True)
+    thread.start()
+    return thread
+
+
+def _bring_up(manager, tracker: StartupTracker):
+    try:
+        _start_engine_and_connect(manager, tracker)
+    finally:
+        tracker.settle()
+
+
+def _start_engine_and_connect(manager, tracker: StartupTracker):
+    tracker.engine = "starting"
+    try:
+        with tracker.phase("engine_start"):
+            manager.start_engine()
+    except Exception as e:
+        tracker.engine, tracker.error = "failed", f"Engine failed to start: {e}"
+        return
+    tracker.engine = "running"
+    if tracker.cancelled.is_set():
+        return
+
+    # Launching Mathcad is the slow part; jobs queued meanwhile simply run after it
+    tracker.mathcad = "connecting"
+    with tracker.phase("mathcad_connect") as entry:
+        result = _wait_for(manager, tracker, manager.submit_job("connect", {}), "connect")
+        if tracker.cancelled.is_set():
+            entry["error"] = "Cancelled"
+            return
+        if result is not None and result.is_success:
+            tracker.mathcad = "connected"
+        else:
+            # Not fatal: the worker connects again on the first job that needs Mathcad
+            tracker.mathcad = "failed"
+            tracker.error = result.error_message if result is not None else "Timed out connecting to Mathcad"
+            entry["error"] = tracker.error
+            return
+
+    with tracker.phase("worksheet_preload") as entry:
+        job_id = manager.warm_up()
+        if job_id is None:
+            entry["opened"] = []
+            return
+        result = _wait_for(manager, tracker, job_id, "preload")
+        if result is not None and result.is_success:
+            entry.update(result.data)
+        else:
+            entry["error"] = result.error_message if result is not None else "Cancelled or timed out"
+
+
+def _wait_for(manager, tracker: StartupTracker, job_id: str, command: str):
+    """The job's result, or None if startup was cancelled or it outlived its timeout."""
+    deadline = time.time() + manager.get_timeout(command)
+    while time.time() < deadline:
+        if tracker.cancelled.wait(POLL_INTERVAL):
+            return None
+        result = manager.get_job(job_id)
+        if result is not None:
+            return result
+    return None
@@ -0,0 +1,11 @@
+import pytest
+
+@pytest.fixture
+def app_data_dir(tmp_path, monkeypatch):
+    """
+    Points the server's app data directory (run history, latency history,
+    logs, uploads) at tmp_path, with a fresh EngineManager built there.
+    """
+    monkeypatch.setattr("src.server.main.get_app_data_dir", lambda: str(tmp_path))
+    monkeypatch.setattr("src.server.dependencies._manager", None)
+    return tmp_path
@@ -0,0 +1,128 @@
+import pytest
+from unittest.mock import MagicMock
+from engine.adaptive import AdaptiveSpec, AdaptiveRefiner
+from engine.batch_manager import BatchManager
+from engine.protocol import JobResult, StopCondition
+from engine.sweep import SweepSpec
+import os
+import time
+
+def utilization(b, h):
+    return 800.0 / (b * h)
+
+def run_refiner(spec, sizes, fn):
+    refiner = AdaptiveRefiner(spec, sizes)
+    values = {}
+    points = refiner.coarse()
+    while points:
+        for p in points:
+            values[p] = fn(*p)
+        points = refiner.refine(values)
+    return values
+
+def test_refines_only_near_threshold():
+    spec = AdaptiveSpec(output="U", threshold=1.0, coarse_points=5, max_depth=10)
+    values = run_refiner(spec, [101], lambda x: x / 63.0)
+    xs = sorted(p[0] for p in values)
+    # Crossing at x=63 is pinned down to adjacent grid points
+    assert 63 in xs and 62 in xs
+    assert len(xs) < 20
+
+def test_2d_refinement_beats_dense_grid():
+    spec = AdaptiveSpec(output="U", threshold=1.0, coarse_points=5, max_depth=10)
+    values = run_refiner(spec, [41, 41], lambda i, j: utilization(10 + i, 10 + j))
+    assert len(values) < 41 * 41 / 3
+    # Every dense-grid neighbour pair straddling the threshold was evaluated
+    crossings = [(i, j) for i in range(40) for j in range(41)
+                 if (utilization(10 + i, 10 + j) >= 1.0) != (utilization(11 + i, 10 + j) >= 1.0)]
+    assert crossings
+    assert all((i, j) in values and (i + 1, j) in values for i, j in crossings)
+
+def test_max_rows_and_spec_validation():
+    spec = AdaptiveSpec(output="U", max_change=0.01, max_rows=30)
+    values = run_refiner(spec, [50, 50], lambda i, j: i * j)
+    assert len(values) == 30
+    with pytest.raises(ValueError):
+        AdaptiveSpec(output="U")
+
+@pytest.fixture
+def mock_engine():
+    engine = MagicMock()
+    engine.is_running.return_value = True
+    engine.get_timeout.return_value = 120.0
+    jobs = {}
+
+    def submit(command, payload=None):
+        job_id = f"job_{len(jobs) + 1}"
+        inputs = {c.alias: c.value for c in payload["inputs"]}
+        jobs[job_id] = JobResult(job_id=job_id, status="success",
+                                 data={"outputs": {"U": utilization(inputs["b"], inputs["h"])}})
+        return job_id
+
+    def submit_many(path, rows, force_reopen=False, timeout=None):
+        return [submit("calculate_job", {"path": path, **row}) for row in rows]
+
+    engine.submit_job.side_effect = submit
+    engine.submit_many.side_effect = submit_many
+    engine.get_job.side_effect = lambda job_id: jobs[job_id]
+    return engine
+
+def wait(bm, batch_id, output_dir):
+    start = time.time()
+    while bm.get_status(batch_id)["status"] == "running" and time.time() - start < 10:
+        time.sleep(0.05)
+    if os.path.exists(output_dir):
+        import shutil
+        shutil.rmtree(output_dir)
+    return bm.get_status(batch_id)
+
+def make_sweep():
+    return SweepSpec.model_validate({
+        "constants": {"path": "C:\\test\\beam.mcdx"},
+        "grid": {"type": "product", "axes": [
+            {"type": "range", "alias": "b", "start": 10, "end": 50, "step": 1},
+            {"type": "range", "alias": "h", "start": 10, "end": 50, "step": 1},
+        ]}
+    })
+
+def test_adaptive_batch_reports_dense_row_indices(mock_engine):
+    bm = BatchManager(mock_engine)
+    sweep = make_sweep()
+    bm.start_batch("test_adaptive", [], "test_output_adaptive", export_pdf=False, sweep=sweep,
+                   adaptive=AdaptiveSpec(output="U", threshold=1.0))
+    status = wait(bm, "test_adaptive", "test_output_adaptive")
+
+    assert status["status"] == "completed"
+    assert status["completed"] == status["total"] < sweep.count() / 3
+    for res in status["results"]:
+        row = sweep.row_at(res["row"])
+        assert res["data"]["outputs"]["U"] == utilization(row["b"], row["h"])
+
+def test_pipelined_passes_match_row_by_row(mock_engine):
+    rows = {}
+    for window in (1, 8):
+        bm = BatchManager(mock_engine)
+        bm.start_batch(f"test_window_{window}", [], "test_output_window", export_pdf=False, sweep=make_sweep(),
+                       adaptive=AdaptiveSpec(output="U", threshold=1.0), window=window)
+        status = wait(bm, f"test_window_{window}", "test_output_window")
+        assert status["status"] == "completed"
+        rows[window] = sorted(r["row"] for r in status["results"])
+    assert rows[1] == rows[8]
+    assert mock_engine.submit_many.called
+
+def test_stop_condition_ends_batch(mock_engine):
+    bm = BatchManager(mock_engine)
+    bm.start_batch("test_stop", [], "test_output_stop", export_pdf=False, sweep=make_sweep(),
+                   stop_when=StopCondition(output="U", op="<", value=1.0))
+    status = wait(bm, "test_stop", "test_output_stop")
+
+    assert status["status"] == "completed"
+    # Rows run in order until the first one with U < 1.0
+    last = status["results"][-1]
+    assert last["data"]["outputs"]["U"] < 1.0
+    assert all(r["data"]["outputs"]["U"] >= 1.0 for r in status["results"][:-1])
+    assert status["stop_reason"].startswith(f"Stop condition met at row {last['row']}")
+    assert status["total"] == status["completed"]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
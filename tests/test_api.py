@@ -8,7 +8,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from src.server.main import app
 
-def test_api_flow():
+def test_api_flow(app_data_dir):
     print("Starting TestClient with lifespan...")
     with TestClient(app) as client:
         print("1. Root check")
@@ -2,7 +2,7 @@ from fastapi.testclient import TestClient
 from src.server.main import app
 import pytest
 
-def test_batch_api_flow():
+def test_batch_api_flow(app_data_dir):
     with TestClient(app) as client:
         # 1. Start Batch
         batch_data = {
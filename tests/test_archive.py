@@ -0,0 +1,159 @@
+import io
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+import pytest
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from src.server.main import app
+from src.server.dependencies import get_engine_manager
+from engine.batch_manager import BatchManager
+from engine.protocol import JobResult
+from src.server.archive import results_csv, archive_members, TarArchive, stream_zip, parse_range
+
+OUTPUT_DIR = "test_output_archive"
+
+@pytest.fixture
+def batch():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    files = []
+    for i, size in enumerate((0, 700, 5000)):
+        path = os.path.join(OUTPUT_DIR, f"beam_L-{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        files.append(path)
+    yield {
+        "id": "archive batch",
+        "results": [
+            {"row": 0, "status": "success", "data": {"outputs": {"M": 1.5}}, "pdf": files[0]},
+            {"row": 1, "status": "failed", "error": "Bad input", "error_kind": "input"},
+            {"row": 2, "status": "success", "data": {"outputs": {"M": 2.5, "V": 3}}, "pdf": files[2],
+             "duplicate_of": 0},
+        ],
+        "generated_files": files + [files[0], os.path.join(OUTPUT_DIR, "missing.pdf")],
+    }
+    shutil.rmtree(OUTPUT_DIR, ignore_errors=True)
+
+def row_input(i):
+    return {"path": "C:\\test\\beam.mcdx", "L": {"value": i * 10, "units": "ft"}}
+
+def test_results_csv(batch):
+    lines = results_csv(batch, row_input).decode().splitlines()
+    assert lines[0] == "row,status,path,L,M,V,pdf,mcdx,error,error_kind,surrogate,duplicate_of"
+    assert lines[2].startswith("1,failed,C:\\test\\beam.mcdx,10,,,")
+    assert lines[3].split(",")[3:6] == ["20", "2.5", "3"]
+
+def test_tar_ranges_reassemble_archive(batch):
+    members = archive_members(batch, results_csv(batch, row_input))
+    assert [name for name, _ in members] == ["results.csv", "beam_L-0.pdf", "beam_L-1.pdf", "beam_L-2.pdf"]
+    archive = TarArchive(members)
+    full = b"".join(archive.read())
+    assert len(full) == archive.size
+
+    with tarfile.open(fileobj=io.BytesIO(full)) as tar:
+        assert tar.getnames() == [name for name, _ in members]
+        with open(batch["generated_files"][1], "rb") as f:
+            assert tar.extractfile("beam_L-1.pdf").read() == f.read()
+
+    # Arbitrary ranges, as a resumed download would request them
+    cuts = [0, 1, 511, 512, 1300, 6000, archive.size]
+    parts = [b"".join(archive.read(a, b - 1)) for a, b in zip(cuts, cuts[1:])]
+    assert b"".join(parts) == full
+
+def test_zip_stream(batch):
+    members = archive_members(batch, b"row\n")
+    data = b"".join(stream_zip(members))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.namelist() == [name for name, _ in members]
+        assert zf.read("results.csv") == b"row\n"
+        assert zf.testzip() is None
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=10-", 100) == (10, 99)
+    assert parse_range("bytes=10-500", 100) == (10, 99)
+    assert parse_range("bytes=-30", 100) == (70, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+def test_archive_endpoint_resumes(batch):
+    manager = MagicMock()
+    manager.batch_manager.get_status.side_effect = lambda batch_id: batch if batch_id == batch["id"] else None
+    manager.batch_manager.get_row_input.side_effect = lambda batch_id, row: row_input(row)
+    app.dependency_overrides[get_engine_manager] = lambda: manager
+    try:
+        client = TestClient(app)
+        url = "/api/v1/batch/archive batch/archive"
+        full = client.get(url)
+        assert full.status_code == 200
+        assert full.headers["accept-ranges"] == "bytes"
+        assert 'filename="archive_batch.tar"' in full.headers["content-disposition"]
+
+        etag = full.headers["etag"]
+        rest = client.get(url, headers={"Range": "bytes=1000-", "If-Range": etag})
+        assert rest.status_code == 206
+        assert rest.headers["content-range"] == f"bytes 1000-{len(full.content) - 1}/{len(full.content)}"
+        assert full.content[:1000] + rest.content == full.content
+
+        # Stale validator: the whole archive is sent again
+        assert client.get(url, headers={"Range": "bytes=1000-", "If-Range": '"old"'}).status_code == 200
+        assert client.get(url, headers={"Range": f"bytes={len(full.content)}-"}).status_code == 416
+        assert client.get(url + "?format=zip").headers["content-type"] == "application/zip"
+        assert client.get("/api/v1/batch/nope/archive").status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+
+def engine_manager():
+    """Stand-in EngineManager whose real BatchManager calculates M = 2 * L."""
+    engine = MagicMock()
+    engine.is_running.return_value = True
+    engine.get_timeout.return_value = 120.0
+    jobs = {}
+
+    def submit(command, payload=None):
+        job_id = f"job_{len(jobs) + 1}"
+        inputs = {c.alias: c.value for c in payload["inputs"]}
+        jobs[job_id] = JobResult(job_id=job_id, status="success", data={"outputs": {"M": 2 * inputs["L"]}})
+        return job_id
+
+    engine.submit_job.side_effect = submit
+    engine.submit_many.side_effect = lambda path, rows, **kw: [submit("calculate_job", {"path": path, **row})
+                                                               for row in rows]
+    engine.get_job.side_effect = lambda job_id: jobs[job_id]
+    engine.batch_manager = BatchManager(engine)
+    return engine
+
+def download_results(client, batch_request):
+    """Starts a batch over HTTP, waits for it and returns the results.csv of its archive."""
+    batch_id = batch_request["batch_id"]
+    assert client.post("/api/v1/batch/start", json=batch_request).status_code == 200
+    start = time.time()
+    while client.get(f"/api/v1/batch/{batch_id}").json()["status"] == "running" and time.time() - start < 5:
+        time.sleep(0.05)
+    response = client.get(f"/api/v1/batch/{batch_id}/archive")
+    assert response.status_code == 200
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as tar:
+        return tar.extractfile("results.csv").read().decode().splitlines()
+
+def test_archive_of_sweep_batch():
+    manager = engine_manager()
+    app.dependency_overrides[get_engine_manager] = lambda: manager
+    try:
+        client = TestClient(app)
+        lines = download_results(client, {
+            "batch_id": "sweep batch", "output_dir": OUTPUT_DIR, "export_pdf": False,
+            "sweep": {"constants": {"path": "C:\\test\\beam.mcdx"},
+                      "grid": {"type": "list", "alias": "L", "values": [1, 2, 3]}},
+        })
+        assert lines[0] == "row,status,path,L,M,pdf,mcdx,error,error_kind,surrogate,duplicate_of"
+        assert [line.split(",")[3:5] for line in lines[1:]] == [["1", "2"], ["2", "4"], ["3", "6"]]
+        assert manager.submit_many.called  # Pipelined: the API's default window applies
+    finally:
+        app.dependency_overrides.clear()
+        shutil.rmtree(OUTPUT_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import MagicMock
+from engine.artifacts import ArtifactManifest
+from engine.batch_manager import BatchManager
+from engine.protocol import JobResult
+import os
+import shutil
+import time
+
+OUTPUT_DIR = "test_output_artifacts"
+
+@pytest.fixture
+def mock_engine():
+    engine = MagicMock()
+    engine.is_running.return_value = True
+    engine.get_timeout.return_value = 120.0
+    jobs = {}
+
+    def submit(command, payload=None):
+        job_id = f"job_{len(jobs) + 1}"
+        if command == "save_as":
+            with open(payload["path"], "w") as f:
+                f.write(f"export {payload['format']}")
+        jobs[job_id] = JobResult(job_id=job_id, status="success", data={"outputs": {}})
+        return job_id
+
+    engine.submit_job.side_effect = submit
+    engine.get_job.side_effect = lambda job_id: jobs[job_id]
+    return engine
+
+@pytest.fixture
+def worksheet():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(OUTPUT_DIR, "..", "test_artifacts_beam.mcdx"))
+    with open(path, "w") as f:
+        f.write("v1")
+    yield path
+    os.remove(path)
+    shutil.rmtree(OUTPUT_DIR, ignore_errors=True)
+
+def run(bm, batch_id, inputs):
+    bm.start_batch(batch_id, inputs, OUTPUT_DIR, export_pdf=True, export_mcdx=True)
+    start = time.time()
+    while bm.get_status(batch_id)["status"] == "running" and time.time() - start < 5:
+        time.sleep(0.05)
+    return bm.get_status(batch_id)
+
+def save_calls(engine):
+    return [c for c in engine.submit_job.call_args_list if c.args[0] == "save_as"]
+
+def test_rerun_reuses_unchanged_exports(mock_engine, worksheet):
+    inputs = [{"path": worksheet, "L": 10}, {"path": worksheet, "L": 20}]
+    bm = BatchManager(mock_engine)
+    first = run(bm, "first", inputs)
+    assert len(save_calls(mock_engine)) == 4
+    assert os.path.exists(os.path.join(OUTPUT_DIR, ArtifactManifest.FILENAME))
+
+    mock_engine.submit_job.reset_mock()
+    second = run(bm, "second", inputs + [{"path": worksheet, "L": 30}])
+    # Only the new row is exported; the others reuse last run's files
+    assert len(save_calls(mock_engine)) == 2
+    assert sorted(second["generated_files"][:4]) == sorted(first["generated_files"])
+    assert [r["pdf"] for r in second["results"][:2]] == [r["pdf"] for r in first["results"]]
+
+def test_changed_file_or_worksheet_is_exported_again(mock_engine, worksheet):
+    inputs = [{"path": worksheet, "L": 10}]
+    bm = BatchManager(mock_engine)
+    first = run(bm, "first", inputs)
+    with open(first["results"][0]["pdf"], "w") as f:
+        f.write("tampered")
+
+    mock_engine.submit_job.reset_mock()
+    run(bm, "second", inputs)
+    assert [c.args[1]["format"] for c in save_calls(mock_engine)] == [3]
+
+    # Editing the worksheet invalidates every export made from it
+    with open(worksheet, "w") as f:
+        f.write("v2 with changes")
+    mock_engine.submit_job.reset_mock()
+    run(bm, "third", inputs)
+    assert len(save_calls(mock_engine)) == 2
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
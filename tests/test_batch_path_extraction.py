@@ -8,6 +8,7 @@ import os
 def mock_engine():
     engine = MagicMock()
     engine.is_running.return_value = True
+    engine.get_timeout.return_value = 120.0
     return engine
 
 def test_batch_manager_with_path_extraction(mock_engine):
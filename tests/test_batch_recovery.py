@@ -0,0 +1,131 @@
+import pytest
+from unittest.mock import MagicMock
+from engine.batch_manager import BatchManager
+from engine.protocol import JobResult
+import os
+import time
+
+@pytest.fixture
+def mock_engine():
+    engine = MagicMock()
+    engine.is_running.return_value = True
+    engine.get_timeout.return_value = 120.0
+    return engine
+
+def run_batch(bm, batch_id, inputs, output_dir, **options):
+    bm.start_batch(batch_id, inputs, output_dir, export_pdf=False, **options)
+    start = time.time()
+    while bm.get_status(batch_id)["status"] == "running" and time.time() - start < 5:
+        time.sleep(0.05)
+    if os.path.exists(output_dir):
+        import shutil
+        shutil.rmtree(output_dir)
+    return bm.get_status(batch_id)
+
+def capture_engine(mock_engine, results):
+    """Route submit_job/get_job through a list of canned results keyed by submit order."""
+    submit_calls = []
+
+    def capture_submit(command, payload=None):
+        submit_calls.append({"command": command, "payload": payload})
+        return f"job_{len(submit_calls)}"
+
+    mock_engine.submit_job.side_effect = capture_submit
+    mock_engine.get_job.side_effect = lambda job_id: results[int(job_id.split("_")[1]) - 1]
+    return submit_calls
+
+def test_input_error_fails_row_without_restart(mock_engine):
+    """Bad input rows fail immediately and leave the engine alone"""
+    bm = BatchManager(mock_engine)
+    results = [
+        JobResult(job_id="job_1", status="error", error_message="Failed to set input a", error_kind="input"),
+        JobResult(job_id="job_2", status="success", data={"val": 20}),
+    ]
+    submit_calls = capture_engine(mock_engine, results)
+
+    inputs = [{"a": "bad", "path": "C:\\test\\file.mcdx"}, {"a": 2, "path": "C:\\test\\file.mcdx"}]
+    status = run_batch(bm, "test_input_error", inputs, "test_output_input_error")
+
+    assert status["status"] == "completed"
+    assert status["results"][0]["status"] == "failed"
+    assert status["results"][0]["error_kind"] == "input"
+    assert status["results"][1]["status"] == "success"
+    assert [c["command"] for c in submit_calls] == ["calculate_job", "calculate_job"]
+    mock_engine.restart_engine.assert_not_called()
+
+def test_worksheet_error_reopens_file(mock_engine):
+    """Worksheet errors retry with force_reopen before touching the connection"""
+    bm = BatchManager(mock_engine)
+    results = [
+        JobResult(job_id="job_1", status="error", error_message="Failed to synchronize", error_kind="worksheet"),
+        JobResult(job_id="job_2", status="success", data={"val": 10}),
+    ]
+    submit_calls = capture_engine(mock_engine, results)
+
+    status = run_batch(bm, "test_worksheet_error", [{"a": 1, "path": "C:\\test\\file.mcdx"}],
+                       "test_output_worksheet_error")
+
+    assert status["results"][0]["status"] == "success"
+    assert "force_reopen" not in submit_calls[0]["payload"]
+    assert submit_calls[1]["payload"]["force_reopen"] is True
+    mock_engine.restart_engine.assert_not_called()
+
+def test_connection_error_climbs_ladder_to_restart(mock_engine):
+    """Connection errors reconnect first and only restart the process if that fails"""
+    bm = BatchManager(mock_engine)
+    conn_err = dict(status="error", error_message="RPC server unavailable", error_kind="connection")
+    results = [
+        JobResult(job_id="job_1", **conn_err),
+        JobResult(job_id="job_2", status="success", data={}),  # reconnect
+        JobResult(job_id="job_3", **conn_err),
+        JobResult(job_id="job_4", status="success", data={}),  # connect after restart
+        JobResult(job_id="job_5", status="success", data={"val": 10}),
+    ]
+    submit_calls = capture_engine(mock_engine, results)
+
+    status = run_batch(bm, "test_connection_error", [{"a": 1, "path": "C:\\test\\file.mcdx"}],
+                       "test_output_connection_error")
+
+    assert status["results"][0]["status"] == "success"
+    assert [c["command"] for c in submit_calls] == [
+        "calculate_job", "reconnect", "calculate_job", "connect", "calculate_job"
+    ]
+    mock_engine.restart_engine.assert_called_once()
+
+def test_watchdog_timeout_skips_redundant_restart(mock_engine):
+    """A job the engine watchdog already killed is retried without another restart"""
+    bm = BatchManager(mock_engine)
+    results = [
+        JobResult(job_id="job_1", status="error", data={"harness_replaced": True},
+                  error_message="Job timed out after 120s (calculate_job); harness restarted",
+                  error_kind="timeout"),
+        JobResult(job_id="job_2", status="success", data={"val": 10}),
+    ]
+    submit_calls = capture_engine(mock_engine, results)
+
+    status = run_batch(bm, "test_watchdog_timeout", [{"a": 1, "path": "C:\\test\\file.mcdx"}],
+                       "test_output_watchdog_timeout")
+
+    assert status["results"][0]["status"] == "success"
+    assert [c["command"] for c in submit_calls] == ["calculate_job", "calculate_job"]
+    mock_engine.restart_engine.assert_not_called()
+
+@pytest.mark.parametrize("window", [1, 4])
+def test_rows_that_cannot_be_built_fail_without_recovery(mock_engine, window):
+    """A row failing before it reaches the engine is an input error, not a reason to restart"""
+    bm = BatchManager(mock_engine)
+    submit_calls = capture_engine(mock_engine, [JobResult(job_id="job_1", status="success", data={"val": 10})])
+    mock_engine.submit_many.side_effect = lambda path, rows, **kw: [
+        mock_engine.submit_job("calculate_job", {"path": path, **row}) for row in rows]
+
+    inputs = [{"a": 1}, {"M": [[1, "x"], [2, 3]], "path": "C:\\test\\file.mcdx"},
+              {"a": 2, "path": "C:\\test\\file.mcdx"}]
+    status = run_batch(bm, "test_local_input_error", inputs, "test_output_local_input_error", window=window)
+
+    assert [r["status"] for r in status["results"]] == ["failed", "failed", "success"]
+    assert {r["error_kind"] for r in status["results"][:2]} == {"input"}
+    assert len(submit_calls) == 1
+    mock_engine.restart_engine.assert_not_called()
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
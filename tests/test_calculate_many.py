@@ -0,0 +1,168 @@
+import os
+import shutil
+import time
+import pytest
+from unittest.mock import MagicMock
+from engine.batch_manager import BatchManager
+from engine.harness import run_calculate_many
+from engine.manager import EngineManager
+from engine.protocol import JobRequest, JobResult, InputConfig
+from engine.wire import decode_requests
+
+OUTPUT_DIR = "test_output_chunks"
+
+@pytest.fixture
+def mock_engine():
+    """Engine that answers chunk rows (exports included) and single jobs immediately."""
+    engine = MagicMock()
+    engine.is_running.return_value = True
+    engine.get_timeout.return_value = 120.0
+    jobs = {}
+    engine.fail_once = set()  # Row values whose first calculation fails
+
+    def calculate(job_id, inputs, exports=()):
+        value = inputs[0].value
+        if value in engine.fail_once:
+            engine.fail_once.discard(value)
+            jobs[job_id] = JobResult(job_id=job_id, status="error", error_message="Flaky", error_kind="unknown")
+            return
+        saved = {}
+        for export in exports:
+            with open(export["path"], "w") as f:
+                f.write("pdf")
+            saved[export["path"]] = None
+        jobs[job_id] = JobResult(job_id=job_id, status="success",
+                                 data={"outputs": {"M": value * 2}, "exports": saved})
+
+    def submit_many(path, rows, force_reopen=False, timeout=None):
+        job_ids = []
+        for row in rows:
+            job_id = f"row_{len(jobs) + 1}"
+            calculate(job_id, row["inputs"], row.get("exports", ()))
+            job_ids.append(job_id)
+        return job_ids
+
+    def submit_job(command, payload=None):
+        job_id = f"job_{len(jobs) + 1}"
+        if command == "calculate_job":
+            calculate(job_id, payload["inputs"])
+        else:
+            if command == "save_as":
+                with open(payload["path"], "w") as f:
+                    f.write("pdf")
+            jobs[job_id] = JobResult(job_id=job_id, status="success", data={})
+        return job_id
+
+    engine.submit_many.side_effect = submit_many
+    engine.submit_job.side_effect = submit_job
+    engine.get_job.side_effect = lambda job_id: jobs.get(job_id)
+    yield engine
+    shutil.rmtree(OUTPUT_DIR, ignore_errors=True)
+
+def run(bm, inputs, **kwargs):
+    bm.start_batch("chunks", inputs, OUTPUT_DIR, export_pdf=True, **kwargs)
+    start = time.time()
+    while bm.get_status("chunks")["status"] == "running" and time.time() - start < 5:
+        time.sleep(0.05)
+    return bm.get_status("chunks")
+
+def test_rows_are_queued_in_chunks_per_worksheet(mock_engine):
+    inputs = [{"path": "a.mcdx", "L": v} for v in range(5)] + [{"path": "b.mcdx", "L": v} for v in range(2)]
+    inputs.append({"path": "a.mcdx", "L": 1})  # Duplicate: reuses row 1, never queued
+    status = run(BatchManager(mock_engine), inputs, chunk_size=3, window=6)
+
+    chunks = [(c.args[0], len(c.args[1])) for c in mock_engine.submit_many.call_args_list]
+    assert chunks[:2] == [("a.mcdx", 3), ("a.mcdx", 2)]
+    assert {path for path, _ in chunks[2:]} == {"b.mcdx"} and sum(n for _, n in chunks) == 7
+    assert mock_engine.submit_job.call_count == 0  # Exports went with the rows
+
+    assert status["status"] == "completed" and status["completed"] == 8
+    rows = sorted(status["results"], key=lambda r: r["row"])
+    assert [r["data"]["outputs"]["M"] for r in rows] == [0, 2, 4, 6, 8, 0, 2, 2]
+    assert rows[7]["duplicate_of"] == 1
+    assert all(os.path.exists(r["pdf"]) for r in rows)
+    assert len(status["generated_files"]) == 7  # The duplicate shares its source's file name
+
+def test_failed_row_is_queued_again_on_its_own(mock_engine):
+    mock_engine.fail_once.add(2)
+    status = run(BatchManager(mock_engine), [{"path": "a.mcdx", "L": v} for v in range(4)], chunk_size=4)
+    assert status["completed"] == 4
+    assert all(r["status"] == "success" and r["pdf"] for r in status["results"])
+    assert [len(c.args[1]) for c in mock_engine.submit_many.call_args_list] == [4, 1]
+
+def test_window_handles_rows_out_of_order(mock_engine):
+    # Only the newest queued job ever finishes, so rows complete out of order
+    queued, finished, widest = [], [], [0]
+    submit_many = mock_engine.submit_many.side_effect
+    get_job = mock_engine.get_job.side_effect
+
+    def submit(path, rows, force_reopen=False, timeout=None):
+        job_ids = submit_many(path, rows)
+        queued.extend(job_ids)
+        widest[0] = max(widest[0], len(queued))
+        return job_ids
+
+    def newest_first(job_id):
+        if not queued or job_id != queued[-1]:
+            return None
+        finished.append(queued.pop())
+        return get_job(job_id)
+
+    mock_engine.submit_many.side_effect = submit
+    mock_engine.get_job.side_effect = newest_first
+    status = run(BatchManager(mock_engine), [{"path": "a.mcdx", "L": v} for v in range(6)], window=3)
+
+    assert status["status"] == "completed"
+    assert sorted(r["data"]["outputs"]["M"] for r in status["results"]) == [0, 2, 4, 6, 8, 10]
+    assert widest[0] == 3  # Backpressure: never more than the window queued
+    assert finished != sorted(finished, key=lambda job_id: int(job_id.split("_")[1]))
+
+def test_harness_streams_row_results():
+    worker = MagicMock()
+    worker.get_outputs.return_value = [{"alias": "M"}]
+    worker.get_output_value.side_effect = lambda alias: 42.0
+    job = JobRequest(command="calculate_many", payload={"path": "a.mcdx", "force_reopen": True, "rows": [
+        {"id": "r1", "inputs": [InputConfig(alias="L", value=1)]},
+        {"id": "r2", "inputs": [InputConfig(alias="L", value=2)], "exports": [{"path": "x.pdf", "format": 3}]},
+    ]})
+    results = run_calculate_many(worker, job)
+    first = next(results)
+    # The first row's result is available before the second row runs
+    assert first.job_id == "r1" and first.data == {"outputs": {"M": 42.0}}
+    assert worker.synchronize.call_count == 1
+    second = next(results)
+    assert second.data["exports"] == {"x.pdf": None}
+    worker.save_as.assert_called_once_with("x.pdf", 3)
+    assert [c.kwargs.get("force_reopen") for c in worker.open_file.call_args_list] == [True, False]
+
+def test_tracebacks_are_sent_once_per_failure_kind(monkeypatch):
+    monkeypatch.setattr("engine.harness._traced_kinds", set())
+    worker = MagicMock()
+    worker.set_input.side_effect = ValueError("could not convert 'x'")
+    job = JobRequest(command="calculate_many", payload={"path": "a.mcdx", "rows": [
+        {"id": f"r{n}", "inputs": [InputConfig(alias="L", value="x")]} for n in range(3)
+    ]})
+    results = list(run_calculate_many(worker, job))
+    assert all(r.error_kind == "input" for r in results)
+    assert results[0].error_message.startswith("Traceback")
+    assert [r.error_message for r in results[1:]] == ["ValueError: could not convert 'x'"] * 2
+
+def test_manager_tracks_chunk_rows():
+    manager = EngineManager()
+    manager.process = MagicMock()
+    manager.process.is_alive.return_value = True
+    manager.input_queue = MagicMock()
+    row_ids = manager.submit_many("a.mcdx", [{"inputs": [InputConfig(alias="L", value=v)]} for v in range(3)])
+
+    assert list(manager.pending) == row_ids
+    (chunk,), _ = decode_requests(manager.input_queue.put.call_args[0][0])
+    assert chunk.command == "calculate_many"
+    assert [row["id"] for row in chunk.payload["rows"]] == row_ids
+
+    for row_id in row_ids:
+        manager._job_finished(JobResult(job_id=row_id, status="success"))
+    assert not manager.pending and not manager.chunk_rows and not manager.row_chunk
+    manager.process = None
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,92 @@
+import pytest
+from unittest.mock import MagicMock
+from engine.batch_manager import BatchManager
+from engine.dedup import row_key, canonical_units
+from engine.protocol import JobResult
+import os
+import shutil
+import time
+
+def test_equivalent_rows_share_a_key():
+    a = {"path": "C:\\test\\beam.mcdx", "L": {"value": 10, "units": "ft"}, "Mode": "A"}
+    b = {"Mode": "A", "L": {"value": 10.0, "units": "feet"}, "path": "C:\\test\\beam.mcdx"}
+    assert row_key(a) == row_key(b)
+    assert row_key(a) != row_key({**a, "L": {"value": 10, "units": "in"}})
+    assert row_key(a) != row_key({**a, "Mode": "B"})
+    assert canonical_units(" unitless ") is None
+    assert canonical_units("ft ²") == "ft^2"
+    assert canonical_units("mm") != canonical_units("Mm")
+
+@pytest.fixture
+def mock_engine():
+    engine = MagicMock()
+    engine.is_running.return_value = True
+    engine.get_timeout.return_value = 120.0
+    jobs = {}
+
+    def submit(command, payload=None):
+        job_id = f"job_{len(jobs) + 1}"
+        if command == "save_as":
+            with open(payload["path"], "w") as f:
+                f.write(job_id)
+            data = {}
+        else:
+            inputs = {c.alias: c.value for c in payload["inputs"]}
+            data = {"outputs": {"M": inputs["L"] ** 2}}
+        jobs[job_id] = JobResult(job_id=job_id, status="success", data=data)
+        return job_id
+
+    engine.submit_job.side_effect = submit
+    engine.get_job.side_effect = lambda job_id: jobs[job_id]
+    return engine
+
+def run(bm, batch_id, inputs, output_dir, **kwargs):
+    bm.start_batch(batch_id, inputs, output_dir, **kwargs)
+    start = time.time()
+    while bm.get_status(batch_id)["status"] == "running" and time.time() - start < 5:
+        time.sleep(0.05)
+    return bm.get_status(batch_id)
+
+def test_duplicates_calculated_once(mock_engine):
+    output_dir = "test_output_dedup"
+    inputs = [
+        {"path": "C:\\test\\beam.mcdx", "L": 10, "b": 2},
+        {"path": "C:\\test\\beam.mcdx", "L": 20, "b": 2},
+        {"path": "C:\\test\\beam.mcdx", "b": 2, "L": 10.0},  # Same as row 0, reordered
+        {"path": "C:\\test\\beam.mcdx", "L": 10, "b": 2},  # Exact copy of row 0
+    ]
+    bm = BatchManager(mock_engine)
+    try:
+        status = run(bm, "test_dedup", inputs, output_dir, export_pdf=True)
+        assert status["status"] == "completed"
+        assert status["completed"] == 4
+        assert status["duplicates"] == 2
+        commands = [c.args[0] for c in mock_engine.submit_job.call_args_list]
+        assert commands.count("calculate_job") == 2
+        assert commands.count("save_as") == 2
+
+        rows = status["results"]
+        assert [r.get("duplicate_of") for r in rows] == [None, None, 0, 0]
+        assert rows[2]["data"] == rows[3]["data"] == rows[0]["data"]
+        # Exact copy shares the file; the reordered row gets its own linked/copied file
+        assert rows[3]["pdf"] == rows[0]["pdf"]
+        assert rows[2]["pdf"] != rows[0]["pdf"]
+        with open(rows[2]["pdf"]) as f, open(rows[0]["pdf"]) as g:
+            assert f.read() == g.read()
+        assert rows[2]["pdf"] in status["generated_files"]
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def test_dedupe_can_be_disabled(mock_engine):
+    output_dir = "test_output_nodedup"
+    inputs = [{"path": "C:\\test\\beam.mcdx", "L": 10}] * 3
+    bm = BatchManager(mock_engine)
+    try:
+        status = run(bm, "test_nodedup", inputs, output_dir, export_pdf=False, dedupe=False)
+        assert status["duplicates"] == 0
+        assert mock_engine.submit_job.call_count == 3
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
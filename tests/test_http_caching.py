@@ -0,0 +1,100 @@
+import pytest
+from unittest.mock import MagicMock
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from src.server.main import app
+from src.server.dependencies import get_engine_manager
+from src.server.caching import AssetStaticFiles, IMMUTABLE, REVALIDATE, is_hashed_asset
+from src.server.compression import CompressionMiddleware, choose_encoding
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("") is None
+    assert is_hashed_asset("/assets/index-BQ3x_9aZ.js") and not is_hashed_asset("/index.html")
+    assert not is_hashed_asset("/favicon-32x32.png")  # public/ files keep their names
+
+def test_large_json_is_compressed_and_streams_are_not():
+    small_app = FastAPI()
+    small_app.add_middleware(CompressionMiddleware)
+
+    @small_app.get("/big")
+    def big():
+        return {"rows": [{"row": i, "status": "success"} for i in range(500)]}
+
+    @small_app.get("/tagged")
+    def tagged():
+        return Response(b"[" + b"0," * 1000 + b"0]", media_type="application/json", headers={"ETag": '"v1"'})
+
+    @small_app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @small_app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a" * 4096, b"b" * 4096]), media_type="text/csv")
+
+    client = TestClient(small_app)
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and len(response.json()["rows"]) == 500
+    assert int(response.headers["content-length"]) < 2000
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+    # Compressed bytes differ from the identity ones, so a strong ETag can't be shared
+    assert client.get("/tagged", headers={"Accept-Encoding": "gzip"}).headers["etag"] == 'W/"v1"'
+    assert client.get("/tagged", headers={"Accept-Encoding": "identity"}).headers["etag"] == '"v1"'
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers and len(response.content) == 8192
+
+def test_hashed_assets_are_immutable_and_compressed_once(tmp_path):
+    (tmp_path / "assets").mkdir()
+    bundle = tmp_path / "assets" / "index-a1B2c3D4.js"
+    bundle.write_text("console.log('x');\n" * 200)
+    (tmp_path / "index.html").write_text("<html><script src='/assets/index-a1B2c3D4.js'></script></html>")
+    static_app = FastAPI()
+    files = AssetStaticFiles(directory=str(tmp_path), html=True)
+    static_app.mount("/", files)
+    client = TestClient(static_app)
+
+    response = client.get("/assets/index-a1B2c3D4.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["cache-control"] == IMMUTABLE and response.headers["content-encoding"] == "gzip"
+    assert response.text == bundle.read_text() and response.headers["etag"].startswith('W/"')
+    revalidated = client.get("/assets/index-a1B2c3D4.js",
+                             headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+    client.get("/assets/index-a1B2c3D4.js", headers={"Accept-Encoding": "gzip"})
+    assert len(files._compressed) == 1
+
+    response = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert response.headers["cache-control"] == REVALIDATE and "script" in response.text
+    revalidated = client.get("/", headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+def test_unchanged_status_polls_get_304():
+    manager = MagicMock()
+    status = {"id": "b1", "total": 2, "completed": 1, "status": "running",
+              "results": [{"row": 0, "status": "success", "data": {"outputs": {"M": 1.5}}}]}
+    manager.batch_manager.get_status.side_effect = lambda batch_id: dict(status)
+    manager.workflow_manager.get_status.return_value = {"workflow_id": "w1", "status": "running"}
+    app.dependency_overrides[get_engine_manager] = lambda: manager
+    try:
+        client = TestClient(app)
+        first = client.get("/api/v1/batch/b1")
+        assert first.status_code == 200 and first.json()["completed"] == 1
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"')  # Shared by the identity and compressed encodings
+        assert client.get("/api/v1/batch/b1", headers={"If-None-Match": etag}).status_code == 304
+
+        status["completed"] = 2
+        changed = client.get("/api/v1/batch/b1", headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+        workflow = client.get("/api/v1/workflows/w1")
+        assert client.get("/api/v1/workflows/w1",
+                          headers={"If-None-Match": workflow.headers["etag"]}).status_code == 304
+    finally:
+        app.dependency_overrides.clear()
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
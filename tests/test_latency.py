@@ -0,0 +1,51 @@
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from engine.latency import LatencyTracker
+
+def test_default_until_enough_samples():
+    tracker = LatencyTracker()
+    key = LatencyTracker.key("calculate_job", "beam.mcdx")
+    for _ in range(LatencyTracker.MIN_SAMPLES - 1):
+        tracker.record(key, 0.2)
+    assert tracker.timeout_for(key, 120.0) == 120.0
+    assert tracker.timeout_for(None, 120.0) == 120.0
+
+def test_learned_timeout_clamped():
+    tracker = LatencyTracker()
+    fast = LatencyTracker.key("calculate_job", "fast.mcdx")
+    heavy = LatencyTracker.key("calculate_job", "heavy.mcdx")
+    for _ in range(10):
+        tracker.record(fast, 0.2)
+        tracker.record(heavy, 250.0)
+
+    # Quick sheets hit the floor instead of waiting the static default
+    assert tracker.timeout_for(fast, 120.0) == LatencyTracker.FLOOR
+    # Heavy sheets get p99 x factor, capped at the ceiling
+    assert tracker.timeout_for(heavy, 120.0) == LatencyTracker.CEILING
+
+    mid = LatencyTracker.key("calculate_job", "mid.mcdx")
+    for seconds in [2.0] * 99 + [10.0]:
+        tracker.record(mid, seconds)
+    assert tracker.percentile(mid, 99) == 2.0
+    assert tracker.timeout_for(mid, 120.0) == 2.0 * LatencyTracker.FACTOR
+
+def test_history_persists(tmp_path):
+    path = str(tmp_path / "latency_history.json")
+    key = LatencyTracker.key("save_as", "beam.mcdx")
+
+    tracker = LatencyTracker(path)
+    for _ in range(LatencyTracker.MIN_SAMPLES):
+        tracker.record(key, 4.0)
+    tracker.save()
+
+    reloaded = LatencyTracker(path)
+    assert list(reloaded.samples[key]) == [4.0] * LatencyTracker.MIN_SAMPLES
+    assert reloaded.timeout_for(key, 120.0) == 4.0 * LatencyTracker.FACTOR
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-v"])
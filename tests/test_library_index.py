@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from src.server.main import app
+from src.server.library import LibraryIndex, INDEX_NAME, batch_summary, query
+
+LIBRARY_DIR = "test_library"
+
+@pytest.fixture
+def library():
+    os.makedirs(os.path.join(LIBRARY_DIR, "beam_configs"), exist_ok=True)
+    with open(os.path.join(LIBRARY_DIR, "beam.mcdx"), "w") as f:
+        f.write("")
+    yield LIBRARY_DIR
+    shutil.rmtree(LIBRARY_DIR, ignore_errors=True)
+
+def write_config(directory, name, **extra):
+    path = os.path.join(directory, f"{name.lower()}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"name": name, **extra}, f)
+    return path
+
+def test_scan_parses_only_new_and_changed_configs(library):
+    config_dir = os.path.join(library, "beam_configs")
+    for name in ("Alpha", "Beta", "Gamma"):
+        write_config(config_dir, name, created_at=f"2024-01-0{len(name) % 9}")
+    with open(os.path.join(config_dir, "broken.json"), "w") as f:
+        f.write("{not json")
+
+    index = LibraryIndex(config_dir, batch_summary)
+    assert [c["name"] for c in index.scan()] == ["Alpha", "Beta", "Gamma"]
+
+    # A fresh process trusts the saved index and reads only what changed
+    write_config(config_dir, "Beta", version="2.0", padding="x" * 10)
+    os.remove(os.path.join(config_dir, "gamma.json"))
+    with patch("src.server.library.open", wraps=open, create=True) as opened:
+        configs = LibraryIndex(config_dir, batch_summary).scan()
+    read = [os.path.basename(c.args[0]) for c in opened.call_args_list if c.args[1] == "r"]
+    assert read == [INDEX_NAME, "beta.json"]
+    assert [(c["name"], c["version"]) for c in configs] == [("Alpha", "1.0"), ("Beta", "2.0")]
+
+def test_query_filters_sorts_and_pages():
+    configs = [{"name": n, "created_at": d} for n, d in
+               (("Beam long", "2024-03"), ("beam short", "2024-01"), ("Column", "2024-02"))]
+    page = query(configs, q="BEAM", sort="created_at", descending=True, limit=1)
+    assert page["total"] == 2 and [c["name"] for c in page["configs"]] == ["Beam long"]
+    assert [c["name"] for c in query(configs, offset=1)["configs"]] == ["beam short", "Column"]
+    with pytest.raises(ValueError):
+        query(configs, sort="size")
+
+def test_save_updates_index_and_list_pages(library, app_data_dir):
+    client = TestClient(app)
+    mcdx = os.path.abspath(os.path.join(library, "beam.mcdx"))
+    for name in ("Span 10", "Span 20", "Column"):
+        response = client.post("/api/v1/library/save", json={"name": name, "file_path": mcdx, "inputs": []})
+        assert response.status_code == 200
+
+    # Saves keep the index current, so listing parses nothing
+    with patch("src.server.library.json.load") as load:
+        response = client.get("/api/v1/library/list", params={"file_path": mcdx, "q": "span", "limit": 1})
+        assert load.call_count == 0
+    body = response.json()
+    assert body["total"] == 2 and [c["name"] for c in body["configs"]] == ["Span 10"]
+    assert client.get("/api/v1/library/list", params={"file_path": mcdx}).json()["total"] == 3
+
+    assert client.post("/api/v1/library/rescan", json={"file_path": mcdx}).json()["total"] == 3
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
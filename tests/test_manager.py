@@ -48,6 +48,21 @@ class TestEngineManager(unittest.TestCase):
         self.assertFalse(self.manager.is_running(), "Engine should be stopped")
         print("Engine stopped successfully.")
 
+    def test_submit_jobs_in_one_message(self):
+        print("\nTesting Batched Submission...")
+        self.manager.start_engine()
+        job_ids = self.manager.submit_jobs("ping", [{}] * 50)
+        self.assertEqual(len(set(job_ids)), 50)
+
+        start_time = time.time()
+        while time.time() - start_time < 5.0:
+            if all(self.manager.get_job(job_id) for job_id in job_ids):
+                break
+            time.sleep(0.1)
+        for job_id in job_ids:
+            self.assertEqual(self.manager.get_job(job_id).data["response"], "pong")
+        self.assertFalse(self.manager.pending)
+
     def test_restart(self):
         print("\nTesting Restart...")
         self.manager.start_engine()
@@ -60,6 +75,68 @@ class TestEngineManager(unittest.TestCase):
         self.assertNotEqual(pid1, pid2, "PID should change after restart")
         print(f"Restart successful. PID {pid1} -> {pid2}")
 
+    def test_watchdog_fails_stuck_job(self):
+        print("\nTesting Watchdog...")
+        from unittest.mock import MagicMock, patch
+        from engine.wire import decode_requests
+
+        self.manager.process = MagicMock()
+        self.manager.process.is_alive.return_value = True
+        self.manager.input_queue = MagicMock()
+
+        stuck_id = self.manager.submit_job("calculate_job", {"path": "a.mcdx"}, timeout=0.01)
+        queued_id = self.manager.submit_job("ping")
+        time.sleep(0.05)
+
+        def fake_spawn():
+            self.manager.process = MagicMock()
+            self.manager.input_queue = MagicMock()
+
+        with patch.object(self.manager, "_spawn_process", side_effect=fake_spawn):
+            failed_id = self.manager._check_in_flight()
+
+        self.assertEqual(failed_id, stuck_id)
+        result = self.manager.get_job(stuck_id)
+        self.assertEqual(result.status, "error")
+        self.assertEqual(result.error_kind, "timeout")
+
+        # Only the stuck job fails; the queued one is handed to the new harness
+        self.assertIsNone(self.manager.get_job(queued_id))
+        self.assertEqual(list(self.manager.pending), [queued_id])
+        requeued, _ = decode_requests(self.manager.input_queue.put.call_args[0][0])
+        self.assertEqual([req.id for req in requeued], [queued_id])
+        self.manager.process = None
+
+    def test_learned_deadlines_for_warm_jobs(self):
+        print("\nTesting Learned Deadlines...")
+        from unittest.mock import MagicMock
+        from engine.protocol import JobResult
+
+        self.manager.process = MagicMock()
+        self.manager.process.is_alive.return_value = True
+        self.manager.input_queue = MagicMock()
+
+        def run(path):
+            job_id = self.manager.submit_job("calculate_job", {"path": path})
+            timeout = self.manager.pending[job_id][1]
+            self.manager._job_finished(JobResult(job_id=job_id, status="success"))
+            return timeout
+
+        # First job opens the file: cold, static deadline
+        self.assertEqual(run("beam.mcdx"), self.manager.COMMAND_TIMEOUTS["calculate_job"])
+        for _ in range(self.manager.latency.MIN_SAMPLES):
+            run("beam.mcdx")
+        # Warm jobs on a fast sheet now get a much tighter deadline
+        self.assertEqual(run("beam.mcdx"), self.manager.latency.FLOOR)
+        # Switching files is cold again
+        self.assertEqual(run("column.mcdx"), self.manager.COMMAND_TIMEOUTS["calculate_job"])
+        # ...but switching back to a worksheet the harness still has open is not
+        self.assertEqual(run("beam.mcdx"), self.manager.latency.FLOOR)
+        for n in range(self.manager.MAX_OPEN_WORKSHEETS):
+            run(f"other{n}.mcdx")
+        self.assertEqual(run("beam.mcdx"), self.manager.COMMAND_TIMEOUTS["calculate_job"])  # Evicted
+        self.manager.process = None
+
 if __name__ == '__main__':
     # Windows multiprocessing support
     import multiprocessing
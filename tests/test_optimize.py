@@ -0,0 +1,91 @@
+import pytest
+from engine.optimize import bisection, brent, nelder_mead
+from engine.harness import run_optimize
+
+class FakeWorker:
+    """Worksheet where Utilization = 120 / depth and Cost = (depth - 14)^2 + width."""
+    def __init__(self):
+        self.inputs = {}
+        self.opened = []
+        self.recalcs = 0
+
+    def open_file(self, path):
+        self.opened.append(path)
+
+    def set_input(self, alias, value, units=None):
+        self.inputs[alias] = value
+
+    def synchronize(self):
+        self.recalcs += 1
+
+    def get_outputs(self):
+        return [{"alias": "Utilization"}, {"alias": "Cost"}]
+
+    def get_output_value(self, alias):
+        depth = self.inputs["depth"]
+        if alias == "Utilization":
+            return 120.0 / depth
+        return (depth - 14) ** 2 + self.inputs.get("width", 0)
+
+def test_root_finders():
+    f = lambda x: x ** 3 - 2 * x - 5
+    for solver in (bisection, brent):
+        x, fx, _, converged = solver(f, 2, 3, xtol=1e-10)
+        assert converged
+        assert x == pytest.approx(2.0945514815, abs=1e-8)
+    with pytest.raises(ValueError):
+        brent(f, 3, 4)
+
+def test_nelder_mead_rosenbrock_and_bounds():
+    rosen = lambda p: (1 - p[0]) ** 2 + 100 * (p[1] - p[0] ** 2) ** 2
+    x, _, _, converged = nelder_mead(rosen, [-1.2, 1.0], xtol=1e-8, ftol=1e-12, max_iter=2000)
+    assert converged
+    assert x == pytest.approx([1.0, 1.0], abs=1e-4)
+
+    x, _, _, _ = nelder_mead(lambda p: (p[0] - 5) ** 2, [0.5], bounds=[(0, 2)])
+    assert x[0] == pytest.approx(2.0, abs=1e-5)
+
+def test_goal_seek_reuses_open_worksheet():
+    worker = FakeWorker()
+    result = run_optimize(worker, {
+        "path": "C:\\test\\beam.mcdx",
+        "inputs": [{"alias": "width", "value": 4}],
+        "method": "brent",
+        "variables": [{"alias": "depth", "lower": 6, "upper": 36, "units": "in"}],
+        "objective": {"output": "Utilization", "target": 5.0},
+        "xtol": 1e-6,
+    })
+    assert worker.opened == ["C:\\test\\beam.mcdx"]
+    assert result["converged"]
+    assert result["inputs"]["depth"] == pytest.approx(24.0, abs=1e-4)
+    assert result["evaluations"] == len(result["trace"]) == worker.recalcs
+    # Worksheet is left at the solution
+    assert worker.inputs["depth"] == result["inputs"]["depth"]
+    assert result["outputs"]["Utilization"] == pytest.approx(5.0, abs=1e-6)
+
+def test_minimize_with_nelder_mead():
+    worker = FakeWorker()
+    result = run_optimize(worker, {
+        "method": "nelder-mead",
+        "variables": [{"alias": "depth", "lower": 6, "upper": 36}],
+        "objective": {"output": "Cost", "goal": "minimize"},
+    })
+    assert result["converged"]
+    assert result["inputs"]["depth"] == pytest.approx(14.0, abs=1e-3)
+
+def test_invalid_requests():
+    with pytest.raises(ValueError):
+        run_optimize(FakeWorker(), {
+            "method": "bisection",
+            "variables": [{"alias": "depth", "lower": 6, "upper": 36}],
+            "objective": {"output": "Cost", "goal": "minimize"},
+        })
+    with pytest.raises(ValueError):
+        # Target outside the bracket
+        run_optimize(FakeWorker(), {
+            "variables": [{"alias": "depth", "lower": 6, "upper": 36}],
+            "objective": {"output": "Utilization", "target": 100.0},
+        })
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
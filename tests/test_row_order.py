@@ -0,0 +1,87 @@
+import sys
+import os
+import time
+import pytest
+from unittest.mock import MagicMock
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from engine.row_order import order_rows
+from engine.sweep import SweepSpec
+from engine.batch_manager import BatchManager
+from engine.protocol import JobResult
+
+def count_changes(rows, order):
+    changes = 0
+    for prev, cur in zip(order, order[1:]):
+        changes += sum(1 for k in rows[cur] if rows[cur][k] != rows[prev].get(k))
+    return changes
+
+def test_order_rows_groups_files_and_minimizes_changes():
+    rows = [
+        {"path": "a.mcdx", "L": 1, "W": 1},
+        {"path": "b.mcdx", "L": 1, "W": 1},
+        {"path": "a.mcdx", "L": 2, "W": 2},
+        {"path": "a.mcdx", "L": 1, "W": 2},
+        {"path": "b.mcdx", "L": 1, "W": {"value": 1, "units": "ft"}},
+    ]
+    order = order_rows(rows)
+    assert sorted(order) == list(range(len(rows)))
+    # All rows for a.mcdx run before b.mcdx, each stepping one input at a time
+    assert order == [0, 3, 2, 1, 4]
+
+def test_order_rows_large_group_sorts():
+    import random
+    rows = [{"path": "a.mcdx", "L": l, "W": w} for w in range(40) for l in range(40)]
+    random.Random(0).shuffle(rows)
+    order = order_rows(rows)
+    assert sorted(order) == list(range(len(rows)))
+    assert count_changes(rows, order) < count_changes(rows, list(range(len(rows))))
+
+def test_sweep_gray_order_changes_one_axis_per_row():
+    spec = SweepSpec.model_validate({"grid": {"type": "product", "axes": [
+        {"type": "list", "alias": "a", "values": [1, 2, 3]},
+        {"type": "product", "axes": [
+            {"type": "list", "alias": "b", "values": [1, 2]},
+            {"type": "range", "alias": "c", "start": 0, "end": 3, "step": 1},
+        ]},
+    ]}})
+    ordered = list(spec.ordered_rows())
+    indices = [i for i, _ in ordered]
+    assert sorted(indices) == list(range(spec.count()))
+    for (_, prev), (_, cur) in zip(ordered, ordered[1:]):
+        assert sum(1 for k in cur if cur[k] != prev[k]) == 1
+    for i, row in ordered:
+        assert row == spec.row_at(i)
+
+def test_reordered_batch_lists_results_by_row(tmp_path):
+    engine = MagicMock()
+    engine.get_timeout.return_value = 60.0
+    jobs = {}
+
+    def submit(command, payload=None):
+        job_id = f"job_{len(jobs)}"
+        inputs = {c.alias: c.value for c in payload["inputs"]}
+        jobs[job_id] = JobResult(job_id=job_id, status="success", data={"outputs": {"a": inputs["a"]}})
+        return job_id
+
+    engine.submit_job.side_effect = submit
+    engine.get_job.side_effect = jobs.get
+    spec = SweepSpec.model_validate({"constants": {"path": "a.mcdx"}, "grid": {"type": "product", "axes": [
+        {"type": "list", "alias": "a", "values": [1, 2, 3]},
+        {"type": "list", "alias": "b", "values": [1, 2, 3]},
+    ]}})
+    bm = BatchManager(engine)
+    bm.start_batch("gray", [], str(tmp_path), export_pdf=False, sweep=spec, reorder=True)
+    start = time.time()
+    while bm.get_status("gray")["status"] == "running" and time.time() - start < 5:
+        time.sleep(0.05)
+    status = bm.get_status("gray")
+    assert [r["row"] for r in status["results"]] == list(range(9))
+    assert [r["data"]["outputs"]["a"] for r in status["results"]] == [1, 1, 1, 2, 2, 2, 3, 3, 3]
+    # Rows were recorded in run order; only the status lists them by row
+    assert list(bm.batches["gray"]["results"]) == [i for i, _ in spec.ordered_rows()] != list(range(9))
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,135 @@
+import json
+import os
+import shutil
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from src.server.main import app
+from src.server.startup import (StartupTracker, ImportProfiler, LAUNCH_ENV, PROFILE_NAME, HISTORY_NAME,
+                                start_in_background, load_history)
+from engine.protocol import JobResult
+
+def fake_engine(connect_result):
+    engine = MagicMock()
+    engine.get_timeout.return_value = 5.0
+    engine.submit_job.return_value = "connect_job"
+    engine.get_job.side_effect = lambda job_id: connect_result
+    engine.warm_up.return_value = None  # Nothing recent to preload
+    return engine
+
+LOG_DIR = "test_startup_logs"
+
+@pytest.fixture
+def log_dir():
+    yield LOG_DIR
+    shutil.rmtree(LOG_DIR, ignore_errors=True)
+
+def test_phases_are_timed_from_launch(monkeypatch):
+    monkeypatch.setenv(LAUNCH_ENV, repr(time.time() - 2.0))
+    tracker = StartupTracker()
+    tracker.mark("server_ready")
+    with pytest.raises(RuntimeError):
+        with tracker.phase("engine_start"):
+            raise RuntimeError("spawn failed")
+    phases = tracker.snapshot()["phases"]
+    assert phases[0]["name"] == "server_ready" and 2.0 <= phases[0]["start"] < 3.0
+    assert phases[1]["error"] == "spawn failed" and phases[1]["duration"] is not None
+
+def test_engine_and_mathcad_come_up_in_background():
+    tracker = StartupTracker()
+    engine = fake_engine(JobResult(job_id="connect_job", status="success"))
+    start_in_background(engine, tracker).join(timeout=5)
+    snapshot = tracker.snapshot()
+    assert snapshot["state"] == "ready" and snapshot["engine"] == "running"
+    assert [p["name"] for p in snapshot["phases"]] == ["engine_start", "mathcad_connect", "worksheet_preload"]
+    engine.submit_job.assert_called_once_with("connect", {})
+
+    tracker = StartupTracker()
+    engine = fake_engine(JobResult(job_id="connect_job", status="success"))
+    engine.warm_up.return_value = "preload_job"
+    engine.get_job.side_effect = lambda job_id: JobResult(
+        job_id=job_id, status="success", data={"opened": ["a.mcdx"], "failed": {}} if job_id == "preload_job" else {})
+    start_in_background(engine, tracker).join(timeout=5)
+    assert tracker.snapshot()["phases"][-1]["opened"] == ["a.mcdx"]
+
+    tracker = StartupTracker()
+    failed = JobResult(job_id="connect_job", status="error", error_message="Mathcad not installed")
+    start_in_background(fake_engine(failed), tracker).join(timeout=5)
+    snapshot = tracker.snapshot()
+    assert snapshot["state"] == "failed" and snapshot["engine"] == "running"
+    assert snapshot["error"] == "Mathcad not installed"
+
+def test_server_answers_before_mathcad_connects(monkeypatch, log_dir):
+    engine = fake_engine(None)  # Connect never finishes
+    monkeypatch.setattr("src.server.main.get_engine_manager", lambda: engine)
+    monkeypatch.setattr("src.server.main.get_log_dir", lambda: log_dir)
+    started = time.time()
+    with TestClient(app) as client:
+        assert client.get("/health").status_code == 200
+        for _ in range(50):
+            status = client.get("/api/v1/startup").json()
+            if status["mathcad"] == "connecting":
+                break
+            time.sleep(0.05)
+        assert status["state"] == "starting" and status["engine"] == "running"
+    assert time.time() - started < 3  # Shutdown cancels the wait for Mathcad
+    engine.stop_engine.assert_called_once()
+
+def test_import_profiler_charges_nested_imports_to_the_parent(tmp_path, monkeypatch):
+    package = tmp_path / "startup_probe"
+    package.mkdir()
+    (package / "__init__.py").write_text("import time\ntime.sleep(0.02)\nfrom . import child\n")
+    (package / "child.py").write_text("import time\ntime.sleep(0.05)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    profiler = ImportProfiler()
+    profiler.install()
+    try:
+        import startup_probe  # noqa: F401
+    finally:
+        profiler.uninstall()
+        sys.modules.pop("startup_probe", None)
+        sys.modules.pop("startup_probe.child", None)
+    records = {r["module"]: r for r in profiler.records}
+    parent, child = records["startup_probe"], records["startup_probe.child"]
+    assert parent["depth"] == 0 and child["depth"] == 1
+    assert parent["cumulative_ms"] >= 70 and 20 <= parent["self_ms"] < 50
+    assert profiler.report(limit=1)["slowest"] == [parent]
+
+def test_profile_is_written_and_recorded_once_per_launch(monkeypatch, log_dir):
+    monkeypatch.setenv(LAUNCH_ENV, repr(time.time() - 1.0))
+    tracker = StartupTracker(log_dir=log_dir, version="9.9")
+    engine = fake_engine(JobResult(job_id="connect_job", status="success"))
+    start_in_background(engine, tracker).join(timeout=5)
+    with open(os.path.join(log_dir, PROFILE_NAME)) as f:
+        assert json.load(f)["state"] == "ready"
+    assert load_history(log_dir, 10) == []  # Waiting for the launcher's phases
+
+    now = time.time()
+    tracker.add_launcher_phases([{"name": "server_spawn", "start": now - 1.0, "end": now - 0.9}])
+    tracker.write_profile()
+    history = load_history(log_dir, 10)
+    assert len(history) == 1 and history[0]["version"] == "9.9"
+    assert history[0]["phases"]["server_spawn"] == pytest.approx(0.1, abs=0.01)
+    assert tracker.profile()["phases"][0]["source"] == "launcher"
+
+def test_startup_profile_endpoints(monkeypatch, log_dir):
+    monkeypatch.setattr("src.server.main.get_engine_manager",
+                        lambda: fake_engine(JobResult(job_id="connect_job", status="success")))
+    monkeypatch.setattr("src.server.main.get_log_dir", lambda: log_dir)
+    with TestClient(app) as client:
+        now = time.time()
+        response = client.post("/api/v1/startup/phases",
+                               json={"phases": [{"name": "window_create", "start": now - 0.5, "end": now}]})
+        assert response.status_code == 200
+        for _ in range(50):
+            if client.get("/api/v1/startup").json()["state"] == "ready":
+                break
+            time.sleep(0.05)
+        profile = client.get("/api/v1/startup/profile").json()
+        assert "window_create" in [p["name"] for p in profile["phases"]]
+        assert client.get("/api/v1/startup/history").json()["launches"][0]["state"] == "ready"
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,133 @@
+import os
+import shutil
+import time
+import pytest
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from src.server.main import app
+from src.server.dependencies import get_engine_manager
+from engine.batch_manager import BatchManager
+from engine.protocol import JobResult
+from engine.store import RunStore, ValueFilter, parse_filter, parse_sort, INPUT, OUTPUT
+
+STORE_DIR = "test_store"
+OUTPUT_DIR = os.path.join(STORE_DIR, "out")
+
+@pytest.fixture
+def store_path():
+    os.makedirs(STORE_DIR, exist_ok=True)
+    yield os.path.join(STORE_DIR, "runs.db")
+    shutil.rmtree(STORE_DIR, ignore_errors=True)
+
+def record_run(store, run_id, path, values):
+    store.start_run(run_id, "batch", {"id": run_id, "status": "running", "total": len(values)})
+    for i, u in enumerate(values):
+        store.record_row(run_id, i, {"path": path, "L": {"value": i, "units": "ft"}},
+                         {"row": i, "status": "success", "data": {"outputs": {"U": u, "Name": "x"}},
+                          "pdf": f"{run_id}_{i}.pdf"})
+
+def test_rows_persist_and_are_found_by_output_range(store_path):
+    store = RunStore(store_path)
+    record_run(store, "a", "beam.mcdx", [0.5, 0.97, 1.2])
+    store.finish_run("a", {"id": "a", "status": "completed", "total": 3})
+    record_run(store, "b", "column.mcdx", [0.99])
+    store.close()  # Unfinished rows are committed on close
+
+    store = RunStore(store_path)
+    assert store.get_run("a")["status"] == "completed"
+    assert store.get_run("b")["status"] == "interrupted"  # Still running when the store closed
+    assert [r["row"] for r in store.run_rows("a")] == [0, 1, 2]
+    assert store.run_artifacts("a") == ["a_0.pdf", "a_1.pdf", "a_2.pdf"]
+    assert store.row_input("a", 1) == {"path": "beam.mcdx", "L": {"value": 1, "units": "ft"}}
+
+    rows, total = store.find_rows(filters=[parse_filter("output.U>=0.95")])
+    assert total == 3 and {(r["run_id"], r["row"]) for r in rows} == {("a", 1), ("a", 2), ("b", 0)}
+    rows, total = store.find_rows(path=os.path.abspath("beam.mcdx"),
+                                  filters=[ValueFilter(OUTPUT, "U", ">=", 0.95), ValueFilter(OUTPUT, "U", "<=", 1.0)])
+    assert total == 1 and rows[0]["data"]["outputs"]["U"] == 0.97
+    assert store.find_rows(since=time.time() + 60)[1] == 0
+
+    # Sorted by a value across runs, one page at a time
+    rows, total = store.find_rows(sort=(OUTPUT, "U"), descending=True, limit=2)
+    assert total == 4 and [r["data"]["outputs"]["U"] for r in rows] == [1.2, 0.99]
+    rows, _ = store.find_rows(filters=[parse_filter("input.L < 2")], sort=(INPUT, "L"), descending=False,
+                              offset=1, limit=1, status="success")
+    assert [(r["run_id"], r["row"]) for r in rows] == [("b", 0)]  # Ties on L: (a, 0), (b, 0), then (a, 1)
+
+    runs, total = store.runs(path="column.mcdx")
+    assert total == 1 and runs[0]["id"] == "b"
+    assert store.runs(kind="workflow")[1] == 0
+    store.close()
+
+def test_finished_batches_are_served_from_the_store(store_path):
+    engine = MagicMock()
+    engine.store = RunStore(store_path)
+    engine.get_timeout.return_value = 60.0
+    jobs = {}
+
+    def submit_job(command, payload=None):
+        job_id = f"job_{len(jobs)}"
+        jobs[job_id] = JobResult(job_id=job_id, status="success",
+                                 data={"outputs": {"M": payload["inputs"][0].value * 2}})
+        return job_id
+
+    engine.submit_job.side_effect = submit_job
+    engine.get_job.side_effect = jobs.get
+
+    bm = BatchManager(engine)
+    bm.MAX_FINISHED = 1
+    for batch_id in ("first", "second"):
+        bm.start_batch(batch_id, [{"path": "a.mcdx", "L": v} for v in range(3)], OUTPUT_DIR, export_pdf=False)
+        start = time.time()
+        while bm.get_status(batch_id)["status"] == "running" and time.time() - start < 5:
+            time.sleep(0.05)
+
+    assert list(bm.batches) == ["second"]  # "first" was dropped from memory
+    status = bm.get_status("first")
+    assert status["status"] == "completed" and status["completed"] == 3
+    assert [r["data"]["outputs"]["M"] for r in status["results"]] == [0, 2, 4]
+    assert bm.get_row_input("first", 2) == {"path": "a.mcdx", "L": 2}
+    assert bm.get_status("missing") is None
+    engine.store.close()
+
+def test_recent_worksheets_merge_runs_and_library_configs():
+    store = RunStore()
+    record_run(store, "a", "beam.mcdx", [0.5])
+    record_run(store, "b", "column.mcdx", [0.5])
+    store.flush()
+    store.save_library_config(os.path.join("proj", "slab_configs", "wide.json"), "batch", {"name": "wide"})
+    store.save_library_config(os.path.join("proj", "flows", "chain.json"), "workflow", {"name": "chain"})
+    assert store.recent_worksheets() == [os.path.abspath(p) for p in
+                                         (os.path.join("proj", "slab.mcdx"), "column.mcdx", "beam.mcdx")]
+    assert len(store.recent_worksheets(limit=2)) == 2
+    store.close()
+
+def test_parse_filter_and_sort():
+    assert parse_filter("output.Utilization > 0.95") == ValueFilter(OUTPUT, "Utilization", ">", 0.95)
+    assert parse_filter("in.L=20") == ValueFilter(INPUT, "L", "==", 20.0)
+    assert parse_sort("output.M") == (OUTPUT, "M") and parse_sort("finished_at") is None
+    for bad in ("Utilization > 1", "output.U > high", "row.U > 1"):
+        with pytest.raises(ValueError):
+            parse_filter(bad)
+    with pytest.raises(ValueError):
+        parse_sort("output.")
+
+def test_history_rows_endpoint():
+    manager = MagicMock()
+    manager.store = RunStore()
+    record_run(manager.store, "a", "beam.mcdx", [0.5, 0.97, 1.2])
+    manager.store.flush()
+    app.dependency_overrides[get_engine_manager] = lambda: manager
+    try:
+        client = TestClient(app)
+        body = client.get("/api/v1/history/rows", params={
+            "where": ["output.U>0.95", "input.L<=2"], "sort": "output.U", "descending": False}).json()
+        assert body["total"] == 2 and [r["row"] for r in body["rows"]] == [1, 2]
+        assert body["rows"][0]["inputs"] == {"L": {"value": 1, "units": "ft"}}
+        assert client.get("/api/v1/history/rows", params={"where": "U>1"}).status_code == 400
+        assert client.get("/api/v1/history/runs").json()["total"] == 1
+    finally:
+        app.dependency_overrides.clear()
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
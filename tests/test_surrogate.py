@@ -0,0 +1,114 @@
+import pytest
+from unittest.mock import MagicMock
+from engine.batch_manager import BatchManager
+from engine.protocol import JobResult
+from engine.surrogate import SurrogateSpec, SurrogateModel, _RBFGroup
+from engine.sweep import SweepSpec
+import os
+import time
+import numpy as np
+
+def deflection(L, I):
+    return L ** 3 / (48.0 * I)
+
+def test_model_predicts_interior_points_only():
+    model = SurrogateModel(SurrogateSpec(warmup_rows=36, max_error=0.05))
+    for L in (10, 13, 16, 19, 22, 25):
+        for I in (100, 160, 220, 280, 340, 400):
+            row = {"path": "beam.mcdx", "L": {"value": L, "units": "ft"}, "I": I}
+            model.observe(row, {"delta": deflection(L, I), "Note": "OK"})
+
+    prediction = model.predict({"path": "beam.mcdx", "L": {"value": 17, "units": "ft"}, "I": 250})
+    assert prediction is not None
+    assert list(prediction.outputs) == ["delta"]
+    assert prediction.outputs["delta"] == pytest.approx(deflection(17, 250), rel=0.05)
+    assert prediction.error_estimate["delta"] <= prediction.tolerance["delta"]
+    # Outside the evaluated region, or a different worksheet/units: calculate
+    assert model.predict({"path": "beam.mcdx", "L": {"value": 30, "units": "ft"}, "I": 250}) is None
+    assert model.predict({"path": "other.mcdx", "L": {"value": 17, "units": "ft"}, "I": 250}) is None
+    assert model.predict({"path": "beam.mcdx", "L": {"value": 17, "units": "m"}, "I": 250}) is None
+
+def test_failed_spot_check_suspends_surrogate():
+    spec = SurrogateSpec(warmup_rows=3, spot_check_every=2, max_error=0.01)
+    model = SurrogateModel(spec)
+    for x in (0, 5, 10):
+        model.observe({"x": x}, {"y": 2.0 * x})
+    prediction = model.predict({"x": 7})
+    assert prediction.outputs["y"] == pytest.approx(14.0)
+
+    check = model.observe({"x": 7}, {"y": 20.0}, prediction)
+    assert not check["passed"]
+    assert model.stats["spot_check_failures"] == 1
+    assert model.predict({"x": 3}) is None
+
+def test_training_set_is_capped_and_fit_without_inverse(monkeypatch):
+    monkeypatch.setattr(_RBFGroup, "MAX_SAMPLES", 25)
+    model = SurrogateModel(SurrogateSpec(warmup_rows=100, max_error=0.05))
+    for L in range(10, 50):
+        for I in (100, 200, 300, 400):
+            model.observe({"L": L, "I": I}, {"delta": deflection(L, I)})
+    group = next(iter(model.groups.values()))
+    assert len(group.samples) == 25 and min(L for _, L in group.samples) == 43  # Most recent rows
+    assert model.predict({"L": 20, "I": 250}) is None  # Dropped region: calculated again
+
+    prediction = model.predict({"L": 46.5, "I": 250})
+    assert prediction.outputs["delta"] == pytest.approx(deflection(46.5, 250), rel=0.05)
+    # The leave-one-out errors match the ones from an explicit inverse
+    n, d = group.centers.shape
+    P = np.hstack([np.ones((n, 1)), group.centers])
+    A = np.block([[group._kernel(group.centers), P], [P.T, np.zeros((d + 1, d + 1))]])
+    A_inv = np.linalg.inv(A)
+    expected = np.abs((A_inv[:n, :n] @ group.values) / np.diag(A_inv)[:n, None])
+    assert group.loo_error == pytest.approx(expected, rel=1e-6)
+
+@pytest.fixture
+def mock_engine():
+    engine = MagicMock()
+    engine.is_running.return_value = True
+    engine.get_timeout.return_value = 120.0
+    jobs = {}
+
+    def submit(command, payload=None):
+        job_id = f"job_{len(jobs) + 1}"
+        inputs = {c.alias: c.value for c in payload["inputs"]}
+        jobs[job_id] = JobResult(job_id=job_id, status="success",
+                                 data={"outputs": {"delta": deflection(inputs["L"], inputs["I"])}})
+        return job_id
+
+    engine.submit_job.side_effect = submit
+    engine.get_job.side_effect = lambda job_id: jobs[job_id]
+    return engine
+
+def test_surrogate_batch_flags_estimated_rows(mock_engine):
+    sweep = SweepSpec.model_validate({
+        "constants": {"path": "C:\\test\\beam.mcdx"},
+        "grid": {"type": "product", "axes": [
+            {"type": "range", "alias": "L", "start": 10, "end": 30, "step": 1},
+            {"type": "range", "alias": "I", "start": 100, "end": 500, "step": 20},
+        ]}
+    })
+    bm = BatchManager(mock_engine)
+    bm.start_batch("test_surrogate", [], "test_output_surrogate", export_pdf=False, sweep=sweep,
+                   surrogate=SurrogateSpec(warmup_rows=25, spot_check_every=5, max_error=0.02))
+    start = time.time()
+    while bm.get_status("test_surrogate")["status"] == "running" and time.time() - start < 20:
+        time.sleep(0.05)
+    status = bm.get_status("test_surrogate")
+    if os.path.exists("test_output_surrogate"):
+        import shutil
+        shutil.rmtree("test_output_surrogate")
+
+    assert status["status"] == "completed"
+    assert [r["row"] for r in status["results"]] == list(range(sweep.count()))
+    estimated = [r for r in status["results"] if r.get("surrogate")]
+    stats = status["surrogate"]
+    assert len(estimated) == stats["predicted"] > sweep.count() / 2
+    assert stats["calculated"] + stats["predicted"] == sweep.count()
+    assert mock_engine.submit_job.call_count == stats["calculated"]
+    assert stats["spot_checks"] > 0
+    for r in estimated:
+        row = sweep.row_at(r["row"])
+        assert r["data"]["outputs"]["delta"] == pytest.approx(deflection(row["L"], row["I"]), rel=0.05)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,78 @@
+import sys
+import os
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from engine.sweep import SweepSpec
+
+def test_range_matches_generate_range():
+    spec = SweepSpec.model_validate({
+        "grid": {"type": "range", "alias": "L", "start": 0, "end": 1, "step": 0.1}
+    })
+    values = [row["L"] for row in spec.rows()]
+    assert spec.count() == 11
+    assert values[3] == 0.3
+    assert values[-1] == 1.0
+
+def test_product_order_and_units():
+    spec = SweepSpec.model_validate({
+        "constants": {"path": "C:\\test\\beam.mcdx"},
+        "grid": {"type": "product", "axes": [
+            {"type": "list", "alias": "Mode", "values": ["A", "B"], "units": "ft"},
+            {"type": "range", "alias": "L", "start": 10, "end": 30, "step": 10, "units": "ft"},
+        ]}
+    })
+    rows = list(spec.rows())
+    assert spec.count() == len(rows) == 6
+    # Last axis varies fastest, same as generateCartesian
+    assert rows[0] == {"path": "C:\\test\\beam.mcdx", "Mode": "A", "L": {"value": 10, "units": "ft"}}
+    assert rows[1]["L"]["value"] == 20
+    assert rows[3]["Mode"] == "B"
+    assert list(rows[0]) == ["path", "Mode", "L"]
+    assert spec.row_at(5) == rows[5]
+    with pytest.raises(IndexError):
+        spec.row_at(6)
+
+def test_zip_inside_product():
+    spec = SweepSpec.model_validate({
+        "grid": {"type": "product", "axes": [
+            {"type": "zip", "axes": [
+                {"type": "list", "alias": "b", "values": [1, 2, 3]},
+                {"type": "list", "alias": "h", "values": [10, 20]},
+            ]},
+            {"type": "list", "alias": "fc", "values": [4000, 5000]},
+        ]}
+    })
+    assert spec.count() == 4
+    assert list(spec.rows())[2] == {"b": 2, "h": 20, "fc": 4000}
+
+def test_large_sweep_is_not_materialized():
+    axis = {"type": "range", "start": 1, "end": 100, "step": 1}
+    spec = SweepSpec.model_validate({"grid": {"type": "product", "axes": [
+        {**axis, "alias": alias} for alias in ("a", "b", "c", "d")
+    ]}})
+    assert spec.count() == 100 ** 4
+    assert spec.row_at(100 ** 4 - 1) == {"a": 100, "b": 100, "c": 100, "d": 100}
+
+def test_coarse_to_fine_covers_grid_corners_first():
+    spec = SweepSpec.model_validate({"grid": {"type": "product", "axes": [
+        {"type": "range", "alias": "a", "start": 0, "end": 8, "step": 1},
+        {"type": "list", "alias": "b", "values": [1, 2, 3]},
+    ]}})
+    order = list(spec.coarse_to_fine_rows())
+    assert sorted(i for i, _ in order) == list(range(spec.count()))
+    assert [row for _, row in order[:4]] == [
+        {"a": 0, "b": 1}, {"a": 0, "b": 3}, {"a": 8, "b": 1}, {"a": 8, "b": 3}
+    ]
+    assert all(row == spec.row_at(i) for i, row in order)
+
+def test_invalid_nodes_rejected():
+    with pytest.raises(ValueError):
+        SweepSpec.model_validate({"grid": {"type": "range", "alias": "L", "start": 0}})
+    with pytest.raises(ValueError):
+        SweepSpec.model_validate({"grid": {"type": "product", "axes": []}})
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
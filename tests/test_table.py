@@ -0,0 +1,162 @@
+import io
+import os
+import shutil
+import tarfile
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from src.server.main import app
+from src.server.dependencies import get_engine_manager
+from engine.batch_manager import BatchManager
+from engine.protocol import JobResult
+from engine.store import RunStore
+from engine.table import TableSpec, TableSource, prepare_upload
+
+UPLOAD_DIR = "test_uploads"
+
+CSV = (
+    "\ufeffpath,L,w,Note\r\n"  # Byte order mark, as Excel writes it
+    "beam.mcdx,10,2.5,plain\r\n"
+    "\r\n"
+    "column.mcdx,20,,\"two\r\nlines\"\r\n"
+    "beam.mcdx,thirty,4,\r\n"
+    "beam.mcdx,40,5,x,extra\r\n"
+).encode("utf-8")
+
+@pytest.fixture
+def upload_dir():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    yield UPLOAD_DIR
+    shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+
+def store_upload(upload_dir, data=CSV, upload_id="t1"):
+    raw = os.path.join(upload_dir, "raw.part")
+    with open(raw, "wb") as f:
+        f.write(data)
+    return prepare_upload(raw, "loads.csv", upload_dir, upload_id)
+
+def test_upload_is_indexed_and_summarized(upload_dir):
+    summary = store_upload(upload_dir)
+    assert summary["rows"] == 4  # Blank line skipped, quoted newline kept in its record
+    columns = {c["name"]: c for c in summary["columns"]}
+    assert columns["L"] == {"name": "L", "numeric": 3, "text": 1, "empty": 0}
+    assert columns["w"]["empty"] == 1
+    assert summary["preview"][1]["Note"] == "two\r\nlines"
+    assert summary["error_count"] == 1 and summary["errors"][0].startswith("Row 3")
+    assert not os.path.exists(os.path.join(upload_dir, "raw.part"))
+
+def test_rows_stream_and_seek_alike(upload_dir):
+    store_upload(upload_dir)
+    spec = TableSpec(upload_id="t1", path_column="path",
+                     columns=[{"column": "L", "alias": "Length", "units": "ft"}, {"column": "w", "alias": "w"}])
+    table = TableSource(spec, upload_dir)
+    rows = list(table.rows())
+    assert table.count() == 4 and [table.row_at(i) for i in reversed(range(4))] == rows[::-1]
+    assert rows[0] == {"path": "beam.mcdx", "Length": {"value": 10, "units": "ft"}, "w": 2.5}
+    assert rows[1] == {"path": "column.mcdx", "Length": {"value": 20, "units": "ft"}}  # Empty w left out
+    assert rows[2]["Length"] == "thirty"  # Text is passed through without units
+    with pytest.raises(IndexError):
+        table.row_at(4)
+    table.close()
+
+    with pytest.raises(ValueError):
+        TableSource(TableSpec(upload_id="t1", path="a.mcdx", columns=[{"column": "H", "alias": "H"}]), upload_dir)
+    with pytest.raises(ValueError):
+        TableSpec(upload_id="t1", columns=[{"column": "L", "alias": "L"}])  # No worksheet
+
+def test_windows_1252_upload(upload_dir):
+    summary = store_upload(upload_dir, "Name,L\r\nPoutre é,1\r\n".encode("cp1252"), "t2")
+    assert summary["encoding"] == "cp1252"
+    table = TableSource(TableSpec(upload_id="t2", path="a.mcdx", columns=[{"column": "Name", "alias": "N"}]),
+                        upload_dir)
+    assert table.row_at(0)["N"] == "Poutre é"
+    table.close()
+
+def table_engine():
+    """Mock engine answering every row with the number of inputs it got."""
+    engine = MagicMock()
+    engine.store = RunStore()
+    engine.get_timeout.return_value = 60.0
+    jobs = {}
+
+    def submit_job(command, payload=None):
+        job_id = f"job_{len(jobs)}"
+        jobs[job_id] = JobResult(job_id=job_id, status="success", data={"outputs": {"n": len(payload["inputs"])}})
+        return job_id
+
+    engine.submit_job.side_effect = submit_job
+    engine.submit_many.side_effect = lambda path, rows, **kw: [submit_job("calculate_job", {"path": path, **row})
+                                                               for row in rows]
+    engine.get_job.side_effect = jobs.get
+    return engine
+
+def test_batch_runs_rows_from_upload(upload_dir):
+    engine = table_engine()
+    store_upload(upload_dir)
+    spec = TableSpec(upload_id="t1", path="beam.mcdx", columns=[{"column": "L", "alias": "L"}])
+    bm = BatchManager(engine)
+    bm.start_batch("table", [], os.path.join(upload_dir, "out"), export_pdf=False,
+                   table=TableSource(spec, upload_dir))
+    start = time.time()
+    while bm.get_status("table")["status"] == "running" and time.time() - start < 5:
+        time.sleep(0.05)
+    status = bm.get_status("table")
+    assert status["completed"] == 4 and all(r["status"] == "success" for r in status["results"])
+    assert bm.get_row_input("table", 3) == {"path": "beam.mcdx", "L": 40}
+
+def test_upload_endpoint_and_table_batch(upload_dir):
+    manager = MagicMock()
+    app.dependency_overrides[get_engine_manager] = lambda: manager
+    try:
+        # Small write blocks, so the upload is written in several thread hops
+        with patch("src.server.routes._upload_dir", return_value=upload_dir), \
+                patch("src.server.routes.UPLOAD_WRITE_SIZE", 16):
+            client = TestClient(app)
+            summary = client.post("/api/v1/inputs/upload", params={"filename": "loads.csv"}, content=CSV).json()
+            assert summary["rows"] == 4
+            assert client.get(f"/api/v1/inputs/upload/{summary['upload_id']}").json() == summary
+            assert client.post("/api/v1/inputs/upload", params={"filename": "loads.txt"},
+                               content=b"x").status_code == 400
+
+            table = {"upload_id": summary["upload_id"], "path": "beam.mcdx", "columns": [{"column": "L", "alias": "L"}]}
+            response = client.post("/api/v1/batch/start", json={"batch_id": "b", "output_dir": "out", "table": table})
+            assert response.status_code == 200
+            assert manager.batch_manager.start_batch.call_args.kwargs["table"].count() == 4
+
+            table["columns"] = [{"column": "Missing", "alias": "M"}]
+            response = client.post("/api/v1/batch/start", json={"batch_id": "b", "output_dir": "out", "table": table})
+            assert response.status_code == 400
+    finally:
+        app.dependency_overrides.clear()
+
+def test_table_batch_archive_over_http(upload_dir):
+    manager = table_engine()
+    manager.batch_manager = BatchManager(manager)
+    app.dependency_overrides[get_engine_manager] = lambda: manager
+    try:
+        with patch("src.server.routes._upload_dir", return_value=upload_dir):
+            client = TestClient(app)
+            upload_id = client.post("/api/v1/inputs/upload", params={"filename": "loads.csv"},
+                                    content=CSV).json()["upload_id"]
+            table = {"upload_id": upload_id, "path_column": "path", "columns": [{"column": "L", "alias": "L"}]}
+            response = client.post("/api/v1/batch/start", json={
+                "batch_id": "table", "output_dir": os.path.join(upload_dir, "out"), "export_pdf": False,
+                "table": table})
+            assert response.status_code == 200
+            start = time.time()
+            while client.get("/api/v1/batch/table").json()["status"] == "running" and time.time() - start < 5:
+                time.sleep(0.05)
+            assert manager.batch_manager.row_sources["table"]._file is None  # Closed when the batch ended
+
+            response = client.get("/api/v1/batch/table/archive")
+            assert response.status_code == 200
+            with tarfile.open(fileobj=io.BytesIO(response.content)) as tar:
+                lines = tar.extractfile("results.csv").read().decode().splitlines()
+            assert [line.split(",")[2:4] for line in lines[1:]] == [
+                ["beam.mcdx", "10"], ["column.mcdx", "20"], ["beam.mcdx", "thirty"], ["beam.mcdx", "40"]]
+    finally:
+        app.dependency_overrides.clear()
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
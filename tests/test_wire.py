@@ -0,0 +1,90 @@
+import pickle
+import datetime
+import numpy as np
+import pytest
+from engine.protocol import JobRequest, JobResult, InputConfig
+from engine.wire import (SharedArrays, encode_requests, decode_requests, encode_results, decode_results,
+                         encode_release)
+
+def test_request_round_trip():
+    reqs = [JobRequest(command="calculate_job", payload={
+        "path": "C:\\test\\beam.mcdx",
+        "inputs": [InputConfig(alias="L", value=10.5, units="ft"), InputConfig(alias="Mode", value="A")],
+        "force_reopen": True,
+    }) for _ in range(3)]
+    decoded, released = decode_requests(encode_requests(reqs))
+    assert decoded == reqs and released == []
+    assert isinstance(decoded[0].payload["inputs"][0], InputConfig)
+
+def test_result_round_trip_with_arrays_and_fallback():
+    matrix = np.arange(12, dtype=np.float64).reshape(3, 4)
+    when = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    results = [
+        JobResult(job_id="a", status="success",
+                  data={"outputs": {"K": matrix, "n": np.int64(7), "at": when}}),
+        JobResult(job_id="b", status="error", error_message="Traceback...", error_kind="input"),
+    ]
+    a, b = decode_results(encode_results(results))
+    np.testing.assert_array_equal(a.data["outputs"]["K"], matrix)
+    assert a.data["outputs"]["n"] == 7
+    assert a.data["outputs"]["at"] == when
+    assert b == results[1]
+
+def test_smaller_than_pickle():
+    req = JobRequest(command="calculate_job", payload={
+        "path": "C:\\test\\beam.mcdx",
+        "inputs": [InputConfig(alias=a, value=float(i), units="in") for i, a in enumerate("bhLdw")],
+    })
+    assert len(encode_requests([req])) < len(pickle.dumps(req)) / 2
+
+def test_large_arrays_travel_in_shared_memory():
+    sender, receiver = SharedArrays(), SharedArrays()
+    big = np.random.rand(200, 200)  # 320 KB
+    small = np.ones(10)
+    reqs = [JobRequest(command="calculate_job", payload={"inputs": [InputConfig(alias="K", value=big)]}),
+            JobRequest(command="calculate_job", payload={"inputs": [InputConfig(alias="v", value=small)]})]
+    message = encode_requests(reqs, sender)
+    assert len(message) < 10_000
+    assert list(sender.owners) == [reqs[0].id]
+
+    decoded, _ = decode_requests(message, receiver)
+    view = decoded[0].payload["inputs"][0].value
+    np.testing.assert_array_equal(view, big)
+    assert not view.flags.writeable
+    assert list(receiver.owners) == [reqs[0].id]
+
+    # Live views (even slices) keep a block mapped until a later release
+    receiver.release_owner(reqs[0].id)
+    assert len(receiver.closing) == 1
+    column = view[:, 0]
+    del decoded, view
+    receiver.release([])
+    assert column.sum() == big[:, 0].sum()
+    del column
+    receiver.release([])
+    assert receiver.closing == {} and receiver.blocks == {}
+
+    sender.release_owner(reqs[0].id)
+    assert sender.blocks == {} and sender.owners == {}
+
+def test_results_released_by_name():
+    harness, manager = SharedArrays(), SharedArrays()
+    big = np.arange(100_000, dtype=np.float64)
+    message = encode_results([JobResult(job_id="a", status="success", data={"outputs": {"x": big}})], harness)
+    result, = decode_results(message, manager)
+    np.testing.assert_array_equal(result.data["outputs"]["x"], big)
+
+    names = manager.take_attached()
+    assert len(names) == 1 and manager.take_attached() == []
+    jobs, released = decode_requests(encode_release(names))
+    assert jobs == [] and released == names
+    harness.release(released)
+    assert harness.blocks == {} and harness.owners == {}
+    # The manager's mapping outlives the harness's handle
+    np.testing.assert_array_equal(result.data["outputs"]["x"], big)
+    del result
+    manager.release_all()
+    assert manager.blocks == {} and manager.closing == {}
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,133 @@
+import os
+import shutil
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from engine.harness import process_job
+from engine.protocol import FailureKind, JobRequest
+from engine.worker import MathcadWorker, MathcadConnectionError
+
+SHEET_DIR = "test_sheets"
+
+class FakeMathcad:
+    """Opens a fresh mock worksheet per call, like Mathcad's Open."""
+
+    def __init__(self):
+        self.opened = []
+        self.probes = 0
+
+    def open(self, path):
+        self.opened.append(os.path.basename(str(path)))
+        sheet = MagicMock(name=os.path.basename(str(path)))
+        sheet.set_real_input.return_value = 0
+        return sheet
+
+    def worksheet_names(self):
+        self.probes += 1
+        return []
+
+@pytest.fixture
+def sheets():
+    os.makedirs(SHEET_DIR, exist_ok=True)
+    paths = {}
+    for name in ("a", "b", "c", "d"):
+        paths[name] = os.path.join(SHEET_DIR, f"{name}.mcdx")
+        with open(paths[name], "w") as f:
+            f.write("")
+    yield paths
+    shutil.rmtree(SHEET_DIR, ignore_errors=True)
+
+def make_worker(max_open=2):
+    worker = MathcadWorker()
+    worker.MAX_OPEN_WORKSHEETS = max_open
+    worker.mc = FakeMathcad()
+    worker.connected = True
+    return worker
+
+def test_switching_back_activates_instead_of_reopening(sheets):
+    worker = make_worker()
+    worker.open_file(sheets["a"])
+    sheet_a = worker.worksheet
+    worker.open_file(sheets["b"])
+    worker.open_file(sheets["a"])
+    assert worker.mc.opened == ["a.mcdx", "b.mcdx"] and worker.worksheet is sheet_a
+    assert sheet_a.activate.call_count == 2
+
+    worker.open_file(sheets["c"])  # b is least recently used
+    assert list(map(os.path.basename, worker.open_sheets)) == ["a.mcdx", "c.mcdx"]
+    worker.open_file(sheets["b"])
+    assert worker.mc.opened[-1] == "b.mcdx"
+
+    worker.open_file(sheets["b"], force_reopen=True)
+    assert worker.mc.opened[-1] == "b.mcdx" and len(worker.mc.opened) == 5
+
+def test_preload_keeps_the_active_worksheet(sheets):
+    worker = make_worker(max_open=3)
+    worker.open_file(sheets["a"])
+    status = worker.preload([sheets["b"], os.path.join(SHEET_DIR, "missing.mcdx"), sheets["c"]])
+    assert status[sheets["b"]] is None and "not found" in status[os.path.join(SHEET_DIR, "missing.mcdx")]
+    assert sheets["c"] not in status  # No room left beside a and b
+    assert os.path.basename(worker.current_file_path) == "a.mcdx"
+
+    worker.mc.opened.clear()
+    worker.open_file(sheets["b"])
+    assert worker.mc.opened == []
+
+def test_inputs_and_stats_survive_switching(sheets):
+    worker = make_worker()
+    worker.open_file(sheets["a"])
+    worker.set_input("L", 10.0, "ft")
+    sheet_a = worker.worksheet
+    worker.open_file(sheets["b"])
+    worker.open_file(sheets["a"])
+    worker.set_input("L", 10.0, "ft")  # Still applied on a: no COM call
+    assert sheet_a.set_real_input.call_count == 1
+    worker.open_file(sheets["a"])
+    worker.open_file(sheets["c"])
+    assert worker.cache_info() == {"capacity": 2, "open": [str(os.path.abspath(sheets["a"])),
+                                                          str(os.path.abspath(sheets["c"]))],
+                                   "active": str(os.path.abspath(sheets["c"])),
+                                   "hits": 1, "switches": 1, "misses": 3, "evictions": 1}
+
+def test_stale_worksheet_is_reopened(sheets):
+    worker = make_worker()
+    worker.open_file(sheets["a"])
+    worker.open_file(sheets["b"])
+    stale = worker.open_sheets[str(os.path.abspath(sheets["a"]))]
+    stale.activate.side_effect = Exception("Worksheet was closed")
+    worker.open_file(sheets["a"])
+    assert worker.worksheet is not stale and worker.mc.opened == ["a.mcdx", "b.mcdx", "a.mcdx"]
+
+class com_error(Exception):
+    """Stands in for pywintypes.com_error."""
+
+def test_jobs_trust_the_connection_until_it_fails(sheets):
+    worker = make_worker()
+    for _ in range(3):
+        worker.open_file(sheets["a"])
+    assert worker.mc.probes == 0  # No liveness round trip per job
+
+    # A job hitting a dead connection marks it lost; the next one reconnects first
+    job = JobRequest(command="calculate_job", payload={"path": sheets["a"]})
+    worker.worksheet.calculate.side_effect = com_error(-2147023174, "The RPC server is unavailable")
+    assert process_job(worker, job).error_kind == FailureKind.CONNECTION.value
+    assert not worker.connected
+    with patch.object(worker, "connect") as connect:
+        worker.ensure_connected()
+    connect.assert_called_once()
+
+def test_idle_checks_are_rate_limited(sheets):
+    worker = make_worker()
+    worker.last_checked = time.monotonic()
+    assert worker.check_connection() and worker.mc.probes == 0
+    worker.mc.worksheet_names = MagicMock(side_effect=com_error(-2147417848, "disconnected"))
+    assert not worker.check_connection(force=True) and not worker.connected
+
+def test_preload_stops_when_mathcad_is_gone(sheets):
+    worker = make_worker()
+    worker.mc.open = MagicMock(side_effect=com_error(-2147417848, "The object invoked has disconnected"))
+    with pytest.raises(MathcadConnectionError):
+        worker.preload([sheets["a"]])
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])